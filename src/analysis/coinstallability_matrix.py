@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+"""
+Batch Co-Installability Matrix
+Pairwise "can A and B coexist" for a candidate subset, pruned by closure conflicts and solved in parallel
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+from multiprocessing import Pool
+from graph_utils import load_dependency_data, adjacency_csr
+from conflict_store import ConflictStore, UNSATISFIABLE
+from incompatibility_matrix_analysis import build_conflict_store
+from transitive_incompatibility import TransitiveIncompatibility
+from coinstallability_solver import CoinstallabilitySolver
+
+_worker_solver = None
+
+def solver_data(dep_data):
+    """The parts of a snapshot the solver needs, small enough to ship to worker processes."""
+    data = {
+        'packages': dep_data['packages'],
+        'pkg_to_idx': dep_data['pkg_to_idx'],
+        'unresolved_dependencies': dep_data.get('unresolved_dependencies', {})
+    }
+    if 'dependency_edges' in dep_data:
+        data['dependency_edges'] = dep_data['dependency_edges']
+    else:
+        A = adjacency_csr(dep_data).tocoo()
+        data['dependency_edges'] = [[int(i), int(j), 'name', dep_data['packages'][j]]
+                                    for i, j in zip(A.row, A.col)]
+    return data
+
+def _init_worker(data, store_dict, hyperedges, virtual_exclusive):
+    global _worker_solver
+    _worker_solver = CoinstallabilitySolver(data, ConflictStore.from_dict(store_dict), hyperedges, virtual_exclusive)
+
+def _solve_pairs(pairs):
+    """Worker task: the pairs (i, j) that cannot be installed together."""
+    packages = _worker_solver.packages
+    return [(i, j) for i, j in pairs if not _worker_solver.can_install([packages[i], packages[j]])[0]]
+
+def analyze_coinstallability_matrix(candidates, data_file='/home/zack/dependency_data.json',
+                                    conflict_file='/home/zack/conflict_analysis.json',
+                                    output_file='/home/zack/coinstallability_matrix.json',
+                                    virtual_exclusive=False, workers=None, chunk_size=64):
+    """Compute the pairwise co-installability matrix for a list of candidate package names."""
+    dep_data = load_dependency_data(data_file)
+    with open(conflict_file, 'r') as f:
+        conflict_data = json.load(f)
+    packages = dep_data['packages']
+    pkg_to_idx = dep_data['pkg_to_idx']
+
+    print("="*70)
+    print("BATCH CO-INSTALLABILITY MATRIX")
+    print("="*70)
+
+    missing = [p for p in candidates if p not in pkg_to_idx]
+    selected = sorted({pkg_to_idx[p] for p in candidates if p in pkg_to_idx})
+    print(f"\n{len(selected)} candidate packages ({len(missing)} not in snapshot)")
+
+    store, hyperedges = build_conflict_store(dep_data, conflict_data)
+    data = solver_data(dep_data)
+    solver = CoinstallabilitySolver(data, store, hyperedges, virtual_exclusive)
+
+    print("\n[1/3] Checking candidates on their own...")
+    uninstallable = [i for i in selected if not solver.can_install([packages[i]])[0]]
+    installable = sorted(set(selected) - set(uninstallable))
+    print(f"   {len(uninstallable)} candidates cannot be installed at all")
+
+    print("\n[2/3] Pruning pairs with conflict-free closures...")
+    # Installing both full closures is a valid solution unless they conflict somewhere,
+    # so only pairs flagged by the transitive relation need the solver
+    ti = TransitiveIncompatibility(dep_data, store, hyperedges)
+    flagged, broken = ti.compute(installable)
+    broken = sorted(set(installable) & set(broken))
+    solver_pairs = set(zip(flagged.rows.tolist(), flagged.cols.tolist()))
+    for b in broken:
+        for i in installable:
+            if i != b:
+                solver_pairs.add((min(i, b), max(i, b)))
+    solver_pairs = sorted(solver_pairs)
+    total_pairs = len(selected) * (len(selected) - 1) // 2
+    print(f"   {total_pairs} pairs, {len(solver_pairs)} need the solver "
+          f"({len(broken)} candidates with conflicts inside their own closure)")
+
+    print("\n[3/3] Solving remaining pairs...")
+    start = time.time()
+    chunks = [solver_pairs[k:k + chunk_size] for k in range(0, len(solver_pairs), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(chunks) > 1:
+        with Pool(min(workers, len(chunks)), initializer=_init_worker,
+                  initargs=(data, store.to_dict(), hyperedges, virtual_exclusive)) as pool:
+            incompatible = [pair for result in pool.imap_unordered(_solve_pairs, chunks) for pair in result]
+    else:
+        incompatible = [(i, j) for i, j in solver_pairs
+                        if not solver.can_install([packages[i], packages[j]])[0]]
+    elapsed = time.time() - start
+    print(f"   {len(incompatible)} incompatible pairs found in {elapsed:.2f}s")
+
+    # Uninstallable candidates cannot coexist with anything
+    result = ConflictStore(len(packages))
+    for i, j in incompatible:
+        result.add(i, j, UNSATISFIABLE)
+    for u in uninstallable:
+        for i in selected:
+            result.add(u, i, UNSATISFIABLE)
+    result.coalesce()
+
+    degrees = np.bincount(np.concatenate([result.rows, result.cols]), minlength=len(packages))
+
+    print("\n" + "="*70)
+    print("CO-INSTALLABILITY RESULTS")
+    print("="*70)
+
+    print(f"\n1. PAIRS:")
+    print(f"   Candidate pairs: {total_pairs}")
+    print(f"   Pruned without solving: {total_pairs - len(solver_pairs)}")
+    print(f"   Cannot coexist: {len(result)}")
+
+    print(f"\n2. LEAST COMPATIBLE CANDIDATES:")
+    for i in sorted(selected, key=lambda x: -degrees[x])[:10]:
+        if degrees[i] > 0:
+            print(f"     • {packages[i]:<35} {int(degrees[i])} of {len(selected) - 1}")
+
+    if uninstallable:
+        print(f"\n3. CANDIDATES THAT CANNOT BE INSTALLED:")
+        for i in uninstallable[:10]:
+            print(f"     • {packages[i]}")
+
+    results = {
+        'candidates': [packages[i] for i in selected],
+        'missing': missing,
+        'uninstallable': [packages[i] for i in uninstallable],
+        'conflict_edges': result.to_dict(),
+        'statistics': {
+            'candidate_pairs': total_pairs,
+            'solver_pairs': len(solver_pairs),
+            'incompatible_pairs': len(result),
+            'solve_seconds': elapsed
+        }
+    }
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return result, results
+
+if __name__ == "__main__":
+    # Usage: coinstallability_matrix.py <candidates.json | pkg ...>
+    if len(sys.argv) == 2 and sys.argv[1].endswith('.json'):
+        with open(sys.argv[1], 'r') as f:
+            candidates = json.load(f)
+    else:
+        candidates = sys.argv[1:]
+    result, results = analyze_coinstallability_matrix(candidates)
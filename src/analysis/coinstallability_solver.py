@@ -0,0 +1,480 @@
+#!/usr/bin/python3
+"""
+Package Co-Installability Solver
+CDCL SAT core answering "can these packages be installed together" under assumptions
+"""
+
+import sys
+import json
+import time
+import heapq
+from collections import defaultdict
+from graph_utils import load_dependency_data, adjacency_csr
+from conflict_store import EXPLICIT, REPLACES
+
+def luby(i):
+    """i-th element (0-based) of the Luby restart sequence 1 1 2 1 1 2 4 ..."""
+    size, seq = 1, 0
+    while size < i + 1:
+        seq += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        seq -= 1
+        i = i % size
+    return 2 ** seq
+
+class CDCLSolver:
+    """
+    Conflict-driven clause learning SAT solver.
+
+    Variables are 1..num_vars, literals are ±var. Two watched literals per
+    clause, first-UIP learning, VSIDS branching with phase saving, Luby
+    restarts and solving under assumptions. Learned clauses are implied
+    by the base clauses, so they are kept between `solve` calls.
+
+    While every base clause has a negative literal (true of dependency and
+    conflict clauses), setting all unassigned variables false completes a
+    model once no clause of a true variable is left open. The search then
+    only branches on open clauses instead of on every variable, so a query
+    costs about the size of the install set rather than of the repository.
+    """
+
+    def __init__(self, num_vars):
+        self.num_vars = num_vars
+        self.clauses = []
+        self.learnts = []
+        self.watches = [[] for _ in range(2 * num_vars + 2)]
+        self.assigns = [0] * (num_vars + 1)
+        self.level = [0] * (num_vars + 1)
+        self.reason = [None] * (num_vars + 1)
+        self.phase = [-1] * (num_vars + 1)  # Prefer leaving packages out
+        self.activity = [0.0] * (num_vars + 1)
+        self.var_inc = 1.0
+        self.var_decay = 0.95
+        self.heap = [(0.0, v) for v in range(1, num_vars + 1)]
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.ok = True
+        self.max_learnts = 2000
+        self.restart_unit = 100
+        self.conflicts = 0
+        self.failed_assumptions = []
+        self.neg_occurrences = [[] for _ in range(num_vars + 1)]
+        self.lazy_completion = True
+        self.scan = 0
+
+    @staticmethod
+    def _index(lit):
+        return 2 * lit if lit > 0 else -2 * lit + 1
+
+    def value(self, lit):
+        a = self.assigns[abs(lit)]
+        return a if lit > 0 else -a
+
+    def decision_level(self):
+        return len(self.trail_lim)
+
+    def _enqueue(self, lit, reason):
+        v = abs(lit)
+        self.assigns[v] = 1 if lit > 0 else -1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def _watch(self, ci):
+        c = self.clauses[ci]
+        self.watches[self._index(c[0])].append(ci)
+        self.watches[self._index(c[1])].append(ci)
+
+    def add_clause(self, lits):
+        """Add a base clause at decision level 0; returns False if the formula became unsatisfiable."""
+        if not self.ok:
+            return False
+        self._cancel_until(0)
+        clause = []
+        for lit in sorted(set(lits), key=abs):
+            if -lit in clause or self.value(lit) == 1:
+                return True  # Tautology or already satisfied
+            if self.value(lit) == 0:
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self._enqueue(clause[0], None)
+            self.ok = self._propagate() is None
+        else:
+            self.clauses.append(clause)
+            ci = len(self.clauses) - 1
+            self._watch(ci)
+            negatives = [-lit for lit in clause if lit < 0]
+            for v in negatives:
+                self.neg_occurrences[v].append(ci)
+            if not negatives:
+                self.lazy_completion = False
+        return self.ok
+
+    def _propagate(self):
+        """Unit propagation over the trail; returns a conflicting clause index or None."""
+        trail, clauses, watches, assigns = self.trail, self.clauses, self.watches, self.assigns
+        while self.qhead < len(trail):
+            p = trail[self.qhead]
+            self.qhead += 1
+            false_lit = -p
+            fi = self._index(false_lit)
+            ws = watches[fi]
+            watches[fi] = kept = []
+            for k, ci in enumerate(ws):
+                c = clauses[ci]
+                if c is None:
+                    continue  # Deleted learned clause
+                if c[0] == false_lit:
+                    c[0], c[1] = c[1], c[0]
+                first = c[0]
+                a = assigns[abs(first)]
+                if (a if first > 0 else -a) == 1:
+                    kept.append(ci)
+                    continue
+                for m in range(2, len(c)):
+                    lit = c[m]
+                    a = assigns[abs(lit)]
+                    if (a if lit > 0 else -a) != -1:
+                        c[1], c[m] = lit, false_lit
+                        watches[self._index(lit)].append(ci)
+                        break
+                else:
+                    kept.append(ci)
+                    a = assigns[abs(first)]
+                    if (a if first > 0 else -a) == -1:
+                        kept.extend(ws[k + 1:])
+                        self.qhead = len(trail)
+                        return ci
+                    self._enqueue(first, ci)
+        return None
+
+    def _bump(self, v):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.var_inc *= 1e-100
+            self.heap = [(-self.activity[u], u) for u in range(1, self.num_vars + 1) if self.assigns[u] == 0]
+            heapq.heapify(self.heap)
+        elif self.assigns[v] == 0:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def _analyze(self, confl):
+        """First-UIP conflict analysis; returns (learned clause, backjump level)."""
+        seen = set()
+        learnt = [None]
+        counter = 0
+        p = None
+        idx = len(self.trail) - 1
+        current = self.decision_level()
+        while True:
+            clause = self.clauses[confl]
+            for q in (clause if p is None else clause[1:]):
+                v = abs(q)
+                if v not in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self._bump(v)
+                    if self.level[v] == current:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while abs(self.trail[idx]) not in seen:
+                idx -= 1
+            p = self.trail[idx]
+            idx -= 1
+            confl = self.reason[abs(p)]
+            counter -= 1
+            if counter == 0:
+                break
+        learnt[0] = -p
+
+        if len(learnt) == 1:
+            return learnt, 0
+        # Watch the highest-level literal second so the clause is unit after backjumping
+        best = max(range(1, len(learnt)), key=lambda k: self.level[abs(learnt[k])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def _analyze_final(self, lit):
+        """Assumptions responsible for assumption `lit` being false."""
+        failed = {abs(lit)}
+        if self.decision_level() == 0:
+            return [abs(lit)]
+        seen = {abs(lit)}
+        for i in range(len(self.trail) - 1, self.trail_lim[0] - 1, -1):
+            v = abs(self.trail[i])
+            if v in seen:
+                r = self.reason[v]
+                if r is None:
+                    failed.add(v)
+                else:
+                    for q in self.clauses[r][1:]:
+                        if self.level[abs(q)] > 0:
+                            seen.add(abs(q))
+        return sorted(failed)
+
+    def _cancel_until(self, level):
+        if self.decision_level() <= level:
+            return
+        for lit in self.trail[self.trail_lim[level]:]:
+            v = abs(lit)
+            self.phase[v] = 1 if lit > 0 else -1
+            self.assigns[v] = 0
+            self.reason[v] = None
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+        # A clause seen as satisfied may have lost its true literal, so rescan from the start
+        self.scan = 0
+        if len(self.heap) > 4 * self.num_vars:
+            self.heap = [(-self.activity[v], v) for v in range(1, self.num_vars + 1) if self.assigns[v] == 0]
+            heapq.heapify(self.heap)
+
+    def _open_clause_literal(self):
+        """
+        Branch literal for the first clause the all-false completion would violate.
+
+        Scans the clauses of variables that became true since the last
+        call; returns None when the completion is a model.
+        """
+        trail, assigns, clauses = self.trail, self.assigns, self.clauses
+        while self.scan < len(trail):
+            lit = trail[self.scan]
+            if lit > 0:
+                for ci in self.neg_occurrences[lit]:
+                    best = None
+                    for q in clauses[ci]:
+                        a = assigns[abs(q)]
+                        if (a if q > 0 else -a) == 1 or (q < 0 and a == 0):
+                            break  # Satisfied now or by the completion
+                        if q > 0 and a == 0 and (best is None or self.activity[q] > self.activity[best]):
+                            best = q
+                    else:
+                        return best
+            self.scan += 1
+        return None
+
+    def _pick_branch(self):
+        while self.heap:
+            _, v = heapq.heappop(self.heap)
+            if self.assigns[v] == 0:
+                return v * self.phase[v]
+        return None
+
+    def _reduce_db(self):
+        """Drop the longer half of the learned clauses that are not currently reasons."""
+        def locked(ci):
+            c = self.clauses[ci]
+            return self.reason[abs(c[0])] == ci and self.value(c[0]) == 1
+        self.learnts.sort(key=lambda ci: len(self.clauses[ci]))
+        keep = self.learnts[:len(self.learnts) // 2]
+        for ci in self.learnts[len(self.learnts) // 2:]:
+            if locked(ci) or len(self.clauses[ci]) <= 2:
+                keep.append(ci)
+            else:
+                self.clauses[ci] = None
+        self.learnts = keep
+
+    def solve(self, assumptions=()):
+        """
+        Search for a model with every assumption literal true.
+
+        Returns True/False. On False under assumptions, `failed_assumptions`
+        holds the subset of assumption variables that caused it.
+        """
+        self.failed_assumptions = []
+        self._cancel_until(0)
+        self.phase = [-1] * (self.num_vars + 1)  # Each query starts from the smallest install set
+        if not self.ok:
+            return False
+        restarts = 0
+        budget = luby(restarts) * self.restart_unit
+        while True:
+            confl = self._propagate()
+            if confl is not None:
+                self.conflicts += 1
+                budget -= 1
+                if self.decision_level() == 0:
+                    self.ok = False
+                    return False
+                learnt, backjump = self._analyze(confl)
+                self._cancel_until(backjump)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    self.clauses.append(learnt)
+                    ci = len(self.clauses) - 1
+                    self.learnts.append(ci)
+                    self._watch(ci)
+                    self._enqueue(learnt[0], ci)
+                self.var_inc /= self.var_decay
+                continue
+
+            if budget <= 0:
+                restarts += 1
+                budget = luby(restarts) * self.restart_unit
+                self._cancel_until(0)
+                continue
+            if len(self.learnts) > self.max_learnts + len(self.trail):
+                self._reduce_db()
+
+            next_lit = None
+            while self.decision_level() < len(assumptions):
+                p = assumptions[self.decision_level()]
+                if self.value(p) == 1:
+                    self.trail_lim.append(len(self.trail))  # Already true: empty decision level
+                elif self.value(p) == -1:
+                    self.failed_assumptions = self._analyze_final(p)
+                    return False
+                else:
+                    next_lit = p
+                    break
+            if next_lit is None:
+                next_lit = self._open_clause_literal() if self.lazy_completion else self._pick_branch()
+                if next_lit is None:
+                    return True  # Every clause satisfied (unassigned variables count as false)
+            self.trail_lim.append(len(self.trail))
+            self._enqueue(next_lit, None)
+
+    def model(self):
+        """Variables true in the last model (unassigned variables are false)."""
+        return [v for v in range(1, self.num_vars + 1) if self.assigns[v] == 1]
+
+class CoinstallabilitySolver:
+    """
+    A snapshot's dependency and conflict constraints, encoded once.
+
+    Package i is variable i + 1. Each dependency string becomes
+    ¬i ∨ provider₁ ∨ … (every package that resolved it, so provider
+    choices stay open); explicit and replaces conflicts become ¬a ∨ ¬b,
+    already filtered by installed versions. With virtual_exclusive the
+    providers of one virtual are also limited to at most one, matching
+    the incompatibility matrix's view of virtual conflicts.
+    """
+
+    def __init__(self, dep_data, store, hyperedges=None, virtual_exclusive=False):
+        self.packages = dep_data['packages']
+        self.pkg_to_idx = dep_data['pkg_to_idx']
+        n = len(self.packages)
+        self.sat = CDCLSolver(n)
+        self.skipped_dependencies = 0
+
+        if 'dependency_edges' in dep_data:
+            groups = defaultdict(list)
+            for i, j, via, dep in dep_data['dependency_edges']:
+                groups[(i, dep)].append(j)
+            for (i, dep), providers in groups.items():
+                self.sat.add_clause([-(i + 1)] + [j + 1 for j in providers])
+            self.skipped_dependencies = sum(len(v) for v in dep_data.get('unresolved_dependencies', {}).values())
+        else:
+            # Older snapshots only have the adjacency matrix: every edge is a hard requirement
+            A = adjacency_csr(dep_data).tocoo()
+            for i, j in zip(A.row.tolist(), A.col.tolist()):
+                self.sat.add_clause([-(i + 1), j + 1])
+
+        rows, cols, _, _ = store.edges(kind=EXPLICIT | REPLACES)
+        for a, b in zip(rows.tolist(), cols.tolist()):
+            self.sat.add_clause([-(a + 1), -(b + 1)])
+        self.num_conflicts = len(rows)
+
+        if virtual_exclusive and hyperedges is not None:
+            H = hyperedges.H
+            for v in range(H.shape[0]):
+                members = H.indices[H.indptr[v]:H.indptr[v + 1]].tolist()
+                for x in range(len(members)):
+                    for y in range(x + 1, len(members)):
+                        self.sat.add_clause([-(members[x] + 1), -(members[y] + 1)])
+
+        self.queries = 0
+
+    def can_install(self, packages):
+        """
+        Check whether the named packages can be installed together.
+
+        Returns (True, install_set) or (False, culprits) where culprits is
+        the subset of the requested packages responsible for the failure.
+        """
+        self.queries += 1
+        missing = [p for p in packages if p not in self.pkg_to_idx]
+        if missing:
+            return False, missing
+        assumptions = [self.pkg_to_idx[p] + 1 for p in packages]
+        if self.sat.solve(assumptions):
+            return True, [self.packages[v - 1] for v in self.sat.model()]
+        return False, [self.packages[v - 1] for v in self.sat.failed_assumptions]
+
+    def check_roles(self, roles):
+        """Validate {role: [packages]} definitions; returns {role: result dict}."""
+        results = {}
+        for role, packages in roles.items():
+            missing = [p for p in packages if p not in self.pkg_to_idx]
+            ok, detail = self.can_install(packages)
+            results[role] = {
+                'installable': ok,
+                'install_size': len(detail) if ok else None,
+                'missing': missing,
+                'culprits': [] if ok or missing else detail
+            }
+        return results
+
+def load_solver(data_file='/home/zack/dependency_data.json',
+                conflict_file='/home/zack/conflict_analysis.json',
+                virtual_exclusive=False):
+    """Build a CoinstallabilitySolver for a snapshot and its conflict analysis."""
+    from incompatibility_matrix_analysis import build_conflict_store
+    dep_data = load_dependency_data(data_file)
+    with open(conflict_file, 'r') as f:
+        conflict_data = json.load(f)
+    store, hyperedges = build_conflict_store(dep_data, conflict_data)
+    return CoinstallabilitySolver(dep_data, store, hyperedges, virtual_exclusive)
+
+def validate_roles(roles_file, data_file='/home/zack/dependency_data.json',
+                   conflict_file='/home/zack/conflict_analysis.json',
+                   output_file='/home/zack/role_validation.json',
+                   virtual_exclusive=False):
+    """Check every host role in a {role: [packages]} JSON file against the snapshot."""
+    print("="*70)
+    print("HOST ROLE CO-INSTALLABILITY CHECK")
+    print("="*70)
+
+    solver = load_solver(data_file, conflict_file, virtual_exclusive)
+    print(f"\nEncoded {len(solver.packages)} packages, {len(solver.sat.clauses)} clauses "
+          f"({solver.num_conflicts} conflicts)")
+
+    with open(roles_file, 'r') as f:
+        roles = json.load(f)
+
+    start = time.time()
+    results = solver.check_roles(roles)
+    elapsed = time.time() - start
+
+    failed = [role for role, r in results.items() if not r['installable']]
+    print(f"\nChecked {len(roles)} roles in {elapsed:.3f}s "
+          f"({len(roles) / elapsed if elapsed > 0 else 0:.0f} queries/s)")
+    for role in failed:
+        if results[role]['missing']:
+            print(f"   ✗ {role}: not in snapshot: {', '.join(results[role]['missing'])}")
+        else:
+            print(f"   ✗ {role}: conflict among {', '.join(results[role]['culprits'])}")
+    if not failed:
+        print("   ✓ All roles installable")
+
+    with open(output_file, 'w') as f:
+        json.dump({'roles': results, 'failed': failed, 'learned_clauses': len(solver.sat.learnts)}, f, indent=2)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return results
+
+if __name__ == "__main__":
+    # Usage: coinstallability_solver.py <roles.json>      (exit status 1 if any role fails)
+    if len(sys.argv) > 1:
+        results = validate_roles(sys.argv[1])
+        sys.exit(0 if all(r['installable'] for r in results.values()) else 1)
@@ -4,78 +4,159 @@ Package Conflict and Incompatibility Analysis
 Identifies packages that conflict, have circular dependencies, or version mismatches
 """
 
-import subprocess
-import json
+import os
 import re
+import sys
+import json
 from collections import defaultdict
 import numpy as np
+from graph_utils import adjacency_csr, condensation, component_closure, shortest_dependency_path
+from cycle_analysis import analyze_cycle_structure, cycle_results
+from version_compare import parse_constraint, satisfies
+from progress_events import Stage
+
+# The pacman record parser lives with the collection scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'collection'))
+from dependency_analysis import get_package_info
+
+def get_package_relations(package, stage=None):
+    """
+    (conflicts, provides, replaces) of a package from a single `pacman -Qi`.
+
+    Parsed by the collector's parse_pacman_info, so wrapped values keep
+    their continuation lines; all three are [] if pacman failed.
+    """
+    info = get_package_info(package, stage) or {}
+    return info.get('Conflicts With', []), info.get('Provides', []), info.get('Replaces', [])
+
+def conflict_targets(packages, provides_map, versions=None):
+    """Name → [(package, installed or provided version, provided)] that a conflict declaration can hit."""
+    known = set(packages)
+    targets = defaultdict(list)
+    for pkg in packages:
+        targets[pkg].append((pkg, versions.get(pkg) if versions else None, False))
+    for provided, providers in provides_map.items():
+        name, _, version = provided.partition('=')
+        for pkg in providers:
+            if pkg in known:
+                targets[name].append((pkg, version or None, True))
+    return targets
+
+def declared_conflicts(declarer, constraints, targets, scheme='alpm'):
+    """
+    [(target package, constraint)] hit by one package's conflict declarations.
+
+    A declaration hits a package by name or through something it provides.
+    Versioned constraints only count when the installed (or provided)
+    version satisfies them (compared under the snapshot's version
+    scheme); an unversioned provision never does.
+    """
+    hits = []
+    for constraint in constraints:
+        name, op, version = parse_constraint(constraint)
+        for target, installed, provided in targets.get(name, []):
+            if target == declarer:
+                continue
+            if op is not None:
+                if installed is None and provided:
+                    continue
+                if installed is not None and not satisfies(installed, op, version, scheme):
+                    continue
+            hits.append((target, constraint))
+    return hits
+
+def build_conflict_index(conflicts, packages, pkg_to_idx, provides_map, versions=None, scheme='alpm'):
+    """Inverted conflict index: target package index → [(declarer index, constraint)]."""
+    targets = conflict_targets(packages, provides_map, versions)
+    index = defaultdict(list)
+    for declarer, constraints in conflicts.items():
+        if declarer not in pkg_to_idx:
+            continue
+        for target, constraint in declared_conflicts(declarer, constraints, targets, scheme):
+            index[pkg_to_idx[target]].append((pkg_to_idx[declarer], constraint))
+    return index
+
+def closure_conflicts(A, conflict_index):
+    """
+    Conflict declarations between a package and its own dependency closure.
+
+    Uses the SCC reachability index: for each indexed (target, declarer)
+    pair, checks whether either lies in the other's closure. Returns
+    (parent, dependency, constraint, path, declared_by_dependency) with
+    path running from parent to the dependency.
+    """
+    num_components, labels, C = condensation(A)
+    R = component_closure(C)
+
+    def in_closure(u, v):
+        row = R.indices[R.indptr[labels[u]]:R.indptr[labels[u] + 1]]
+        k = np.searchsorted(row, labels[v])
+        return k < len(row) and row[k] == labels[v]
+
+    found = []
+    for t, declarations in conflict_index.items():
+        for d, constraint in declarations:
+            if in_closure(t, d):
+                found.append((t, d, constraint, shortest_dependency_path(A, t, d), True))
+            if in_closure(d, t):
+                found.append((d, t, constraint, shortest_dependency_path(A, d, t), False))
+    return found
+
+def chain_conflicts(A, packages, conflict_index):
+    """(incompatible_chains, chain_paths) by package name, as saved in the conflict results."""
+    incompatible_chains = []
+    chain_paths = []
+    for parent, dep, constraint, path, declared_by_dependency in closure_conflicts(A, conflict_index):
+        if declared_by_dependency:
+            reason = "parent conflicts with dependency" if len(path) == 2 else "parent conflicts with transitive dependency"
+        else:
+            reason = "package conflicts with its own dependency"
+        incompatible_chains.append((packages[parent], packages[dep], reason))
+        chain_paths.append({
+            'package': packages[parent],
+            'conflicts_with': packages[dep],
+            'constraint': constraint,
+            'reason': reason,
+            'path': [packages[k] for k in path]
+        })
+    return incompatible_chains, chain_paths
+
+def conflict_results(packages, conflicts, cycles, virtual_conflicts, replaces_map,
+                     incompatible_chains, chain_paths, query_failures=0):
+    """The JSON-ready conflict analysis results."""
+    circular_deps = [(packages[i], packages[j]) for i, j in cycles['mutual_pairs']]
+    dependency_cycles = cycle_results(cycles, packages)
+    return {
+        'explicit_conflicts': {k: v for k, v in conflicts.items()},
+        'circular_dependencies': circular_deps,
+        'dependency_cycles': dependency_cycles,
+        'virtual_package_conflicts': {k: v for k, v in virtual_conflicts.items() if len(v) > 1},
+        'replaces': {k: v for k, v in replaces_map.items()},
+        'incompatible_chains': incompatible_chains,
+        'incompatible_chain_paths': chain_paths,
+        'statistics': {
+            'packages_with_conflicts': len(conflicts),
+            'circular_dependency_pairs': len(circular_deps),
+            'cyclic_components': len(dependency_cycles['strongly_connected_components']),
+            'dependency_cycles': len(dependency_cycles['cycles']),
+            'feedback_edges': len(dependency_cycles['feedback_edges']),
+            'virtual_packages_with_multiple_providers': len([v for v in virtual_conflicts.values() if len(v) > 1]),
+            'packages_that_replace_others': len(replaces_map),
+            'incompatible_dependency_chains': len(incompatible_chains),
+            'pacman_query_failures': query_failures
+        }
+    }
 
-def get_package_conflicts(package):
-    """Get explicit conflicts declared by a package."""
-    try:
-        result = subprocess.run(
-            ['pacman', '-Qi', package],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                if line.startswith('Conflicts With'):
-                    conflicts_str = line.split(':', 1)[1].strip()
-                    if conflicts_str and conflicts_str != 'None':
-                        return [c.strip() for c in conflicts_str.split()]
-        return []
-    except:
-        return []
-
-def get_package_provides(package):
-    """Get what virtual packages this package provides."""
-    try:
-        result = subprocess.run(
-            ['pacman', '-Qi', package],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                if line.startswith('Provides'):
-                    provides_str = line.split(':', 1)[1].strip()
-                    if provides_str and provides_str != 'None':
-                        return [p.strip() for p in provides_str.split()]
-        return []
-    except:
-        return []
-
-def get_package_replaces(package):
-    """Get what packages this package replaces."""
-    try:
-        result = subprocess.run(
-            ['pacman', '-Qi', package],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                if line.startswith('Replaces'):
-                    replaces_str = line.split(':', 1)[1].strip()
-                    if replaces_str and replaces_str != 'None':
-                        return [r.strip() for r in replaces_str.split()]
-        return []
-    except:
-        return []
-
-def analyze_conflicts():
+def analyze_conflicts(data_file='/home/zack/dependency_data.json',
+                      output_file='/home/zack/conflict_analysis.json'):
     """Analyze all types of package conflicts."""
 
     # Load existing data
-    with open('/home/zack/dependency_data.json', 'r') as f:
+    with open(data_file, 'r') as f:
         data = json.load(f)
 
     packages = data['packages']
-    A = np.array(data['adjacency_matrix'])
+    A = adjacency_csr(data)
     n = len(packages)
 
     print("="*70)
@@ -87,29 +168,31 @@ def analyze_conflicts():
     replaces_map = defaultdict(list)
 
     print("\n[1/4] Scanning for explicit conflicts...")
-    for i, pkg in enumerate(packages):
-        if i % 100 == 0:
-            print(f"  Scanning package {i}/{n}: {pkg}")
+    # Snapshots that already carry the fields need no pacman queries
+    from_snapshot = all(field in data for field in ('conflicts', 'provides', 'replaces'))
+    if from_snapshot:
+        print("  Using conflicts, provides and replaces saved in the snapshot")
+    with Stage('conflict scan', total=n, every=100, label='package', quiet=from_snapshot) as stage:
+        for pkg in packages:
+            stage.advance(pkg)
+            if from_snapshot:
+                pkg_conflicts, pkg_provides, pkg_replaces = (data[field].get(pkg, [])
+                                                             for field in ('conflicts', 'provides', 'replaces'))
+            else:
+                pkg_conflicts, pkg_provides, pkg_replaces = get_package_relations(pkg, stage)
 
-        pkg_conflicts = get_package_conflicts(pkg)
-        if pkg_conflicts:
-            conflicts[pkg] = pkg_conflicts
+            if pkg_conflicts:
+                conflicts[pkg] = pkg_conflicts
 
-        pkg_provides = get_package_provides(pkg)
-        for provided in pkg_provides:
-            provides_map[provided].append(pkg)
+            for provided in pkg_provides:
+                provides_map[provided].append(pkg)
 
-        pkg_replaces = get_package_replaces(pkg)
-        if pkg_replaces:
-            replaces_map[pkg] = pkg_replaces
+            if pkg_replaces:
+                replaces_map[pkg] = pkg_replaces
 
     print("\n[2/4] Analyzing circular dependencies...")
-    circular_deps = []
-    for i in range(n):
-        for j in range(i+1, n):
-            # Check if both i depends on j AND j depends on i
-            if A[i, j] > 0 and A[j, i] > 0:
-                circular_deps.append((packages[i], packages[j]))
+    # Mutual pairs from A ∘ Aᵀ, plus longer cycles and a feedback edge set per SCC
+    cycles = analyze_cycle_structure(A)
 
     print("\n[3/4] Finding version conflicts...")
     # Find packages that provide the same thing (potential conflicts)
@@ -119,33 +202,18 @@ def analyze_conflicts():
             virtual_conflicts[virtual] = providers
 
     print("\n[4/4] Identifying incompatible dependency chains...")
-    # Find packages with mutually exclusive dependencies
-    incompatible_chains = []
-    for i in range(n):
-        deps_i = set(np.where(A[i, :] > 0)[0])
-        for dep_idx in deps_i:
-            # Check if this dependency conflicts with the parent package
-            dep_name = packages[dep_idx]
-            if packages[i] in conflicts.get(dep_name, []):
-                incompatible_chains.append((packages[i], dep_name, "parent conflicts with dependency"))
+    # Conflicts between a package and anything in its dependency closure, in either direction
+    conflict_index = build_conflict_index(conflicts, packages, data['pkg_to_idx'], provides_map, data.get('versions'),
+                                          data.get('version_scheme', 'alpm'))
+    incompatible_chains, chain_paths = chain_conflicts(A, packages, conflict_index)
 
     # Save results
-    results = {
-        'explicit_conflicts': {k: v for k, v in conflicts.items()},
-        'circular_dependencies': circular_deps,
-        'virtual_package_conflicts': {k: v for k, v in virtual_conflicts.items() if len(v) > 1},
-        'replaces': {k: v for k, v in replaces_map.items()},
-        'incompatible_chains': incompatible_chains,
-        'statistics': {
-            'packages_with_conflicts': len(conflicts),
-            'circular_dependency_pairs': len(circular_deps),
-            'virtual_packages_with_multiple_providers': len([v for v in virtual_conflicts.values() if len(v) > 1]),
-            'packages_that_replace_others': len(replaces_map),
-            'incompatible_dependency_chains': len(incompatible_chains)
-        }
-    }
+    results = conflict_results(packages, conflicts, cycles, virtual_conflicts, replaces_map,
+                               incompatible_chains, chain_paths, sum(stage.failures.values()))
+    circular_deps = results['circular_dependencies']
+    dependency_cycles = results['dependency_cycles']
 
-    with open('/home/zack/conflict_analysis.json', 'w') as f:
+    with open(output_file, 'w') as f:
         json.dump(results, f, indent=2)
 
     # Print summary
@@ -153,6 +221,10 @@ def analyze_conflicts():
     print("CONFLICT ANALYSIS RESULTS")
     print("="*70)
 
+    if stage.failures:
+        print(f"\n⚠ {sum(stage.failures.values())} pacman queries failed; affected packages may be missing conflicts:")
+        print(f"   {', '.join(sorted(set(stage.failed_items))[:10])}{' ...' if len(set(stage.failed_items)) > 10 else ''}")
+
     print(f"\n1. EXPLICIT CONFLICTS (via Conflicts With field):")
     print(f"   Total packages declaring conflicts: {len(conflicts)}")
     if conflicts:
@@ -174,6 +246,16 @@ def analyze_conflicts():
             print(f"     ... and {len(circular_deps) - 20} more")
     else:
         print(f"   ✓ No circular dependencies found!")
+    longer = [c for c in dependency_cycles['cycles'] if len(c) > 2]
+    print(f"   Cyclic components: {len(dependency_cycles['strongly_connected_components'])}, "
+          f"longer cycles (3+ packages): {len(longer)}"
+          f"{' (enumeration truncated)' if dependency_cycles['truncated'] else ''}")
+    for cycle in longer[:10]:
+        print(f"     • {' → '.join(cycle)} → {cycle[0]}")
+    if dependency_cycles['feedback_edges']:
+        print(f"   Breaking all cycles needs {len(dependency_cycles['feedback_edges'])} edge removals:")
+        for pkg1, pkg2 in dependency_cycles['feedback_edges'][:10]:
+            print(f"     • {pkg1} → {pkg2}")
 
     print(f"\n3. VIRTUAL PACKAGE CONFLICTS (multiple providers):")
     print(f"   Virtual packages with multiple providers: {len([v for v in virtual_conflicts.values() if len(v) > 1])}")
@@ -194,11 +276,11 @@ def analyze_conflicts():
     print(f"   Found: {len(incompatible_chains)}")
     if incompatible_chains:
         print(f"   Examples:")
-        for pkg1, pkg2, reason in incompatible_chains[:10]:
-            print(f"     • {pkg1} → {pkg2} ({reason})")
+        for chain in chain_paths[:10]:
+            print(f"     • {' → '.join(chain['path'])} ({chain['reason']}: {chain['constraint']})")
 
     print("\n" + "="*70)
-    print("Results saved to: conflict_analysis.json")
+    print(f"Results saved to: {output_file}")
     print("="*70)
 
     return results
@@ -0,0 +1,288 @@
+#!/usr/bin/python3
+"""
+Sparse Conflict Edge Store
+COO arrays of (i, j, kind bitflags, virtual id) replacing dense per-pair label matrices
+"""
+
+import json
+import numpy as np
+from scipy import sparse
+
+# Conflict kinds are bitflags so one pair can carry several reasons at once
+EXPLICIT = 1
+CIRCULAR = 2
+VIRTUAL = 4
+REPLACES = 8
+TRANSITIVE = 16
+UNSATISFIABLE = 32
+
+KIND_NAMES = {
+    EXPLICIT: 'explicit',
+    CIRCULAR: 'circular',
+    VIRTUAL: 'virtual',
+    REPLACES: 'replaces',
+    TRANSITIVE: 'transitive',
+    UNSATISFIABLE: 'unsatisfiable'
+}
+
+NO_VIRTUAL = -1
+
+def kind_labels(flags):
+    """Names of the kinds set in a bitflag value."""
+    return [name for bit, name in KIND_NAMES.items() if flags & bit]
+
+class ConflictStore:
+    """
+    Undirected conflict edges between package indices.
+
+    Edges are kept as parallel arrays with i < j. Adding edges only appends
+    to pending buffers; `coalesce()` merges duplicates by OR-ing their kinds
+    and keeps the lowest virtual id, so a pair appears once.
+    """
+
+    def __init__(self, n, virtuals=None):
+        self.n = n
+        self.virtuals = list(virtuals) if virtuals else []
+        self.virtual_to_id = {v: k for k, v in enumerate(self.virtuals)}
+        self.rows = np.array([], dtype=np.int32)
+        self.cols = np.array([], dtype=np.int32)
+        self.kinds = np.array([], dtype=np.uint8)
+        self.virtual_ids = np.array([], dtype=np.int32)
+        self._pending = []
+        self._scalars = ([], [], [], [])
+
+    def virtual_id(self, virtual):
+        """Id of a virtual package name, registering it if new."""
+        if virtual not in self.virtual_to_id:
+            self.virtual_to_id[virtual] = len(self.virtuals)
+            self.virtuals.append(virtual)
+        return self.virtual_to_id[virtual]
+
+    def add(self, i, j, kind, virtual=None):
+        """Add a single conflict edge between packages i and j."""
+        if i == j:
+            return
+        rows, cols, kinds, vids = self._scalars
+        rows.append(i)
+        cols.append(j)
+        kinds.append(kind)
+        vids.append(self.virtual_id(virtual) if virtual is not None else NO_VIRTUAL)
+
+    def add_edges(self, rows, cols, kind, virtual_ids=None):
+        """Add many edges of one kind at once (arrays of package indices)."""
+        rows = np.asarray(rows, dtype=np.int32)
+        cols = np.asarray(cols, dtype=np.int32)
+        keep = rows != cols
+        if virtual_ids is None:
+            virtual_ids = np.full(len(rows), NO_VIRTUAL, dtype=np.int32)
+        else:
+            virtual_ids = np.asarray(virtual_ids, dtype=np.int32)
+        self._pending.append((rows[keep], cols[keep],
+                              np.full(int(np.sum(keep)), kind, dtype=np.uint8),
+                              virtual_ids[keep]))
+
+    def coalesce(self):
+        """Merge pending edges into the canonical (i < j, unique) arrays."""
+        rows, cols, kinds, vids = self._scalars
+        if rows:
+            self._pending.append((np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32),
+                                  np.array(kinds, dtype=np.uint8), np.array(vids, dtype=np.int32)))
+            self._scalars = ([], [], [], [])
+        if not self._pending:
+            return self
+
+        parts = [(self.rows, self.cols, self.kinds, self.virtual_ids)] + self._pending
+        self._pending = []
+        r = np.concatenate([p[0] for p in parts])
+        c = np.concatenate([p[1] for p in parts])
+        k = np.concatenate([p[2] for p in parts])
+        v = np.concatenate([p[3] for p in parts])
+
+        lo = np.minimum(r, c).astype(np.int64)
+        hi = np.maximum(r, c).astype(np.int64)
+        keys = lo * self.n + hi
+        # Sort by pair, then virtual id so the first real id of a group is its minimum
+        order = np.lexsort((np.where(v < 0, np.iinfo(np.int32).max, v), keys))
+        keys, k, v = keys[order], k[order], v[order]
+        unique_keys, starts = np.unique(keys, return_index=True)
+
+        self.rows = (unique_keys // self.n).astype(np.int32)
+        self.cols = (unique_keys % self.n).astype(np.int32)
+        self.kinds = np.bitwise_or.reduceat(k, starts) if len(k) else k
+        self.virtual_ids = v[starts]
+        return self
+
+    def __len__(self):
+        self.coalesce()
+        return len(self.rows)
+
+    def mask(self, kind=None, exclude=0):
+        """Boolean edge mask: any of the `kind` bits set and none of the `exclude` bits."""
+        self.coalesce()
+        selected = np.ones(len(self.kinds), dtype=bool)
+        if kind is not None:
+            selected &= (self.kinds & kind) != 0
+        if exclude:
+            selected &= (self.kinds & exclude) == 0
+        return selected
+
+    def edges(self, kind=None, exclude=0):
+        """(rows, cols, kinds, virtual_ids) of the edges matching a kind filter."""
+        selected = self.mask(kind, exclude)
+        return self.rows[selected], self.cols[selected], self.kinds[selected], self.virtual_ids[selected]
+
+    def kind_counts(self):
+        """Number of edges carrying each kind (an edge with several kinds counts for each)."""
+        self.coalesce()
+        per_value = np.bincount(self.kinds, minlength=256)
+        values = np.arange(256)
+        return {name: int(per_value[(values & bit) != 0].sum()) for bit, name in KIND_NAMES.items()}
+
+    def to_csr(self, kind=None, exclude=0, symmetric=True):
+        """Sparse n × n 0/1 matrix of the selected edges."""
+        rows, cols, _, _ = self.edges(kind, exclude)
+        if symmetric:
+            rows, cols = np.concatenate([rows, cols]), np.concatenate([cols, rows])
+        return sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)),
+                                 shape=(self.n, self.n))
+
+    def row_kinds(self):
+        """Per-package OR of the kinds of all its edges."""
+        self.coalesce()
+        flags = np.zeros(self.n, dtype=np.uint8)
+        np.bitwise_or.at(flags, self.rows, self.kinds)
+        np.bitwise_or.at(flags, self.cols, self.kinds)
+        return flags
+
+    def nbytes(self):
+        """Memory held by the edge arrays."""
+        self.coalesce()
+        return self.rows.nbytes + self.cols.nbytes + self.kinds.nbytes + self.virtual_ids.nbytes
+
+    def to_dict(self):
+        """JSON-serialisable form (parallel lists plus the virtual name table)."""
+        self.coalesce()
+        return {
+            'num_packages': self.n,
+            'kind_flags': {name: bit for bit, name in KIND_NAMES.items()},
+            'virtuals': self.virtuals,
+            'rows': self.rows.tolist(),
+            'cols': self.cols.tolist(),
+            'kinds': self.kinds.tolist(),
+            'virtual_ids': self.virtual_ids.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        """Rebuild a store saved with `to_dict`."""
+        store = cls(d['num_packages'], d['virtuals'])
+        store.rows = np.array(d['rows'], dtype=np.int32)
+        store.cols = np.array(d['cols'], dtype=np.int32)
+        store.kinds = np.array(d['kinds'], dtype=np.uint8)
+        store.virtual_ids = np.array(d['virtual_ids'], dtype=np.int32)
+        return store
+
+    @classmethod
+    def load(cls, path, key='conflict_edges'):
+        """Load a store from a results JSON file."""
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f)[key])
+
+class ProviderHyperedges:
+    """
+    "At most one of these providers" constraints, one hyperedge per virtual package.
+
+    Stored as a sparse virtual × package incidence matrix H instead of the
+    k(k-1)/2 provider pairs each virtual would otherwise expand into.
+    """
+
+    def __init__(self, n, virtuals, H):
+        self.n = n
+        self.virtuals = list(virtuals)
+        self.H = sparse.csr_matrix(H, dtype=np.int32)
+        self.Ht = self.H.T.tocsr()
+        self.sizes = np.diff(self.H.indptr)
+        self.memberships = np.diff(self.Ht.indptr)
+        self._extra = None
+
+    @classmethod
+    def from_providers(cls, virtual_providers, pkg_to_idx):
+        """Build from {virtual: [providers]}, keeping virtuals with two or more installed providers."""
+        virtuals = []
+        indptr = [0]
+        indices = []
+        for virtual, providers in virtual_providers.items():
+            members = sorted({pkg_to_idx[p] for p in providers if p in pkg_to_idx})
+            if len(members) > 1:
+                virtuals.append(virtual)
+                indices.extend(members)
+                indptr.append(len(indices))
+        n = len(pkg_to_idx)
+        H = sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), np.array(indices, dtype=np.int32),
+                               np.array(indptr)), shape=(len(virtuals), n))
+        return cls(n, virtuals, H)
+
+    def __len__(self):
+        return len(self.virtuals)
+
+    def extra_coverage(self):
+        """
+        n × n matrix of how many extra hyperedges cover each pair (shared count - 1).
+
+        Only packages in two or more hyperedges can share more than one, so
+        the product is taken over that small subset.
+        """
+        if self._extra is None:
+            multi = np.where(self.memberships >= 2)[0]
+            HM = self.H[:, multi]
+            K = (HM.T @ HM).tocoo()
+            keep = (K.row != K.col) & (K.data > 1)
+            self._extra = sparse.csr_matrix(
+                (K.data[keep] - 1, (multi[K.row[keep]], multi[K.col[keep]])),
+                shape=(self.n, self.n)
+            )
+        return self._extra
+
+    def degrees(self):
+        """Distinct providers each package excludes through its hyperedges."""
+        counted = self.Ht @ np.maximum(self.sizes - 1, 0)
+        return counted - np.asarray(self.extra_coverage().sum(axis=1)).ravel()
+
+    def pair_count(self):
+        """Distinct package pairs excluded by at least one hyperedge."""
+        return int(np.sum(self.sizes * (self.sizes - 1) // 2) - self.extra_coverage().sum() // 2)
+
+    def shared(self, rows, cols):
+        """Boolean mask of the pairs (rows[k], cols[k]) that share a hyperedge."""
+        if not len(rows):
+            return np.zeros(0, dtype=bool)
+        return np.asarray(self.Ht[rows].multiply(self.Ht[cols]).sum(axis=1)).ravel() > 0
+
+    def neighbors(self, i):
+        """Packages excluded by package i through its hyperedges."""
+        vs = self.Ht.indices[self.Ht.indptr[i]:self.Ht.indptr[i + 1]]
+        if not len(vs):
+            return np.array([], dtype=np.int32)
+        members = np.unique(np.concatenate([self.H.indices[self.H.indptr[v]:self.H.indptr[v + 1]] for v in vs]))
+        return members[members != i]
+
+    def pairs_among(self, S):
+        """Distinct pairs inside the package set S excluded by some hyperedge."""
+        counts = np.asarray(self.H[:, S].sum(axis=1)).ravel()
+        return int(np.sum(counts * (counts - 1) // 2) - self.extra_coverage()[S][:, S].sum() // 2)
+
+    def expand(self, store):
+        """Materialise every hyperedge into pairwise VIRTUAL edges of a ConflictStore."""
+        for v, virtual in enumerate(self.virtuals):
+            members = self.H.indices[self.H.indptr[v]:self.H.indptr[v + 1]]
+            a, b = np.triu_indices(len(members), k=1)
+            vid = store.virtual_id(virtual)
+            store.add_edges(members[a], members[b], VIRTUAL, np.full(len(a), vid, dtype=np.int32))
+        return store.coalesce()
+
+    def to_dict(self, packages):
+        """{virtual: [providers]} for JSON output."""
+        return {
+            virtual: [packages[i] for i in self.H.indices[self.H.indptr[v]:self.H.indptr[v + 1]]]
+            for v, virtual in enumerate(self.virtuals)
+        }
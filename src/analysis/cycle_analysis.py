@@ -0,0 +1,308 @@
+#!/usr/bin/python3
+"""
+Dependency Cycle Analysis
+Per-SCC elementary cycle enumeration and feedback edge sets with time and count budgets
+"""
+
+import sys
+import json
+import time
+import heapq
+from collections import defaultdict
+import numpy as np
+from scipy.sparse import csgraph
+from graph_utils import load_dependency_data, adjacency_csr
+
+def mutual_pairs(A):
+    """Pairs (i, j), i < j, with i → j and j → i, from the sparse product A ∘ Aᵀ."""
+    M = A.multiply(A.T).tocoo()
+    keep = M.row < M.col
+    order = np.lexsort((M.col[keep], M.row[keep]))
+    return list(zip(M.row[keep][order].tolist(), M.col[keep][order].tolist()))
+
+def cyclic_components(A):
+    """Member lists of SCCs with more than one package (or a self loop)."""
+    num_components, labels = csgraph.connected_components(A, directed=True, connection='strong')
+    sizes = np.bincount(labels, minlength=num_components)
+    self_loops = set(np.where(A.diagonal() > 0)[0].tolist())
+    members = defaultdict(list)
+    for i in np.argsort(labels, kind='stable'):
+        if sizes[labels[i]] > 1 or i in self_loops:
+            members[int(labels[i])].append(int(i))
+    return sorted(members.values(), key=len, reverse=True)
+
+def component_successors(A, members):
+    """Adjacency restricted to one SCC: {node: [successors inside the SCC]}."""
+    inside = set(members)
+    return {u: [v for v in A.indices[A.indptr[u]:A.indptr[u + 1]].tolist() if v in inside] for u in members}
+
+def elementary_cycles(succ, max_length=None, max_cycles=None, deadline=None):
+    """
+    Enumerate elementary cycles of one SCC with Johnson's algorithm.
+
+    Each cycle is reported once, rooted at its smallest node. Without a
+    length limit Johnson's blocking sets keep the search output-linear;
+    with max_length the blocking is replaced by on-path marking, since
+    blocking is unsound once paths are cut short. Returns (cycles,
+    truncated) where truncated means a count or time budget was hit.
+    """
+    cycles = []
+    steps = 0
+    for s in sorted(succ):
+        blocked = {s}
+        B = defaultdict(set)
+        path = [s]
+        stack = [iter(succ[s])]
+        closed = [False]
+        while stack:
+            steps += 1
+            if deadline is not None and steps % 1000 == 0 and time.time() > deadline:
+                return cycles, True
+            v = path[-1]
+            advanced = False
+            for w in stack[-1]:
+                if w < s:
+                    continue
+                if w == s:
+                    cycles.append(list(path))
+                    closed[-1] = True
+                    if max_cycles is not None and len(cycles) >= max_cycles:
+                        return cycles, True
+                elif w not in blocked and (max_length is None or len(path) < max_length):
+                    path.append(w)
+                    stack.append(iter(succ[w]))
+                    closed.append(False)
+                    blocked.add(w)
+                    advanced = True
+                    break
+            if advanced:
+                continue
+
+            stack.pop()
+            path.pop()
+            found = closed.pop()
+            if max_length is not None:
+                blocked.discard(v)
+            elif found:
+                # Unblock v and everything waiting on it
+                pending = [v]
+                while pending:
+                    u = pending.pop()
+                    if u in blocked:
+                        blocked.discard(u)
+                        pending.extend(B[u])
+                        B[u].clear()
+            else:
+                for w in succ[v]:
+                    if w >= s:
+                        B[w].add(v)
+            if closed:
+                closed[-1] = closed[-1] or found
+    return cycles, False
+
+def _reaches(succ, removed, source, target):
+    """True if target is reachable from source without the removed edges."""
+    seen = {source}
+    stack = [source]
+    while stack:
+        u = stack.pop()
+        for v in succ[u]:
+            if (u, v) in removed:
+                continue
+            if v == target:
+                return True
+            if v in seen:
+                continue
+            seen.add(v)
+            stack.append(v)
+    return False
+
+def feedback_edges(succ, deadline=None):
+    """
+    Small set of edges whose removal makes one SCC acyclic.
+
+    Eades-Lin-Smyth greedy ordering (peel sinks and sources, otherwise
+    take the node with the largest out-in degree surplus, kept in
+    buckets by surplus so the ordering is near-linear); edges pointing
+    backwards in the ordering form the set. A second pass puts back every
+    edge that no longer closes a cycle, so the result is minimal.
+
+    Returns (edges, truncated): past the deadline the second pass stops
+    and the set is still a valid feedback set, just not minimal.
+    """
+    out_deg = {u: len(vs) for u, vs in succ.items()}
+    pred = defaultdict(list)
+    for u, vs in succ.items():
+        for v in vs:
+            pred[v].append(u)
+    in_deg = {u: len(pred[u]) for u in succ}
+    remaining = set(succ)
+    sinks = [u for u in succ if out_deg[u] == 0]
+    sources = [u for u in succ if in_deg[u] == 0]
+    # Surplus -> min-heap of nodes; entries go stale when a node's degrees change and are skipped
+    buckets = defaultdict(list)
+    for u in succ:
+        heapq.heappush(buckets[out_deg[u] - in_deg[u]], u)
+    top = max(buckets, default=0)
+    head, tail = [], []
+
+    def remove(u):
+        nonlocal top
+        remaining.discard(u)
+        for v in succ[u]:
+            if v in remaining:
+                in_deg[v] -= 1
+                if in_deg[v] == 0:
+                    sources.append(v)
+                heapq.heappush(buckets[out_deg[v] - in_deg[v]], v)
+                top = max(top, out_deg[v] - in_deg[v])
+        for p in pred[u]:
+            if p in remaining:
+                out_deg[p] -= 1
+                if out_deg[p] == 0:
+                    sinks.append(p)
+                heapq.heappush(buckets[out_deg[p] - in_deg[p]], p)
+
+    while remaining:
+        if sinks:
+            u = sinks.pop()
+            if u in remaining:
+                tail.append(u)
+                remove(u)
+            continue
+        if sources:
+            u = sources.pop()
+            if u in remaining:
+                head.append(u)
+                remove(u)
+            continue
+        while True:
+            bucket = buckets[top]
+            while bucket and (bucket[0] not in remaining or out_deg[bucket[0]] - in_deg[bucket[0]] != top):
+                heapq.heappop(bucket)
+            if bucket:
+                break
+            top -= 1
+        u = heapq.heappop(bucket)
+        head.append(u)
+        remove(u)
+
+    position = {u: k for k, u in enumerate(head + tail[::-1])}
+    removed = {(u, v) for u, vs in succ.items() for v in vs if position[v] <= position[u]}
+    for u, v in sorted(removed):
+        if deadline is not None and time.time() > deadline:
+            return sorted(removed), True
+        removed.discard((u, v))
+        if _reaches(succ, removed, v, u):
+            removed.add((u, v))
+    return sorted(removed), False
+
+def analyze_cycle_structure(A, max_length=6, max_cycles=10000, time_budget=10.0):
+    """
+    Mutual pairs, per-SCC cycles and feedback edges for a dependency graph.
+
+    max_cycles and time_budget are shared across all SCCs, largest SCC
+    last so small components are never starved by a huge one. The time
+    budget also bounds the feedback edge minimization; components it cuts
+    short keep a valid but non-minimal feedback set.
+    """
+    pairs = mutual_pairs(A)
+    components = cyclic_components(A)
+    deadline = time.time() + time_budget if time_budget is not None else None
+
+    cycles = []
+    truncated = False
+    fes = []
+    per_component = []
+    for members in sorted(components, key=len):
+        succ = component_successors(A, members)
+        budget = None if max_cycles is None else max_cycles - len(cycles)
+        if budget is not None and budget <= 0 or (deadline is not None and time.time() > deadline):
+            found, hit = [], True
+        else:
+            found, hit = elementary_cycles(succ, max_length, budget, deadline)
+        truncated = truncated or hit
+        cycles.extend(found)
+        edges, cut = feedback_edges(succ, deadline)
+        truncated = truncated or cut
+        fes.extend(edges)
+        per_component.append({'members': members, 'cycles': len(found), 'complete': not hit,
+                              'feedback_edges': edges, 'feedback_minimal': not cut})
+
+    return {
+        'mutual_pairs': pairs,
+        'components': per_component[::-1],
+        'cycles': cycles,
+        'feedback_edges': fes,
+        'truncated': truncated
+    }
+
+def cycle_results(structure, packages):
+    """Name-based, JSON-ready version of analyze_cycle_structure output."""
+    names = lambda idx: [packages[i] for i in idx]
+    return {
+        'strongly_connected_components': [
+            {
+                'packages': names(c['members']),
+                'cycles_found': c['cycles'],
+                'enumeration_complete': c['complete'],
+                'feedback_edges': [names(e) for e in c['feedback_edges']],
+                'feedback_edges_minimal': c['feedback_minimal']
+            }
+            for c in structure['components']
+        ],
+        'cycles': [names(c) for c in structure['cycles']],
+        'feedback_edges': [names(e) for e in structure['feedback_edges']],
+        'truncated': structure['truncated']
+    }
+
+def analyze_cycles(data_file='/home/zack/dependency_data.json',
+                   output_file='/home/zack/cycle_analysis.json',
+                   max_length=6, max_cycles=10000, time_budget=10.0):
+    """Run the cycle engine on a snapshot and save the results."""
+    data = load_dependency_data(data_file)
+    packages = data['packages']
+    A = adjacency_csr(data)
+
+    print("="*70)
+    print("DEPENDENCY CYCLE ANALYSIS")
+    print("="*70)
+
+    structure = analyze_cycle_structure(A, max_length, max_cycles, time_budget)
+    lengths = np.bincount([len(c) for c in structure['cycles']]) if structure['cycles'] else np.array([])
+
+    print(f"\n1. CYCLIC COMPONENTS:")
+    print(f"   SCCs with cycles: {len(structure['components'])}")
+    for c in structure['components'][:10]:
+        print(f"     • {len(c['members'])} packages, {c['cycles']} cycles, "
+              f"{len(c['feedback_edges'])} feedback edges: {', '.join(packages[i] for i in c['members'][:5])}"
+              f"{' ...' if len(c['members']) > 5 else ''}")
+
+    print(f"\n2. ELEMENTARY CYCLES (length ≤ {max_length}):")
+    print(f"   Mutual pairs (length 2): {len(structure['mutual_pairs'])}")
+    for k in range(3, len(lengths)):
+        if lengths[k]:
+            print(f"   Length {k}: {int(lengths[k])}")
+    if structure['truncated']:
+        print(f"   ⚠ Budget reached, enumeration or feedback edge minimization incomplete")
+
+    print(f"\n3. FEEDBACK EDGE SET:")
+    print(f"   Removing {len(structure['feedback_edges'])} edges makes the graph acyclic")
+    for u, v in structure['feedback_edges'][:15]:
+        print(f"     • {packages[u]} → {packages[v]}")
+
+    results = cycle_results(structure, packages)
+    results['mutual_pairs'] = [[packages[i], packages[j]] for i, j in structure['mutual_pairs']]
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return results
+
+if __name__ == "__main__":
+    max_length = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    results = analyze_cycles(max_length=max_length)
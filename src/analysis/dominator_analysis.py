@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+"""
+Dominator Tree Analysis of Package Dependencies
+Finds packages that are the sole gateway keeping other packages installed
+"""
+
+import json
+import numpy as np
+from graph_utils import load_dependency_data, adjacency_csr, source_component_members, explicit_packages
+
+def compute_immediate_dominators(A, roots):
+    """
+    Compute immediate dominators with the Cooper-Harvey-Kennedy algorithm.
+
+    The graph is rooted at a virtual node (index n) with an edge to every
+    root package. Returns idom of length n+1; idom[i] == -1 means package i
+    is unreachable from the roots, idom[i] == n means only the virtual root
+    dominates it.
+    """
+    n = A.shape[0]
+    root = n
+    indptr, indices = A.indptr, A.indices
+    roots = np.asarray(roots, dtype=np.int64)
+
+    # Iterative DFS from the virtual root to get a postorder numbering
+    postorder = []
+    visited = np.zeros(n + 1, dtype=bool)
+    visited[root] = True
+    stack = [(root, iter(roots.tolist()))]
+    while stack:
+        node, successors = stack[-1]
+        for succ in successors:
+            if not visited[succ]:
+                visited[succ] = True
+                stack.append((succ, iter(indices[indptr[succ]:indptr[succ + 1]].tolist())))
+                break
+        else:
+            stack.pop()
+            postorder.append(node)
+
+    po_num = np.full(n + 1, -1, dtype=np.int64)
+    po_num[postorder] = np.arange(len(postorder))
+    reverse_postorder = postorder[::-1]
+
+    # Predecessors restricted to reachable nodes; the virtual root precedes every root
+    At = A.tocsc()
+    root_set = set(roots.tolist())
+    preds = {}
+    for node in reverse_postorder[1:]:
+        p = [int(x) for x in At.indices[At.indptr[node]:At.indptr[node + 1]] if visited[x]]
+        if node in root_set:
+            p.append(root)
+        preds[node] = p
+
+    idom = np.full(n + 1, -1, dtype=np.int64)
+    idom[root] = root
+
+    def intersect(b1, b2):
+        while b1 != b2:
+            while po_num[b1] < po_num[b2]:
+                b1 = idom[b1]
+            while po_num[b2] < po_num[b1]:
+                b2 = idom[b2]
+        return b1
+
+    changed = True
+    while changed:
+        changed = False
+        for node in reverse_postorder[1:]:
+            new_idom = -1
+            for p in preds[node]:
+                if idom[p] == -1:
+                    continue
+                new_idom = p if new_idom == -1 else intersect(p, new_idom)
+            if idom[node] != new_idom:
+                idom[node] = new_idom
+                changed = True
+
+    return idom
+
+def dominator_tree_intervals(idom):
+    """
+    Number the dominator tree in DFS order.
+
+    Returns (tin, tout) so that package j is dominated by package i exactly
+    when tin[i] <= tin[j] < tout[i]. Unreachable packages get tin == -1.
+    """
+    size = len(idom)
+    root = size - 1
+    children = [[] for _ in range(size)]
+    for node in range(size - 1):
+        if idom[node] >= 0:
+            children[idom[node]].append(node)
+
+    tin = np.full(size, -1, dtype=np.int64)
+    tout = np.full(size, -1, dtype=np.int64)
+    counter = 0
+    stack = [(root, False)]
+    while stack:
+        node, done = stack.pop()
+        if done:
+            tout[node] = counter
+            continue
+        tin[node] = counter
+        counter += 1
+        stack.append((node, True))
+        for child in children[node]:
+            stack.append((child, False))
+
+    return tin, tout
+
+def dominated_packages(idom, tin, tout, idx):
+    """Packages orphaned when package idx is removed (its strict dominator subtree)."""
+    reachable = tin[:-1] >= 0
+    mask = reachable & (tin[:-1] > tin[idx]) & (tin[:-1] < tout[idx])
+    return np.where(mask)[0]
+
+def analyze_dominators(data_file='/home/zack/dependency_data.json',
+                       output_file='/home/zack/dominator_analysis.json',
+                       roots=None):
+    """Compute the dominator tree and the orphan set of every package at once."""
+    data = load_dependency_data(data_file)
+    packages = data['packages']
+    pkg_to_idx = data['pkg_to_idx']
+    n = len(packages)
+    A = adjacency_csr(data)
+
+    print("="*70)
+    print("DOMINATOR TREE ANALYSIS")
+    print("="*70)
+
+    explicit = explicit_packages(data)
+    if roots is None and explicit is not None:
+        root_indices = explicit
+        print(f"\nUsing {len(root_indices)} packages with install reason 'explicit' as roots")
+    elif roots is None:
+        root_indices = source_component_members(A)
+        print(f"\nNo explicit roots given, using {len(root_indices)} packages nothing depends on")
+    else:
+        root_indices = np.array([pkg_to_idx[p] for p in roots if p in pkg_to_idx], dtype=np.int64)
+        print(f"\nUsing {len(root_indices)} explicitly installed packages as roots")
+
+    print("\n[1/3] Computing immediate dominators...")
+    idom = compute_immediate_dominators(A, root_indices)
+
+    print("\n[2/3] Numbering dominator tree...")
+    tin, tout = dominator_tree_intervals(idom)
+    reachable = tin[:-1] >= 0
+    # Subtree size minus the package itself = packages orphaned by removing it
+    orphaned_counts = np.where(reachable, (tout[:-1] - tin[:-1]) - 1, 0)
+
+    print("\n[3/3] Ranking gateway packages...")
+    top_indices = np.argsort(orphaned_counts)[-20:][::-1]
+    depth = np.zeros(n + 1, dtype=np.int64)
+    for node in np.argsort(tin[:-1]):
+        if tin[node] >= 0 and idom[node] != n:
+            depth[node] = depth[idom[node]] + 1
+
+    print("\n" + "="*70)
+    print("DOMINATOR ANALYSIS RESULTS")
+    print("="*70)
+
+    print(f"\n1. DOMINATOR TREE PROPERTIES:")
+    print(f"   Packages reachable from roots: {int(np.sum(reachable))}")
+    print(f"   Unreachable (already orphaned): {int(n - np.sum(reachable))}")
+    print(f"   Packages dominated only by the root: {int(np.sum(idom[:-1] == n))}")
+    print(f"   Maximum dominator tree depth: {int(np.max(depth[:-1])) if n else 0}")
+
+    print(f"\n2. TOP 20 GATEWAY PACKAGES (removing X orphans N packages):")
+    print(f"   {'Package':<35} {'Orphans':<10} {'Examples'}")
+    print(f"   {'-'*70}")
+    for idx in top_indices:
+        if orphaned_counts[idx] == 0:
+            break
+        examples = [packages[j] for j in dominated_packages(idom, tin, tout, idx)[:3]]
+        print(f"   {packages[idx]:<35} {int(orphaned_counts[idx]):<10} {', '.join(examples)}")
+
+    # Save results
+    results = {
+        'roots': [packages[i] for i in root_indices],
+        'immediate_dominators': {
+            packages[i]: (packages[idom[i]] if idom[i] != n else None)
+            for i in range(n) if idom[i] >= 0
+        },
+        'orphaned_by_removal': {
+            packages[i]: [packages[j] for j in dominated_packages(idom, tin, tout, i)]
+            for i in range(n) if orphaned_counts[i] > 0
+        },
+        'unreachable_packages': [packages[i] for i in range(n) if not reachable[i]],
+        'statistics': {
+            'reachable_packages': int(np.sum(reachable)),
+            'gateway_packages': int(np.sum(orphaned_counts > 0)),
+            'max_orphans_single_removal': int(np.max(orphaned_counts)) if n else 0,
+            'max_dominator_depth': int(np.max(depth[:-1])) if n else 0
+        }
+    }
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return idom, results
+
+if __name__ == "__main__":
+    idom, results = analyze_dominators()
@@ -0,0 +1,432 @@
+#!/usr/bin/python3
+"""
+Dynamic Dependency Graph
+Mutable graph that incrementally maintains SCCs, condensation order and the closure index
+"""
+
+import sys
+import time
+import heapq
+import numpy as np
+from scipy import sparse
+from graph_utils import load_dependency_data, adjacency_csr, condensation, topological_generations
+
+class DynamicDependencyGraph:
+    """
+    Dependency graph supporting add/remove of edges and packages.
+
+    Invariants kept after every operation:
+      - comp_of[i] is the SCC id of package i
+      - ord[c] is a topological position: if component x depends on
+        component y then ord[x] < ord[y] (Pearce-Kelly ordering)
+      - closure[c] is a bitset (Python int) of every package reachable
+        from component c, members included
+    Updates only visit the components whose order or closure can change.
+    """
+
+    def __init__(self, packages=(), edges=()):
+        self.names = []
+        self.name_to_idx = {}
+        self.alive = []
+        self.succ = []
+        self.pred = []
+        self.comp_of = []
+        self.members = {}
+        self.ord = {}
+        self.closure = {}
+        self._next_comp = 0
+
+        for name in packages:
+            self._new_package(name)
+        for u, v in edges:
+            self.succ[u].add(v)
+            self.pred[v].add(u)
+        self._rebuild()
+
+    @classmethod
+    def from_dependency_data(cls, data_file):
+        """Build the engine from a dependency_data.json snapshot."""
+        data = load_dependency_data(data_file)
+        coo = adjacency_csr(data).tocoo()
+        return cls(data['packages'], zip(coo.row.tolist(), coo.col.tolist()))
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def _new_package(self, name):
+        idx = len(self.names)
+        self.names.append(name)
+        self.name_to_idx[name] = idx
+        self.alive.append(True)
+        self.succ.append(set())
+        self.pred.append(set())
+        self.comp_of.append(-1)
+        return idx
+
+    def _new_comp(self, nodes):
+        c = self._next_comp
+        self._next_comp += 1
+        self.members[c] = set(nodes)
+        for node in nodes:
+            self.comp_of[node] = c
+        return c
+
+    def _rebuild(self):
+        """Full recompute, used once at construction."""
+        n = len(self.names)
+        rows = [u for u in range(n) for _ in self.succ[u]]
+        cols = [v for u in range(n) for v in self.succ[u]]
+        A = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+        num_components, labels, C = condensation(A)
+        wave = topological_generations(C)
+
+        self.members = {}
+        self.ord = {}
+        self.closure = {}
+        self._next_comp = num_components
+        for c in range(num_components):
+            self.members[c] = set()
+        for i in range(n):
+            self.comp_of[i] = int(labels[i])
+            self.members[int(labels[i])].add(i)
+
+        # Dependents (higher wave) get lower positions
+        for position, c in enumerate(np.argsort(-wave, kind='stable')):
+            self.ord[int(c)] = position
+        for c in np.argsort(wave, kind='stable'):
+            c = int(c)
+            bits = self._member_bits(c)
+            for d in C.indices[C.indptr[c]:C.indptr[c + 1]]:
+                bits |= self.closure[int(d)]
+            self.closure[c] = bits
+
+    # ------------------------------------------------------------------
+    # Component helpers
+    # ------------------------------------------------------------------
+
+    def _member_bits(self, c):
+        bits = 0
+        for node in self.members[c]:
+            bits |= 1 << node
+        return bits
+
+    def _comp_succ(self, c):
+        return {self.comp_of[v] for node in self.members[c] for v in self.succ[node]} - {c}
+
+    def _comp_pred(self, c):
+        return {self.comp_of[u] for node in self.members[c] for u in self.pred[node]} - {c}
+
+    def _recompute_closure(self, c):
+        bits = self._member_bits(c)
+        for d in self._comp_succ(c):
+            bits |= self.closure[d]
+        return bits
+
+    def _tarjan(self, nodes):
+        """Iterative Tarjan restricted to `nodes`; SCCs come out sinks first."""
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        sccs = []
+        counter = 0
+        for start in nodes:
+            if start in index:
+                continue
+            work = [(start, iter(self.succ[start]))]
+            index[start] = lowlink[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, successors = work[-1]
+                advanced = False
+                for succ in successors:
+                    if succ not in nodes:
+                        continue
+                    if succ not in index:
+                        index[succ] = lowlink[succ] = counter
+                        counter += 1
+                        stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, iter(self.succ[succ])))
+                        advanced = True
+                        break
+                    elif succ in on_stack:
+                        lowlink[node] = min(lowlink[node], index[succ])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    scc = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        scc.append(member)
+                        if member == node:
+                            break
+                    sccs.append(scc)
+        return sccs
+
+    def _propagate_closures(self, seeds):
+        """
+        Recompute closures starting at `seeds`, moving to predecessors only
+        while something changed. Components are processed in decreasing
+        topological position so successors are always final first.
+        """
+        heap = [(-self.ord[c], c) for c in seeds]
+        heapq.heapify(heap)
+        queued = set(seeds)
+        visited = 0
+        while heap:
+            _, c = heapq.heappop(heap)
+            queued.discard(c)
+            if c not in self.members:
+                continue
+            visited += 1
+            bits = self._recompute_closure(c)
+            if bits != self.closure.get(c):
+                self.closure[c] = bits
+                for p in self._comp_pred(c):
+                    if p not in queued:
+                        queued.add(p)
+                        heapq.heappush(heap, (-self.ord[p], p))
+        return visited
+
+    def _add_closure_upwards(self, c, bits):
+        """OR `bits` into c and its ancestors, stopping where it is already contained."""
+        stack = [c]
+        seen = {c}
+        while stack:
+            x = stack.pop()
+            if self.closure[x] | bits == self.closure[x]:
+                continue
+            self.closure[x] |= bits
+            for p in self._comp_pred(x):
+                if p not in seen:
+                    seen.add(p)
+                    stack.append(p)
+
+    def _renumber(self):
+        """Compact ord values to 0..C-1 keeping the current order."""
+        for position, c in enumerate(sorted(self.ord, key=self.ord.get)):
+            self.ord[c] = position
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add_package(self, name):
+        """Add an isolated package; returns its index."""
+        if name in self.name_to_idx and self.alive[self.name_to_idx[name]]:
+            return self.name_to_idx[name]
+        idx = self._new_package(name)
+        c = self._new_comp([idx])
+        # No edges yet, so any position is topologically valid
+        self.ord[c] = min(self.ord.values(), default=0) - 1
+        self.closure[c] = 1 << idx
+        return idx
+
+    def add_edge(self, u, v):
+        """Record that package u depends on package v."""
+        u, v = self._index(u), self._index(v)
+        if v in self.succ[u] or u == v:
+            return
+        self.succ[u].add(v)
+        self.pred[v].add(u)
+        cu, cv = self.comp_of[u], self.comp_of[v]
+        if cu == cv:
+            return
+
+        if self.ord[cu] < self.ord[cv]:
+            # Order already consistent; only closures upstream of u can grow
+            self._add_closure_upwards(cu, self.closure[cv])
+            return
+
+        # Pearce-Kelly: search the affected region between ord[cv] and ord[cu]
+        lower, upper = self.ord[cv], self.ord[cu]
+        forward = self._bounded_search(cv, self._comp_succ, lambda c: self.ord[c] <= upper)
+        backward = self._bounded_search(cu, self._comp_pred, lambda c: self.ord[c] >= lower)
+        pool = sorted(self.ord[c] for c in forward | backward)
+
+        if cu in forward:
+            # The new edge closes a cycle: everything on a v -> u path collapses into one SCC
+            cycle = forward & backward
+            merged_nodes = set().union(*(self.members[c] for c in cycle))
+            merged_closure = 0
+            for c in cycle:
+                merged_closure |= self.closure[c]
+                del self.members[c]
+                del self.ord[c]
+                del self.closure[c]
+            m = self._new_comp(merged_nodes)
+            # Ancestors take the lowest slots and descendants the highest, so
+            # neither moves past a component outside the searched region
+            before = sorted(backward - cycle, key=self.ord.get)
+            after = sorted(forward - cycle, key=self.ord.get)
+            for position, c in zip(pool, before):
+                self.ord[c] = position
+            for position, c in zip(pool[len(pool) - len(after):], after):
+                self.ord[c] = position
+            self.ord[m] = pool[len(before)]
+            self.closure[m] = merged_closure
+            for p in self._comp_pred(m):
+                self._add_closure_upwards(p, merged_closure)
+        else:
+            sequence = sorted(backward, key=self.ord.get) + sorted(forward, key=self.ord.get)
+            for position, c in zip(pool, sequence):
+                self.ord[c] = position
+            self._add_closure_upwards(cu, self.closure[cv])
+
+    def remove_edge(self, u, v):
+        """Remove the dependency of package u on package v."""
+        u, v = self._index(u), self._index(v)
+        if v not in self.succ[u]:
+            return
+        self.succ[u].discard(v)
+        self.pred[v].discard(u)
+        self._repair([u], split_comps={self.comp_of[u]} if self.comp_of[u] == self.comp_of[v] else set())
+
+    def remove_package(self, name):
+        """Remove a package and all of its edges."""
+        idx = self._index(name)
+        c = self.comp_of[idx]
+        preds = list(self.pred[idx])
+        for p in preds:
+            self.succ[p].discard(idx)
+        for s in self.succ[idx]:
+            self.pred[s].discard(idx)
+        self.succ[idx] = set()
+        self.pred[idx] = set()
+        self.alive[idx] = False
+        del self.name_to_idx[self.names[idx]]
+
+        self.members[c].discard(idx)
+        self.comp_of[idx] = -1
+        if not self.members[c]:
+            del self.members[c]
+            del self.ord[c]
+            del self.closure[c]
+            self._repair(preds, split_comps=set())
+        else:
+            self._repair(preds, split_comps={c})
+
+    def _repair(self, sources, split_comps):
+        """Re-split shrunken SCCs locally, then push closure changes upstream."""
+        seeds = {self.comp_of[s] for s in sources if self.comp_of[s] >= 0}
+        for c in split_comps:
+            if c not in self.members:
+                continue
+            pieces = self._tarjan(self.members[c])
+            if len(pieces) == 1:
+                seeds.add(c)
+                continue
+            base = self.ord.pop(c)
+            del self.members[c]
+            del self.closure[c]
+            seeds.discard(c)
+            # Tarjan emits sinks first; sinks need the largest positions
+            count = len(pieces)
+            for k, piece in enumerate(pieces):
+                p = self._new_comp(piece)
+                self.ord[p] = base + (count - 1 - k) / count
+                seeds.add(p)
+            self._renumber()
+        return self._propagate_closures(seeds)
+
+    def _bounded_search(self, start, neighbours, within):
+        found = {start}
+        stack = [start]
+        while stack:
+            c = stack.pop()
+            for d in neighbours(c):
+                if d not in found and within(d):
+                    found.add(d)
+                    stack.append(d)
+        return found
+
+    def _index(self, package):
+        if isinstance(package, str):
+            return self.name_to_idx[package]
+        return int(package)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def reaches(self, u, v):
+        """True if package u (transitively) depends on package v."""
+        u, v = self._index(u), self._index(v)
+        return bool(self.closure[self.comp_of[u]] >> v & 1)
+
+    def dependency_closure(self, package):
+        """Names of every package reachable from `package`, itself included."""
+        bits = self.closure[self.comp_of[self._index(package)]]
+        return [self.names[i] for i in range(bits.bit_length()) if bits >> i & 1]
+
+    def scc_of(self, package):
+        """Names of the packages sharing an SCC with `package`."""
+        return sorted(self.names[i] for i in self.members[self.comp_of[self._index(package)]])
+
+    def sccs(self):
+        """All SCCs as lists of package names."""
+        return [sorted(self.names[i] for i in m) for m in self.members.values()]
+
+    def install_order(self):
+        """Components in dependency-first order (the reverse of the topological positions)."""
+        return [sorted(self.names[i] for i in self.members[c])
+                for c in sorted(self.ord, key=self.ord.get, reverse=True)]
+
+    def apply_delta(self, added_packages=(), removed_packages=(), added_edges=(), removed_edges=()):
+        """Apply a snapshot delta given by package names; removals first."""
+        for u, v in removed_edges:
+            if u in self.name_to_idx and v in self.name_to_idx:
+                self.remove_edge(u, v)
+        for name in removed_packages:
+            if name in self.name_to_idx:
+                self.remove_package(name)
+        for name in added_packages:
+            self.add_package(name)
+        for u, v in added_edges:
+            self.add_edge(u, v)
+
+    def edge_names(self):
+        """Current edges as (package, dependency) name pairs."""
+        return {(self.names[u], self.names[v])
+                for u in range(len(self.names)) if self.alive[u] for v in self.succ[u]}
+
+def snapshot_delta(graph, data):
+    """Difference between the engine's current graph and a dependency_data.json dict."""
+    new_packages = set(data['packages'])
+    old_packages = set(graph.name_to_idx)
+    coo = adjacency_csr(data).tocoo()
+    new_edges = {(data['packages'][i], data['packages'][j]) for i, j in zip(coo.row, coo.col)}
+    old_edges = graph.edge_names()
+    return {
+        'added_packages': sorted(new_packages - old_packages),
+        'removed_packages': sorted(old_packages - new_packages),
+        'added_edges': sorted(new_edges - old_edges),
+        'removed_edges': sorted(old_edges - new_edges)
+    }
+
+if __name__ == "__main__":
+    # Usage: dynamic_graph.py <old dependency_data.json> <new dependency_data.json>
+    old_file = sys.argv[1] if len(sys.argv) > 1 else '/home/zack/dependency_data.json'
+    graph = DynamicDependencyGraph.from_dependency_data(old_file)
+    print(f"Loaded {len(graph.name_to_idx)} packages, {len(graph.members)} SCCs")
+
+    if len(sys.argv) > 2:
+        delta = snapshot_delta(graph, load_dependency_data(sys.argv[2]))
+        print(f"Delta: +{len(delta['added_packages'])}/-{len(delta['removed_packages'])} packages, "
+              f"+{len(delta['added_edges'])}/-{len(delta['removed_edges'])} edges")
+        start = time.time()
+        graph.apply_delta(**delta)
+        print(f"Applied incrementally in {time.time() - start:.3f}s")
+        nontrivial = [scc for scc in graph.sccs() if len(scc) > 1]
+        print(f"Now {len(graph.members)} SCCs, {len(nontrivial)} with more than one package")
+        for scc in sorted(nontrivial, key=len, reverse=True)[:10]:
+            print(f"  • {' ⇄ '.join(scc)}")
@@ -0,0 +1,215 @@
+#!/usr/bin/python3
+"""
+Fleet-Wide Snapshot Merging
+Merges package lists from many hosts into one shared package index and computes fleet aggregates
+"""
+
+import os
+import sys
+import json
+import numpy as np
+from scipy import sparse
+from graph_utils import load_dependency_data, adjacency_csr
+
+def parse_package_list(text):
+    """Parse `pacman -Q` style "name version" lines into package names."""
+    packages = []
+    for line in text.split('\n'):
+        if line.strip():
+            packages.append(line.split()[0])
+    return packages
+
+def load_host_snapshots(snapshot_dir):
+    """
+    Read every host snapshot in a directory.
+
+    `<host>.json` files are dependency_data.json snapshots (packages and
+    edges); `<host>.txt` files are plain package lists (membership only).
+    Returns a list of (host, packages, A) with A = None for plain lists.
+    """
+    hosts = []
+    for filename in sorted(os.listdir(snapshot_dir)):
+        host, ext = os.path.splitext(filename)
+        path = os.path.join(snapshot_dir, filename)
+        if ext == '.json':
+            data = load_dependency_data(path)
+            hosts.append((host, data['packages'], adjacency_csr(data)))
+        elif ext == '.txt':
+            with open(path, 'r') as f:
+                hosts.append((host, parse_package_list(f.read()), None))
+    return hosts
+
+def build_global_index(host_packages, existing_index=None):
+    """
+    Build a package index shared by every host.
+
+    Packages already in `existing_index` keep their position so matrices
+    from earlier runs stay comparable; new names are appended in sorted order.
+    """
+    index = list(existing_index) if existing_index else []
+    known = set(index)
+    new_packages = set()
+    for packages in host_packages:
+        new_packages.update(p for p in packages if p not in known)
+    index.extend(sorted(new_packages))
+    return index, {pkg: i for i, pkg in enumerate(index)}
+
+def build_membership_matrix(host_packages, pkg_to_idx):
+    """Sparse host × package membership matrix M[h,p] = 1 if host h has package p."""
+    indptr = [0]
+    indices = []
+    for packages in host_packages:
+        cols = np.unique(np.fromiter((pkg_to_idx[p] for p in packages), dtype=np.int64, count=len(packages)))
+        indices.append(cols)
+        indptr.append(indptr[-1] + len(cols))
+    indices = np.concatenate(indices) if indices else np.array([], dtype=np.int64)
+    return sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.int8), indices, np.array(indptr)),
+        shape=(len(host_packages), len(pkg_to_idx))
+    )
+
+def merge_host_edges(hosts, pkg_to_idx):
+    """
+    Remap every host's dependency edges into the global index.
+
+    Returns (edge_keys, edge_hosts, per_host_edges): unique global edge keys
+    (i * N + j), the number of hosts carrying each edge, and edge counts per host.
+    """
+    N = len(pkg_to_idx)
+    keys = []
+    per_host_edges = np.zeros(len(hosts), dtype=np.int64)
+    for h, (host, packages, A) in enumerate(hosts):
+        if A is None:
+            continue
+        local_to_global = np.fromiter((pkg_to_idx[p] for p in packages), dtype=np.int64, count=len(packages))
+        coo = A.tocoo()
+        host_keys = np.unique(local_to_global[coo.row] * N + local_to_global[coo.col])
+        keys.append(host_keys)
+        per_host_edges[h] = len(host_keys)
+    if not keys:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), per_host_edges
+    edge_keys, edge_hosts = np.unique(np.concatenate(keys), return_counts=True)
+    return edge_keys, edge_hosts, per_host_edges
+
+def analyze_fleet(snapshot_dir='/home/zack/fleet',
+                  output_file='/home/zack/fleet_analysis.json',
+                  index_file='/home/zack/fleet_index.json'):
+    """Merge all host snapshots and compute fleet aggregates."""
+    print("="*70)
+    print("FLEET SNAPSHOT MERGE")
+    print("="*70)
+
+    print(f"\n[1/4] Loading host snapshots from {snapshot_dir}...")
+    hosts = load_host_snapshots(snapshot_dir)
+    host_names = [h[0] for h in hosts]
+    H = len(hosts)
+    graph_hosts = np.array([A is not None for _, _, A in hosts])
+    print(f"   {H} hosts ({int(np.sum(graph_hosts))} with dependency graphs)")
+
+    print("\n[2/4] Building shared package index...")
+    existing_index = None
+    if os.path.exists(index_file):
+        with open(index_file, 'r') as f:
+            existing_index = json.load(f)['packages']
+    packages, pkg_to_idx = build_global_index([h[1] for h in hosts], existing_index)
+    N = len(packages)
+    with open(index_file, 'w') as f:
+        json.dump({'packages': packages, 'pkg_to_idx': pkg_to_idx}, f)
+    print(f"   {N} packages in global index")
+
+    print("\n[3/4] Building host × package membership matrix...")
+    M = build_membership_matrix([h[1] for h in hosts], pkg_to_idx)
+    host_counts = np.asarray(M.sum(axis=1)).ravel()
+    package_hosts = np.asarray(M.sum(axis=0)).ravel()
+    prevalence = package_hosts / H if H else np.zeros(N)
+
+    print("\n[4/4] Merging dependency graphs...")
+    edge_keys, edge_hosts, per_host_edges = merge_host_edges(hosts, pkg_to_idx)
+    num_graph_hosts = int(np.sum(graph_hosts))
+    union_edges = len(edge_keys)
+    intersection_mask = edge_hosts == num_graph_hosts
+    intersection_edges = int(np.sum(intersection_mask))
+
+    # Per-host metrics, all as sparse mat-vec products over M
+    unique_to_host = M @ (package_hosts == 1).astype(np.int64)
+    rare = M @ (prevalence < 0.05).astype(np.int64)
+    mean_prevalence = (M @ prevalence) / np.maximum(host_counts, 1)
+    core = M @ (package_hosts == H).astype(np.int64)
+    density = np.where(host_counts > 0, per_host_edges / np.maximum(host_counts, 1) ** 2, 0.0)
+
+    print("\n" + "="*70)
+    print("FLEET ANALYSIS RESULTS")
+    print("="*70)
+
+    print(f"\n1. FLEET SIZE:")
+    print(f"   Hosts: {H}")
+    print(f"   Distinct packages: {N}")
+    print(f"   Packages on every host: {int(np.sum(package_hosts == H))}")
+    print(f"   Packages on a single host: {int(np.sum(package_hosts == 1))}")
+    print(f"   Mean packages per host: {np.mean(host_counts) if H else 0:.1f}")
+
+    print(f"\n2. MOST PREVALENT PACKAGES:")
+    for idx in np.argsort(package_hosts)[-10:][::-1]:
+        print(f"     • {packages[idx]:<35} {prevalence[idx]*100:>6.1f}%")
+
+    print(f"\n3. UNION / INTERSECTION GRAPHS:")
+    print(f"   Union edges: {union_edges}")
+    print(f"   Intersection edges (on all {num_graph_hosts} graph hosts): {intersection_edges}")
+
+    print(f"\n4. MOST UNUSUAL HOSTS (lowest mean package prevalence):")
+    for h in np.argsort(mean_prevalence)[:10]:
+        print(f"     • {host_names[h]:<30} {int(host_counts[h])} packages, "
+              f"{int(unique_to_host[h])} unique, mean prevalence {mean_prevalence[h]:.3f}")
+
+    # Save results
+    results = {
+        'hosts': host_names,
+        'packages': packages,
+        'membership': {
+            'indptr': M.indptr.tolist(),
+            'indices': M.indices.tolist()
+        },
+        'package_prevalence': {packages[i]: float(prevalence[i]) for i in range(N)},
+        'union_graph': {
+            'sources': (edge_keys // N).tolist(),
+            'targets': (edge_keys % N).tolist(),
+            'hosts': edge_hosts.tolist()
+        },
+        'intersection_graph': {
+            'sources': (edge_keys[intersection_mask] // N).tolist(),
+            'targets': (edge_keys[intersection_mask] % N).tolist()
+        },
+        'host_metrics': {
+            host_names[h]: {
+                'packages': int(host_counts[h]),
+                'edges': int(per_host_edges[h]),
+                'density': float(density[h]),
+                'unique_packages': int(unique_to_host[h]),
+                'rare_packages': int(rare[h]),
+                'core_packages': int(core[h]),
+                'mean_prevalence': float(mean_prevalence[h])
+            }
+            for h in range(H)
+        },
+        'statistics': {
+            'num_hosts': H,
+            'num_packages': N,
+            'union_edges': union_edges,
+            'intersection_edges': intersection_edges,
+            'universal_packages': int(np.sum(package_hosts == H)),
+            'single_host_packages': int(np.sum(package_hosts == 1))
+        }
+    }
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return M, results
+
+if __name__ == "__main__":
+    snapshot_dir = sys.argv[1] if len(sys.argv) > 1 else '/home/zack/fleet'
+    M, results = analyze_fleet(snapshot_dir)
@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+"""
+Closure Footprint Analysis
+Installed size of every package's dependency closure, counted once per package, plus marginal footprints per host
+"""
+
+import sys
+import json
+import numpy as np
+from scipy import sparse
+from graph_utils import (load_dependency_data, adjacency_csr, condensation, component_closure,
+                         topological_generations, source_component_members)
+from fleet_analysis import load_host_snapshots
+
+# Above this many components the exact closure matrix is replaced by sketches
+EXACT_COMPONENT_LIMIT = 20000
+
+def format_size(num_bytes):
+    """Human-readable size in pacman's binary units."""
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(num_bytes) < 1024 or unit == 'GiB':
+            return f"{num_bytes:.2f} {unit}" if unit != 'B' else f"{int(num_bytes)} B"
+        num_bytes /= 1024
+
+class ClosureFootprint:
+    """
+    Sum of installed sizes over dependency closures, for every package at once.
+
+    Exact mode multiplies the reflexive component closure R by per-component
+    sizes, so each package in a closure counts once. Sketch mode keeps k
+    weighted min-hash values per component instead: every package draws
+    Exp(1)/size variables, minima propagate up the condensation in
+    topological order, and (k-1)/Σmin estimates the closure size with
+    relative error ≈ 1/√(k-2) using O(components·k) memory.
+    """
+
+    def __init__(self, dep_data, method='auto', sketch_size=64, seed=0):
+        self.packages = dep_data['packages']
+        self.pkg_to_idx = dep_data['pkg_to_idx']
+        self.n = len(self.packages)
+        sizes = dep_data.get('sizes') or {}
+        self.sizes = np.array([sizes.get(p) or 0 for p in self.packages], dtype=np.float64)
+
+        A = adjacency_csr(dep_data)
+        self.num_components, self.labels, self.C = condensation(A)
+        self.L = sparse.csr_matrix(
+            (np.ones(self.n, dtype=np.float64), (np.arange(self.n), self.labels)),
+            shape=(self.n, self.num_components)
+        )
+        self.Lt = self.L.T.tocsr()
+        self.wave = topological_generations(self.C)
+
+        if method == 'auto':
+            method = 'exact' if self.num_components <= EXACT_COMPONENT_LIMIT else 'sketch'
+        self.method = method
+        if method == 'exact':
+            self.R = component_closure(self.C, self.wave).astype(np.float64)
+        else:
+            self.sketch_size = sketch_size
+            self.draws = np.random.default_rng(seed).exponential(size=(self.n, sketch_size)).astype(np.float32)
+            order = np.argsort(self.wave, kind='stable')
+            self.generations = np.split(order, np.where(np.diff(self.wave[order]))[0] + 1)
+
+    def _weights(self, exclude=None):
+        weights = self.sizes.copy()
+        if exclude is not None:
+            weights[exclude] = 0
+        return weights
+
+    def _sketch(self, weights):
+        """Propagate per-package weighted minima through the component DAG, dependencies first."""
+        with np.errstate(divide='ignore'):
+            values = self.draws / weights[:, None].astype(np.float32)
+        sketch = np.full((self.num_components, self.sketch_size), np.inf, dtype=np.float32)
+        np.minimum.at(sketch, self.labels, values)
+        for comps in self.generations:
+            rows = self.C[comps]
+            has_deps = np.diff(rows.indptr) > 0
+            if not np.any(has_deps):
+                continue
+            starts = rows.indptr[:-1][has_deps]
+            dep_min = np.minimum.reduceat(sketch[rows.indices], starts, axis=0)
+            sketch[comps[has_deps]] = np.minimum(sketch[comps[has_deps]], dep_min)
+        total = sketch.sum(axis=1, dtype=np.float64)
+        with np.errstate(divide='ignore'):
+            return np.where(np.isfinite(total), (self.sketch_size - 1) / total, 0.0)
+
+    def component_footprints(self, exclude=None):
+        """Closure size per component, ignoring packages in the exclude mask."""
+        weights = self._weights(exclude)
+        if self.method == 'exact':
+            return self.R @ (self.Lt @ weights)
+        return self._sketch(weights)
+
+    def footprints(self, exclude=None):
+        """Closure size per package (bytes) on a bare system, or on top of the excluded packages."""
+        return self.component_footprints(exclude)[self.labels]
+
+    def _host_mask(self, host_packages):
+        mask = np.zeros(self.n, dtype=bool)
+        mask[[self.pkg_to_idx[p] for p in host_packages if p in self.pkg_to_idx]] = True
+        return mask
+
+    def marginal(self, host_packages, candidates=None):
+        """Bytes each candidate (default: every package) would add to a host with these packages."""
+        footprint = self.footprints(self._host_mask(host_packages))
+        if candidates is None:
+            return footprint
+        return footprint[[self.pkg_to_idx[p] for p in candidates]]
+
+    def fleet_marginal(self, hosts, candidates, block_size=256):
+        """
+        Marginal footprints for many hosts at once: a candidates × hosts matrix.
+
+        In exact mode the installed sizes of a block of hosts are stacked as
+        columns, so one product R_X · Lᵀ(sizes ⊙ Mᵀ) gives the already-present
+        part of every candidate closure on every host in the block.
+        """
+        idx = np.array([self.pkg_to_idx[p] for p in candidates], dtype=np.int64)
+        result = np.zeros((len(idx), len(hosts)))
+        if self.method != 'exact':
+            for h, host_packages in enumerate(hosts):
+                result[:, h] = self.footprints(self._host_mask(host_packages))[idx]
+            return result
+
+        R_X = self.R[self.labels[idx]]
+        full = R_X @ (self.Lt @ self.sizes)
+        for start in range(0, len(hosts), block_size):
+            block = hosts[start:start + block_size]
+            cols = [np.unique([self.pkg_to_idx[p] for p in host_packages if p in self.pkg_to_idx]).astype(np.int64)
+                    for host_packages in block]
+            indptr = np.cumsum([0] + [len(c) for c in cols])
+            indices = np.concatenate(cols) if cols else np.array([], dtype=np.int64)
+            Mt = sparse.csr_matrix((np.ones(len(indices)), (indices, np.repeat(np.arange(len(block)), np.diff(indptr)))),
+                                   shape=(self.n, len(block)))
+            present = R_X @ (self.Lt @ Mt.multiply(self.sizes[:, None]).tocsr())
+            present = present.toarray() if sparse.issparse(present) else np.asarray(present)
+            result[:, start:start + len(block)] = full[:, None] - present
+        return result
+
+def analyze_footprints(data_file='/home/zack/dependency_data.json',
+                       output_file='/home/zack/footprint_analysis.json',
+                       snapshot_dir=None, candidates=None, method='auto', sketch_size=64):
+    """Closure footprints for every package, and per-host marginal footprints when snapshot_dir is given."""
+    dep_data = load_dependency_data(data_file)
+    if not dep_data.get('sizes'):
+        print("⚠ Snapshot has no 'sizes'; re-run dependency_analysis.py to collect Installed Size")
+
+    print("="*70)
+    print("CLOSURE FOOTPRINT ANALYSIS")
+    print("="*70)
+
+    print("\n[1/3] Building component closures...")
+    fp = ClosureFootprint(dep_data, method, sketch_size)
+    detail = f"{fp.R.nnz} closure entries" if fp.method == 'exact' else f"k = {fp.sketch_size} sketches"
+    print(f"   {fp.num_components} components, {fp.method} mode ({detail})")
+
+    print("\n[2/3] Computing footprints...")
+    footprints = fp.footprints()
+    packages = fp.packages
+    amplification = np.divide(footprints, fp.sizes, out=np.zeros(fp.n), where=fp.sizes > 0)
+
+    host_results = {}
+    if snapshot_dir:
+        print("\n[3/3] Computing marginal footprints per host...")
+        hosts = load_host_snapshots(snapshot_dir)
+        if candidates is None:
+            candidates = [packages[i] for i in source_component_members(adjacency_csr(dep_data))]
+        candidates = [p for p in candidates if p in fp.pkg_to_idx]
+        marginal = fp.fleet_marginal([host_packages for _, host_packages, _ in hosts], candidates)
+        for h, (host, _, _) in enumerate(hosts):
+            host_results[host] = {p: float(marginal[k, h]) for k, p in enumerate(candidates) if marginal[k, h] > 0}
+        print(f"   {len(hosts)} hosts × {len(candidates)} candidates")
+    else:
+        print("\n[3/3] No fleet snapshots given, skipping marginal footprints")
+
+    print("\n" + "="*70)
+    print("FOOTPRINT RESULTS")
+    print("="*70)
+
+    print(f"\n1. LARGEST CLOSURE FOOTPRINTS:")
+    for i in np.argsort(footprints)[-15:][::-1]:
+        print(f"     • {packages[i]:<35} {format_size(footprints[i]):>12} (own {format_size(fp.sizes[i])})")
+
+    print(f"\n2. HIGHEST DEPENDENCY AMPLIFICATION (closure / own size):")
+    for i in np.argsort(amplification)[-10:][::-1]:
+        if amplification[i] > 0:
+            print(f"     • {packages[i]:<35} {amplification[i]:.1f}×")
+
+    if host_results:
+        print(f"\n3. MARGINAL FOOTPRINTS (largest per host):")
+        for host in list(host_results)[:10]:
+            if host_results[host]:
+                p = max(host_results[host], key=host_results[host].get)
+                print(f"     • {host}: {p} adds {format_size(host_results[host][p])}")
+
+    results = {
+        'method': fp.method,
+        'footprints': {p: float(footprints[i]) for i, p in enumerate(packages)},
+        'marginal_footprints': host_results,
+        'statistics': {
+            'total_installed_size': float(fp.sizes.sum()),
+            'max_footprint': float(footprints.max()) if fp.n else 0.0,
+            'mean_footprint': float(footprints.mean()) if fp.n else 0.0
+        }
+    }
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return fp, results
+
+if __name__ == "__main__":
+    # Usage: footprint_analysis.py [exact|sketch|auto] [fleet snapshot dir]
+    method = sys.argv[1] if len(sys.argv) > 1 else 'auto'
+    snapshot_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    fp, results = analyze_footprints(method=method, snapshot_dir=snapshot_dir)
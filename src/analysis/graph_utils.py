@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+"""
+Shared Graph Utilities
+Sparse adjacency loading and condensation helpers for the analysis scripts
+"""
+
+import json
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+def load_dependency_data(data_file):
+    """Load a dependency snapshot written by dependency_analysis.py."""
+    with open(data_file, 'r') as f:
+        return json.load(f)
+
+def adjacency_csr(data):
+    """
+    Return the snapshot adjacency matrix as a sparse CSR matrix (A[i,j] = i depends on j).
+
+    Snapshots too large for a dense matrix (e.g. whole sync databases)
+    carry only 'dependency_edges', which give the same matrix.
+    """
+    n = len(data['packages'])
+    if 'adjacency_matrix' in data:
+        A = np.array(data['adjacency_matrix'], dtype=np.int8)
+        rows, cols = np.nonzero(A)
+    else:
+        edges = data['dependency_edges']
+        rows = np.array([e[0] for e in edges], dtype=np.int64)
+        cols = np.array([e[1] for e in edges], dtype=np.int64)
+    A = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    A.data[:] = 1  # Several dependencies may resolve to the same provider
+    return A
+
+def condensation(A):
+    """
+    Collapse strongly connected components.
+
+    Returns (num_components, labels, C) where labels[i] is the component of
+    package i and C is the component-level DAG in CSR form (no self loops).
+    """
+    num_components, labels = csgraph.connected_components(A, directed=True, connection='strong')
+    coo = A.tocoo()
+    src = labels[coo.row]
+    dst = labels[coo.col]
+    keep = src != dst
+    C = sparse.csr_matrix(
+        (np.ones(np.count_nonzero(keep), dtype=np.int32), (src[keep], dst[keep])),
+        shape=(num_components, num_components)
+    )
+    C.data[:] = 1  # Collapse parallel edges between the same components
+    return num_components, labels, C
+
+def topological_generations(C):
+    """
+    Peel the component DAG into generations, dependencies first.
+
+    C[u,v] = 1 means component u depends on component v, so v must be
+    installed before u. Returns wave[c] for every component.
+    """
+    num_components = C.shape[0]
+    Ct = C.tocsc()
+    remaining_deps = np.diff(C.indptr).astype(np.int64)
+    wave = np.full(num_components, -1, dtype=np.int64)
+
+    frontier = np.where(remaining_deps == 0)[0]
+    level = 0
+    while len(frontier):
+        wave[frontier] = level
+        # Every dependent of a finished component loses one pending dependency
+        dependents = np.concatenate([Ct.indices[Ct.indptr[c]:Ct.indptr[c + 1]] for c in frontier])
+        np.subtract.at(remaining_deps, dependents, 1)
+        candidates = np.unique(dependents)
+        frontier = candidates[remaining_deps[candidates] == 0]
+        level += 1
+
+    return wave
+
+def source_component_members(A):
+    """Packages in SCCs that nothing outside the SCC depends on (roots of the graph)."""
+    num_components, labels, C = condensation(A)
+    comp_in_degree = np.diff(C.tocsc().indptr)
+    return np.where(comp_in_degree[labels] == 0)[0]
+
+def explicit_packages(data):
+    """Indices of explicitly installed packages, or None if the snapshot has no install reasons."""
+    reasons = data.get('install_reasons')
+    if not reasons or not any(reasons.values()):
+        return None
+    return np.array([i for i, p in enumerate(data['packages']) if reasons.get(p) == 'explicit'], dtype=np.int64)
+
+def component_closure(C, wave=None):
+    """
+    Reflexive reachability over the component DAG.
+
+    Returns a CSR matrix R with R[c,d] = 1 if component c depends on d
+    directly or transitively (R[c,c] = 1). Components are processed
+    dependencies first, so each closure is the union of its deps' closures.
+    """
+    num_components = C.shape[0]
+    if wave is None:
+        wave = topological_generations(C)
+    closures = [None] * num_components
+    for c in np.argsort(wave, kind='stable'):
+        deps = C.indices[C.indptr[c]:C.indptr[c + 1]]
+        if len(deps):
+            closures[c] = np.unique(np.concatenate([[c]] + [closures[d] for d in deps]))
+        else:
+            closures[c] = np.array([c], dtype=np.int64)
+    indptr = np.zeros(num_components + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(cl) for cl in closures])
+    indices = np.concatenate(closures) if num_components else np.array([], dtype=np.int64)
+    return sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                             shape=(num_components, num_components))
+
+def shortest_dependency_path(A, source, target):
+    """Shortest chain of package indices from source to target following dependencies, or None."""
+    if source == target:
+        return [source]
+    parent = {source: -1}
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for u in frontier:
+            for v in A.indices[A.indptr[u]:A.indptr[u + 1]].tolist():
+                if v not in parent:
+                    parent[v] = u
+                    if v == target:
+                        path = [v]
+                        while parent[path[-1]] != -1:
+                            path.append(parent[path[-1]])
+                        return path[::-1]
+                    next_frontier.append(v)
+        frontier = next_frontier
+    return None
@@ -6,103 +6,150 @@ Creates incompatibility matrices and conflict metrics
 
 import json
 import numpy as np
-from collections import defaultdict
+from scipy import sparse
+from version_compare import parse_constraint, evaluate_constraints
+from graph_utils import adjacency_csr
+from conflict_store import ConflictStore, ProviderHyperedges, EXPLICIT, CIRCULAR, VIRTUAL, REPLACES, kind_labels
 
-def analyze_incompatibility_matrix():
-    """Create and analyze the incompatibility matrix."""
-
-    # Load data
-    with open('/home/zack/dependency_data.json', 'r') as f:
-        dep_data = json.load(f)
-
-    with open('/home/zack/conflict_analysis.json', 'r') as f:
-        conflict_data = json.load(f)
-
-    packages = dep_data['packages']
-    n = len(packages)
+def build_conflict_store(dep_data, conflict_data):
+    """Collect explicit, replaces, circular and virtual conflicts into a sparse ConflictStore."""
     pkg_to_idx = dep_data['pkg_to_idx']
-
-    print("="*70)
-    print("INCOMPATIBILITY MATRIX CONSTRUCTION")
-    print("="*70)
-
-    # Initialize incompatibility matrix I
-    I = np.zeros((n, n), dtype=int)
-    conflict_types = np.zeros((n, n), dtype=object)
-
-    print("\nBuilding incompatibility matrix I[i,j]...")
-    print("  I[i,j] = 1 if package i is incompatible with package j")
+    store = ConflictStore(len(dep_data['packages']))
 
     # 1. Explicit conflicts
     print("\n[1/4] Processing explicit conflicts...")
     explicit_count = 0
+    # Versioned conflicts only apply when the installed version matches the constraint
+    versions = dep_data.get('versions')
+    if versions:
+        all_conflicts = {c for conflicts in conflict_data['explicit_conflicts'].values() for c in conflicts}
+        conflict_active = evaluate_constraints(all_conflicts, versions, dep_data.get('version_scheme', 'alpm'))
+    else:
+        print("   No installed versions in snapshot, treating versioned conflicts as unconditional")
+        conflict_active = {}
+    inactive_count = 0
     for pkg, conflicts in conflict_data['explicit_conflicts'].items():
         if pkg in pkg_to_idx:
             i = pkg_to_idx[pkg]
             for conflict in conflicts:
-                # Strip version constraints
-                conflict_base = conflict.split('<')[0].split('>')[0].split('=')[0]
+                conflict_base = parse_constraint(conflict)[0]
+                if conflict_active.get(conflict) is False:
+                    inactive_count += 1
+                    continue
                 if conflict_base in pkg_to_idx:
-                    j = pkg_to_idx[conflict_base]
-                    I[i, j] = 1
-                    I[j, i] = 1  # Conflicts are symmetric
-                    conflict_types[i, j] = 'explicit'
-                    conflict_types[j, i] = 'explicit'
+                    store.add(i, pkg_to_idx[conflict_base], EXPLICIT)
                     explicit_count += 1
 
+    # A package and the package it replaces should not both stay installed
+    replaces_count = 0
+    for pkg, replaced in conflict_data.get('replaces', {}).items():
+        if pkg in pkg_to_idx:
+            for target in replaced:
+                target_base = parse_constraint(target)[0]
+                if target_base in pkg_to_idx and target_base != pkg:
+                    store.add(pkg_to_idx[pkg], pkg_to_idx[target_base], REPLACES)
+                    replaces_count += 1
+
     print(f"   Added {explicit_count} explicit conflict edges")
+    print(f"   Skipped {inactive_count} versioned conflicts not matching installed versions")
+    print(f"   Added {replaces_count} replaces edges between installed packages")
 
     # 2. Circular dependencies
     print("\n[2/4] Processing circular dependencies...")
     circular_count = 0
     for pkg1, pkg2 in conflict_data['circular_dependencies']:
         if pkg1 in pkg_to_idx and pkg2 in pkg_to_idx:
-            i = pkg_to_idx[pkg1]
-            j = pkg_to_idx[pkg2]
-            I[i, j] = 1
-            I[j, i] = 1
-            if conflict_types[i, j] == 0:
-                conflict_types[i, j] = 'circular'
-                conflict_types[j, i] = 'circular'
-            else:
-                conflict_types[i, j] = f"{conflict_types[i, j]},circular"
-                conflict_types[j, i] = f"{conflict_types[j, i]},circular"
+            store.add(pkg_to_idx[pkg1], pkg_to_idx[pkg2], CIRCULAR)
             circular_count += 1
 
     print(f"   Added {circular_count} circular dependency conflicts")
 
     # 3. Virtual package conflicts (packages providing same thing)
     print("\n[3/4] Processing virtual package conflicts...")
-    virtual_count = 0
-    for virtual, providers in conflict_data['virtual_package_conflicts'].items():
-        # All providers are mutually incompatible (can't install both)
-        provider_indices = [pkg_to_idx[p] for p in providers if p in pkg_to_idx]
-        for i in range(len(provider_indices)):
-            for j in range(i+1, len(provider_indices)):
-                idx_i = provider_indices[i]
-                idx_j = provider_indices[j]
-                I[idx_i, idx_j] = 1
-                I[idx_j, idx_i] = 1
-                if conflict_types[idx_i, idx_j] == 0:
-                    conflict_types[idx_i, idx_j] = f'virtual:{virtual}'
-                    conflict_types[idx_j, idx_i] = f'virtual:{virtual}'
-                else:
-                    conflict_types[idx_i, idx_j] = f"{conflict_types[idx_i, idx_j]},virtual"
-                    conflict_types[idx_j, idx_i] = f"{conflict_types[idx_j, idx_i]},virtual"
-                virtual_count += 1
-
-    print(f"   Added {virtual_count} virtual package conflicts")
+    # All providers are mutually incompatible (can't install both): one hyperedge per virtual
+    hyperedges = ProviderHyperedges.from_providers(conflict_data['virtual_package_conflicts'], pkg_to_idx)
+    for virtual in hyperedges.virtuals:
+        store.virtual_id(virtual)
+
+    print(f"   Added {len(hyperedges)} virtual provider hyperedges "
+          f"({int(np.sum(hyperedges.sizes))} providers, {hyperedges.pair_count()} excluded pairs)")
+
+    store.coalesce()
+    return store, hyperedges
+
+def conflict_degrees(P, shared_P, hyperedges):
+    """
+    Exact incompatibility degree per package over pairwise edges P plus hyperedges.
+
+    Pairwise neighbours that also share a hyperedge are subtracted once
+    (shared_P holds those pairwise edges).
+    """
+    return np.diff(P.indptr) + hyperedges.degrees() - np.diff(shared_P.indptr)
+
+def mutual_conflicts(i, P, shared_P, hyperedges):
+    """Number of incompatible pairs among package i's conflict neighbours (triangles through i)."""
+    S = np.union1d(P.indices[P.indptr[i]:P.indptr[i + 1]], hyperedges.neighbors(i)).astype(np.int32)
+    if len(S) < 2:
+        return 0
+    pairwise = P[S][:, S].nnz // 2
+    shared = shared_P[S][:, S].nnz // 2
+    return pairwise + hyperedges.pairs_among(S) - shared
+
+def analyze_incompatibility_matrix(data_file='/home/zack/dependency_data.json',
+                                   conflict_file='/home/zack/conflict_analysis.json',
+                                   output_file='/home/zack/incompatibility_matrix_results.json',
+                                   materialize_virtual=False):
+    """
+    Create and analyze the incompatibility matrix.
+
+    Virtual-provider conflicts stay as hyperedges unless materialize_virtual
+    is set, in which case they are expanded into pairwise edges of I.
+    """
+
+    # Load data
+    with open(data_file, 'r') as f:
+        dep_data = json.load(f)
+
+    with open(conflict_file, 'r') as f:
+        conflict_data = json.load(f)
+
+    packages = dep_data['packages']
+    n = len(packages)
+
+    print("="*70)
+    print("INCOMPATIBILITY MATRIX CONSTRUCTION")
+    print("="*70)
+
+    print("\nBuilding incompatibility matrix I[i,j]...")
+    print("  I[i,j] = 1 if package i is incompatible with package j")
+
+    store, hyperedges = build_conflict_store(dep_data, conflict_data)
+    if materialize_virtual:
+        hyperedges.expand(store)
+        hyperedges = ProviderHyperedges.from_providers({}, dep_data['pkg_to_idx'])
+    # Pairwise part of I; hyperedges are handled alongside it without expansion
+    I = store.to_csr().astype(np.int32)
+    rows, cols, _, _ = store.edges()
+    shared = hyperedges.shared(rows, cols)
+    shared_I = sparse.csr_matrix(
+        (np.ones(2 * int(np.sum(shared)), dtype=np.int32),
+         (np.concatenate([rows[shared], cols[shared]]), np.concatenate([cols[shared], rows[shared]]))),
+        shape=(n, n)
+    )
 
     print("\n[4/4] Computing incompatibility metrics...")
+    print(f"   Conflict store: {len(store)} edges in {store.nbytes()} bytes, "
+          f"{len(hyperedges)} hyperedges in {hyperedges.H.data.nbytes + hyperedges.H.indices.nbytes} bytes")
+
+    # Incompatibility degree (how many packages each package conflicts with)
+    incomp_degrees = conflict_degrees(I, shared_I, hyperedges)
 
     # Calculate metrics
-    total_incompatibilities = np.sum(I) // 2  # Divide by 2 for symmetric matrix
+    total_incompatibilities = int(np.sum(incomp_degrees)) // 2  # Each pair is seen from both ends
     incompatibility_density = total_incompatibilities / (n * (n-1) / 2)
 
-    # Incompatibility degree (how many packages each package conflicts with)
-    incomp_degrees = np.sum(I, axis=1)
-
     # Most incompatible packages
+    package_kinds = store.row_kinds() | np.where(hyperedges.memberships > 0, VIRTUAL, 0).astype(np.uint8)
     top_incomp_indices = np.argsort(incomp_degrees)[-20:][::-1]
 
     print("\n" + "="*70)
@@ -128,23 +175,18 @@ def analyze_incompatibility_matrix():
         pkg_name = packages[idx]
         degree = int(incomp_degrees[idx])
         # Find conflict types
-        conflict_with = np.where(I[idx, :] > 0)[0]
-        types = set()
-        for j in conflict_with[:3]:
-            if conflict_types[idx, j] != 0:
-                types.add(str(conflict_types[idx, j]).split(',')[0].split(':')[0])
+        types = kind_labels(package_kinds[idx])
         type_str = ', '.join(types) if types else 'unknown'
         print(f"   {pkg_name:<35} {degree:<10} {type_str}")
 
     # Critical conflict analysis
     print(f"\n4. CRITICAL CONFLICTS (high-impact packages):")
-    A = np.array(dep_data['adjacency_matrix'])
-    in_degrees = np.sum(A, axis=0)  # How many depend on this package
+    A = adjacency_csr(dep_data)
+    in_degrees = np.bincount(A.indices, minlength=n)  # How many depend on this package
 
     critical_conflicts = []
-    for i in range(n):
-        if incomp_degrees[i] > 0 and in_degrees[i] > 10:
-            critical_conflicts.append((packages[i], int(incomp_degrees[i]), int(in_degrees[i])))
+    for i in np.where((incomp_degrees > 0) & (in_degrees > 10))[0]:
+        critical_conflicts.append((packages[i], int(incomp_degrees[i]), int(in_degrees[i])))
 
     critical_conflicts.sort(key=lambda x: x[1] * x[2], reverse=True)
 
@@ -158,37 +200,32 @@ def analyze_incompatibility_matrix():
 
     # Analyze conflict by type
     print(f"\n5. CONFLICT BREAKDOWN BY TYPE:")
-    type_counts = defaultdict(int)
-    for i in range(n):
-        for j in range(i+1, n):
-            if I[i, j] > 0:
-                ctype = str(conflict_types[i, j])
-                if 'explicit' in ctype:
-                    type_counts['explicit'] += 1
-                if 'circular' in ctype:
-                    type_counts['circular'] += 1
-                if 'virtual' in ctype:
-                    type_counts['virtual'] += 1
-
+    type_counts = store.kind_counts()
+    type_counts['virtual'] += hyperedges.pair_count()
+    type_counts = {ctype: count for ctype, count in type_counts.items() if count}
     for ctype, count in sorted(type_counts.items(), key=lambda x: x[1], reverse=True):
         pct = (count / total_incompatibilities) * 100 if total_incompatibilities > 0 else 0
         print(f"   {ctype:.<30} {count:>5} ({pct:>5.1f}%)")
+    # Edges carrying several kinds at once, counted per exact kind combination
+    combination_counts = np.bincount(store.kinds | np.where(shared, VIRTUAL, 0).astype(np.uint8), minlength=256)
+    for flags in np.where(combination_counts > 0)[0]:
+        labels = kind_labels(flags)
+        if len(labels) > 1:
+            print(f"   {'+'.join(labels):.<30} {int(combination_counts[flags]):>5} (overlap)")
 
     # Incompatibility clusters (strongly incompatible groups)
     print(f"\n6. INCOMPATIBILITY CLUSTERS:")
-    # Find packages with >5 mutual conflicts
+    # Mutual conflicts = edges among a package's conflict neighbours = triangles through it.
+    # (I @ I) ∘ I counts common neighbours per edge; each triangle at i shows up twice in row i.
+    triangles = np.asarray((I @ I).multiply(I).sum(axis=1)).ravel() // 2
+    # Packages next to a hyperedge get an exact local recount instead
+    in_hyperedge = hyperedges.memberships > 0
+    near_hyperedge = in_hyperedge | ((I @ in_hyperedge.astype(np.int32)) > 0)
     clusters = []
-    for i in range(n):
-        if incomp_degrees[i] >= 5:
-            conflicting = np.where(I[i, :] > 0)[0]
-            # Check how many of these also conflict with each other
-            mutual_conflicts = 0
-            for j in range(len(conflicting)):
-                for k in range(j+1, len(conflicting)):
-                    if I[conflicting[j], conflicting[k]] > 0:
-                        mutual_conflicts += 1
-            if mutual_conflicts > 3:
-                clusters.append((packages[i], int(incomp_degrees[i]), mutual_conflicts))
+    for i in np.where(incomp_degrees >= 5)[0]:
+        mutual = mutual_conflicts(i, I, shared_I, hyperedges) if near_hyperedge[i] else int(triangles[i])
+        if mutual > 3:
+            clusters.append((packages[i], int(incomp_degrees[i]), mutual))
 
     if clusters:
         print(f"   Found {len(clusters)} packages in high-conflict clusters:")
@@ -221,17 +258,19 @@ def analyze_incompatibility_matrix():
             for pkg, conflicts, dependents in critical_conflicts[:20]
         ],
         'conflict_types': dict(type_counts),
-        'packages_with_zero_conflicts': int(np.sum(incomp_degrees == 0))
+        'packages_with_zero_conflicts': int(np.sum(incomp_degrees == 0)),
+        'conflict_edges': store.to_dict(),
+        'virtual_hyperedges': hyperedges.to_dict(packages)
     }
 
-    with open('/home/zack/incompatibility_matrix_results.json', 'w') as f:
+    with open(output_file, 'w') as f:
         json.dump(results, f, indent=2)
 
     print("\n" + "="*70)
-    print("Results saved to: incompatibility_matrix_results.json")
+    print(f"Results saved to: {output_file}")
     print("="*70)
 
-    return I, conflict_types, results
+    return I, store, hyperedges, results
 
 if __name__ == "__main__":
-    I, conflict_types, results = analyze_incompatibility_matrix()
+    I, store, hyperedges, results = analyze_incompatibility_matrix()
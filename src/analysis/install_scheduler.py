@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+"""
+Topological Install/Upgrade Wave Scheduler
+Turns the SCC condensation into concurrent build waves with parallelism estimates
+"""
+
+import sys
+import json
+import heapq
+import numpy as np
+from graph_utils import load_dependency_data, adjacency_csr, condensation, topological_generations
+
+def earliest_finish_times(C, wave, comp_cost):
+    """ASAP schedule with unlimited builders: start, finish and critical predecessor per component."""
+    num_components = C.shape[0]
+    start = np.zeros(num_components)
+    finish = np.zeros(num_components)
+    critical_dep = np.full(num_components, -1, dtype=np.int64)
+
+    for c in np.argsort(wave, kind='stable'):
+        deps = C.indices[C.indptr[c]:C.indptr[c + 1]]
+        if len(deps):
+            k = deps[np.argmax(finish[deps])]
+            start[c] = finish[k]
+            critical_dep[c] = k
+        finish[c] = start[c] + comp_cost[c]
+
+    return start, finish, critical_dep
+
+def peak_concurrency(start, finish):
+    """Maximum number of components running at once in the ASAP schedule."""
+    events = sorted([(s, 1) for s in start] + [(f, -1) for f in finish], key=lambda e: (e[0], e[1]))
+    running = peak = 0
+    for _, delta in events:
+        running += delta
+        peak = max(peak, running)
+    return peak
+
+def simulate_builders(C, comp_cost, priority, num_builders):
+    """Greedy list scheduling on a fixed number of builders, highest priority first."""
+    num_components = C.shape[0]
+    Ct = C.tocsc()
+    remaining_deps = np.diff(C.indptr).astype(np.int64)
+
+    ready = [(-priority[c], c) for c in np.where(remaining_deps == 0)[0]]
+    heapq.heapify(ready)
+    running = []
+    now = 0.0
+    done = 0
+
+    while done < num_components:
+        while ready and len(running) < num_builders:
+            _, c = heapq.heappop(ready)
+            heapq.heappush(running, (now + comp_cost[c], c))
+        now, c = heapq.heappop(running)
+        done += 1
+        for dependent in Ct.indices[Ct.indptr[c]:Ct.indptr[c + 1]]:
+            remaining_deps[dependent] -= 1
+            if remaining_deps[dependent] == 0:
+                heapq.heappush(ready, (-priority[dependent], dependent))
+
+    return now
+
+def schedule_installs(data_file='/home/zack/dependency_data.json',
+                      output_file='/home/zack/install_schedule.json',
+                      costs=None):
+    """Build the wave schedule, critical path and builder-count estimates."""
+    data = load_dependency_data(data_file)
+    packages = data['packages']
+    n = len(packages)
+    A = adjacency_csr(data)
+
+    print("="*70)
+    print("INSTALL / UPGRADE WAVE SCHEDULE")
+    print("="*70)
+
+    pkg_cost = np.ones(n)
+    if costs:
+        for pkg, cost in costs.items():
+            if pkg in data['pkg_to_idx']:
+                pkg_cost[data['pkg_to_idx'][pkg]] = float(cost)
+        print(f"\nUsing cost weights for {len(costs)} packages (default 1.0)")
+
+    print("\n[1/4] Condensing strongly connected components...")
+    num_components, labels, C = condensation(A)
+    # Members of a cycle have to be built together, so their costs add up
+    comp_cost = np.bincount(labels, weights=pkg_cost, minlength=num_components)
+    print(f"   {num_components} components from {n} packages")
+
+    print("\n[2/4] Computing topological generations...")
+    wave = topological_generations(C)
+    num_waves = int(wave.max()) + 1 if num_components else 0
+
+    print("\n[3/4] Computing critical path...")
+    start, finish, critical_dep = earliest_finish_times(C, wave, comp_cost)
+    total_work = float(np.sum(comp_cost))
+    critical_length = float(np.max(finish)) if num_components else 0.0
+    critical_path = []
+    c = int(np.argmax(finish)) if num_components else -1
+    while c != -1:
+        critical_path.append(c)
+        c = int(critical_dep[c])
+    critical_path.reverse()
+
+    wave_widths = np.bincount(wave, minlength=num_waves)
+    max_wave_width = int(wave_widths.max()) if num_waves else 0
+    max_parallelism = peak_concurrency(start, finish)
+    average_parallelism = total_work / critical_length if critical_length > 0 else 0.0
+
+    print("\n[4/4] Simulating fixed builder counts...")
+    # Priority = longest remaining path to the end of the schedule (bottom level)
+    bottom_level = comp_cost.copy()
+    Ct = C.tocsc()
+    for c in np.argsort(-wave, kind='stable'):
+        dependents = Ct.indices[Ct.indptr[c]:Ct.indptr[c + 1]]
+        if len(dependents):
+            bottom_level[c] = comp_cost[c] + np.max(bottom_level[dependents])
+
+    builder_estimates = []
+    num_builders = 1
+    while True:
+        makespan = simulate_builders(C, comp_cost, bottom_level, num_builders)
+        builder_estimates.append({
+            'builders': num_builders,
+            'makespan': float(makespan),
+            'speedup': float(total_work / makespan) if makespan > 0 else 0.0
+        })
+        if num_builders >= max(max_parallelism, 1):
+            break
+        num_builders = min(num_builders * 2, max_parallelism)
+
+    members = [[] for _ in range(num_components)]
+    for i in range(n):
+        members[labels[i]].append(packages[i])
+
+    print("\n" + "="*70)
+    print("SCHEDULE RESULTS")
+    print("="*70)
+
+    print(f"\n1. WAVES:")
+    print(f"   Number of waves: {num_waves}")
+    print(f"   Widest wave: {max_wave_width} components")
+    for k in range(min(num_waves, 10)):
+        print(f"     • wave {k}: {int(wave_widths[k])} components")
+    if num_waves > 10:
+        print(f"     ... and {num_waves - 10} more")
+
+    print(f"\n2. CRITICAL PATH:")
+    print(f"   Total work: {total_work:.2f}")
+    print(f"   Critical path length: {critical_length:.2f}")
+    print(f"   Path: {' → '.join('+'.join(members[c]) for c in critical_path[:10])}")
+    if len(critical_path) > 10:
+        print(f"   ... and {len(critical_path) - 10} more steps")
+
+    print(f"\n3. PARALLELISM:")
+    print(f"   Maximum useful parallelism (peak concurrency): {max_parallelism}")
+    print(f"   Average parallelism (work / critical path): {average_parallelism:.2f}")
+    print(f"   {'Builders':<12} {'Makespan':<14} {'Speedup'}")
+    print(f"   {'-'*40}")
+    for estimate in builder_estimates:
+        print(f"   {estimate['builders']:<12} {estimate['makespan']:<14.2f} {estimate['speedup']:.2f}x")
+
+    # Save results
+    results = {
+        'waves': [
+            {
+                'wave': k,
+                'groups': [members[c] for c in np.where(wave == k)[0]],
+                'cost': float(np.sum(comp_cost[wave == k]))
+            }
+            for k in range(num_waves)
+        ],
+        'critical_path': [members[c] for c in critical_path],
+        'package_times': {
+            packages[i]: {
+                'wave': int(wave[labels[i]]),
+                'start': float(start[labels[i]]),
+                'finish': float(finish[labels[i]])
+            }
+            for i in range(n)
+        },
+        'builder_estimates': builder_estimates,
+        'statistics': {
+            'num_components': int(num_components),
+            'num_waves': num_waves,
+            'max_wave_width': max_wave_width,
+            'total_work': total_work,
+            'critical_path_length': critical_length,
+            'max_useful_parallelism': int(max_parallelism),
+            'average_parallelism': float(average_parallelism)
+        }
+    }
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return results
+
+if __name__ == "__main__":
+    costs = None
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r') as f:
+            costs = json.load(f)
+    results = schedule_installs(costs=costs)
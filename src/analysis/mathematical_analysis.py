@@ -4,28 +4,156 @@ Mathematical Analysis of Package Dependencies
 Uses linear algebra, graph theory, and spectral methods
 """
 
+import os
+import sys
 import json
 import numpy as np
 from scipy import linalg, sparse
+from scipy.sparse import csgraph
+from scipy.sparse.linalg import eigsh, svds
 from collections import defaultdict
+import heapq
 import math
+from graph_utils import adjacency_csr, condensation, component_closure
+from memory_planner import MemoryPlanner
+from footprint_analysis import ClosureFootprint
+
+# Report stages in the order generate_report runs them
+ANALYSIS_STAGES = ['spectral', 'pagerank', 'clustering', 'scc', 'depths', 'decomposition', 'compatibility', 'overlap']
+
+def remap_pagerank(old_idx, prev_pr, n, alpha=0.85):
+    """
+    Carry a PageRank vector over to a new package index.
+
+    old_idx[k] is the new index of old package k (-1 if removed). The
+    vector is rescaled for the new teleport term (1-alpha)/n, and new
+    packages start at the teleport value.
+    """
+    pr = np.full(n, (1 - alpha) / n)
+    kept = old_idx >= 0
+    pr[old_idx[kept]] = np.asarray(prev_pr)[kept] * (len(old_idx) / n)
+    return pr
+
+def pagerank_push_update(A, pr_init, seeds, alpha=0.85, tol=1e-6):
+    """
+    Gauss-Southwell forward push from a warm start.
+
+    Solves the same system as DependencyAnalyzer.pagerank,
+    x = (1-alpha)/n + alpha * P^T x, where rows of dangling packages leak.
+    Residuals r = (1-alpha)/n + alpha * P^T x - x are computed only at
+    `seeds` (everywhere else the warm start is assumed converged) and the
+    largest one is pushed until sum|r| <= tol * (1-alpha), which bounds the
+    L1 error of the result by tol.
+    """
+    n = A.shape[0]
+    A = sparse.csr_matrix(A)
+    At = A.tocsc()
+    out_degree = np.diff(A.indptr).astype(np.float64)
+    inv_degree = np.divide(1.0, out_degree, out=np.zeros(n), where=out_degree > 0)
+    x = np.array(pr_init, dtype=np.float64)
+    r = np.zeros(n)
+    teleport = (1 - alpha) / n
+
+    for v in seeds:
+        preds = At.indices[At.indptr[v]:At.indptr[v + 1]]
+        r[v] = teleport + alpha * np.dot(x[preds], inv_degree[preds]) - x[v]
+
+    residual_sum = float(np.sum(np.abs(r)))
+    target = tol * (1 - alpha)
+    heap = [(-abs(r[v]), v) for v in seeds if r[v] != 0]
+    heapq.heapify(heap)
+    pushes = 0
+
+    while heap and residual_sum > target:
+        neg, u = heapq.heappop(heap)
+        if -neg != abs(r[u]) or r[u] == 0:
+            continue  # Stale heap entry
+        mass = r[u]
+        x[u] += mass
+        r[u] = 0.0
+        residual_sum -= abs(mass)
+        pushes += 1
+        if out_degree[u] > 0:
+            share = alpha * mass * inv_degree[u]
+            for v in A.indices[A.indptr[u]:A.indptr[u + 1]]:
+                residual_sum += abs(r[v] + share) - abs(r[v])
+                r[v] += share
+                heapq.heappush(heap, (-abs(r[v]), v))
+
+    return x, {
+        'pushes': pushes,
+        'residual_l1': max(residual_sum, 0.0),
+        'error_bound': max(residual_sum, 0.0) / (1 - alpha)
+    }
+
+def incremental_pagerank_update(prev_packages, prev_A, prev_pr, pkg_to_idx, A, alpha=0.85, tol=1e-6):
+    """
+    PageRank of a new snapshot warm-started from a previous one.
+
+    The old vector is remapped through the package names and only the
+    residuals around changed rows are recomputed, then pushed forward.
+    Returns (pagerank, push statistics).
+    """
+    n = A.shape[0]
+    A = sparse.csr_matrix(A)
+    old_idx = np.array([pkg_to_idx.get(p, -1) for p in prev_packages], dtype=np.int64)
+    pr_init = remap_pagerank(old_idx, prev_pr, n, alpha)
+
+    # Old edges in the new index space; edges touching removed packages drop out
+    prev_coo = sparse.coo_matrix(prev_A)
+    src, dst = old_idx[prev_coo.row], old_idx[prev_coo.col]
+    alive = (src >= 0) & (dst >= 0)
+    old_keys = np.unique(src[alive] * n + dst[alive])
+    new_coo = A.tocoo()
+    new_keys = np.unique(new_coo.row.astype(np.int64) * n + new_coo.col)
+    changed = np.concatenate([np.setxor1d(old_keys, new_keys, assume_unique=True) // n,
+                              src[(src >= 0) & (dst < 0)]])
+
+    seeds = set(changed.tolist())
+    seeds.update(np.where(np.isin(np.arange(n), old_idx, invert=True))[0].tolist())
+    seeds.update(dst[(src < 0) & (dst >= 0)].tolist())
+    for u in np.unique(changed):
+        seeds.update(A.indices[A.indptr[u]:A.indptr[u + 1]].tolist())
+        seeds.update((old_keys[(old_keys // n) == u] % n).tolist())
+
+    pr, stats = pagerank_push_update(A, pr_init, sorted(seeds), alpha=alpha, tol=tol)
+    stats['seeds'] = len(seeds)
+    return pr, stats
 
 class DependencyAnalyzer:
     """Analyzes package dependency structure using mathematical methods."""
 
-    def __init__(self, data_file):
-        """Load dependency data."""
+    def __init__(self, data_file, memory_budget=None, stages=None):
+        """
+        Load dependency data and plan every stage against the memory budget.
+
+        The dense adjacency is only materialized when the plan chooses it;
+        a budget too small for a requested stage raises MemoryError here,
+        before any analysis runs.
+        """
         with open(data_file, 'r') as f:
             data = json.load(f)
 
         self.packages = data['packages']
         self.n = len(self.packages)
-        self.A = np.array(data['adjacency_matrix'], dtype=np.float64)
+        self.A_sparse = adjacency_csr(data).astype(np.float64)
         self.pkg_to_idx = data['pkg_to_idx']
+        self.stages = stages or ANALYSIS_STAGES
+        edges = self.A_sparse.nnz
 
         print(f"Loaded {self.n} packages")
-        print(f"Total edges: {np.sum(self.A)}")
-        print(f"Graph density: {np.sum(self.A) / (self.n**2):.6f}")
+        print(f"Total edges: {edges}")
+        print(f"Graph density: {edges / (self.n**2):.6f}")
+
+        self.planner = MemoryPlanner(self.n, edges, memory_budget)
+        if 'compatibility' in self.stages and not self.planner.dense_fits('compatibility'):
+            # Size the closure before committing to it; unit weights make footprints closure lengths
+            estimator = ClosureFootprint(data, method='sketch', sketch_size=16)
+            estimator.sizes = np.ones(self.n)
+            self.planner.closure_entries = int(estimator.component_footprints().sum())
+        self.plan = self.planner.plan(self.stages)
+        self.planner.log()
+        self.A = self.A_sparse.toarray() if self.plan['adjacency'] == 'dense' else None
 
     def compute_graph_laplacian(self):
         """Compute the graph Laplacian matrix L = D - A."""
@@ -46,6 +174,8 @@ class DependencyAnalyzer:
     def spectral_analysis(self):
         """Perform spectral analysis on the Laplacian."""
         print("\nPerforming spectral analysis...")
+        if self.plan['spectral'] == 'sparse':
+            return self.sparse_spectral_analysis()
         L = self.compute_graph_laplacian()
 
         # Compute eigenvalues and eigenvectors
@@ -66,17 +196,50 @@ class DependencyAnalyzer:
             'spectral_gap': eigenvalues[1] - eigenvalues[0] if len(eigenvalues) > 1 else 0
         }
 
+    def sparse_spectral_analysis(self, k=10):
+        """
+        Extreme eigenvalues of the Laplacian without the dense eigendecomposition.
+
+        Like linalg.eigh, only the lower triangle of L is used. The two
+        eigenvalues nearest zero come from shift-invert Lanczos and the k
+        largest in magnitude from plain Lanczos, laid out as the ends of the
+        |eigenvalue|-sorted spectrum; only their eigenvectors are returned.
+        """
+        A = self.A_sparse
+        L = sparse.diags(np.asarray(A.sum(axis=1)).ravel()) - A
+        lower = sparse.tril(L, format='csr')
+        L = (lower + sparse.tril(L, -1, format='csr').T).tocsc()
+        if self.n <= 2 * k + 2:
+            eigenvalues, eigenvectors = linalg.eigh(L.toarray())
+        else:
+            # Shift just off zero so the factorization of a singular Laplacian still succeeds
+            small, small_vecs = eigsh(L, k=3, sigma=-1e-6, which='LM')
+            large, large_vecs = eigsh(L, k=k, which='LM')
+            eigenvalues = np.concatenate([small, large])
+            eigenvectors = np.hstack([small_vecs, large_vecs])
+        idx = np.argsort(np.abs(eigenvalues))
+        eigenvalues = eigenvalues[idx]
+        eigenvectors = eigenvectors[:, idx]
+
+        return {
+            'eigenvalues': eigenvalues,
+            'eigenvectors': eigenvectors,
+            'algebraic_connectivity': eigenvalues[1] if len(eigenvalues) > 1 else 0,
+            'spectral_gap': eigenvalues[1] - eigenvalues[0] if len(eigenvalues) > 1 else 0
+        }
+
     def pagerank(self, alpha=0.85, max_iter=100, tol=1e-6):
         """Compute PageRank centrality."""
         print("\nComputing PageRank...")
         n = self.n
 
         # Normalize adjacency matrix by out-degree
-        out_degree = np.sum(self.A, axis=1)
+        A = self.A if self.plan['pagerank'] == 'dense' else self.A_sparse
+        out_degree = np.asarray(A.sum(axis=1)).ravel()
         out_degree[out_degree == 0] = 1  # Avoid division by zero
 
         # Transition matrix
-        P = (self.A.T / out_degree).T
+        P = (A.T / out_degree).T if self.plan['pagerank'] == 'dense' else sparse.diags(1.0 / out_degree) @ A
 
         # Initialize PageRank
         pr = np.ones(n) / n
@@ -92,9 +255,25 @@ class DependencyAnalyzer:
 
         return pr
 
+    def incremental_pagerank(self, prev_packages, prev_A, prev_pr, alpha=0.85, tol=1e-6):
+        """
+        Update a previous snapshot's PageRank instead of restarting from 1/n.
+
+        The old vector is remapped through the package names and only the
+        residuals around changed rows are recomputed, then pushed forward.
+        """
+        print("\nUpdating PageRank incrementally...")
+        pr, stats = incremental_pagerank_update(prev_packages, prev_A, prev_pr, self.pkg_to_idx,
+                                                self.A_sparse, alpha, tol)
+        print(f"PageRank updated with {stats['pushes']} pushes from {stats['seeds']} seeds "
+              f"(L1 error bound {stats['error_bound']:.2e})")
+        return pr
+
     def compute_clustering_coefficient(self):
         """Compute local clustering coefficients."""
         print("\nComputing clustering coefficients...")
+        if self.plan['clustering'] == 'blocked':
+            return self.blocked_clustering_coefficient()
         clustering = np.zeros(self.n)
 
         for i in range(self.n):
@@ -119,9 +298,33 @@ class DependencyAnalyzer:
 
         return clustering
 
+    def blocked_clustering_coefficient(self):
+        """
+        Same coefficients from sparse products, a block of rows at a time.
+
+        Edges among the neighbours of i, counted once per ordered pair
+        (j < l) like the dense loop, are row i of A (triu(A, 1) A^T) on
+        the diagonal.
+        """
+        A = self.A_sparse
+        upper = sparse.triu(A, 1, format='csr')
+        rows = self.planner.block_rows('clustering')
+        edges = np.zeros(self.n)
+        for start in range(0, self.n, rows):
+            block = A[start:start + rows]
+            edges[start:start + rows] = np.asarray((block @ upper).multiply(block).sum(axis=1)).ravel()
+        k = np.diff(A.indptr).astype(np.float64)
+        max_edges = k * (k - 1) / 2
+        return np.divide(edges, max_edges, out=np.zeros(self.n), where=k >= 2)
+
     def strongly_connected_components(self):
         """Identify strongly connected components using Tarjan's algorithm."""
         print("\nFinding strongly connected components...")
+        if self.plan['scc'] == 'sparse':
+            num_components, labels = csgraph.connected_components(self.A_sparse, directed=True,
+                                                                  connection='strong')
+            order = np.argsort(labels, kind='stable')
+            return [c.tolist() for c in np.split(order, np.cumsum(np.bincount(labels))[:-1])]
 
         index_counter = [0]
         stack = []
@@ -167,6 +370,8 @@ class DependencyAnalyzer:
     def dependency_depth_analysis(self):
         """Analyze dependency depths using BFS."""
         print("\nAnalyzing dependency depths...")
+        if self.plan['depths'] == 'blocked':
+            return self.blocked_dependency_depths()
         depths = np.zeros(self.n)
         max_depth = 0
 
@@ -190,6 +395,17 @@ class DependencyAnalyzer:
 
         return depths, max_depth
 
+    def blocked_dependency_depths(self):
+        """BFS depths from csgraph, a block of source rows at a time."""
+        rows = self.planner.block_rows('depths')
+        depths = np.zeros(self.n)
+        for start in range(0, self.n, rows):
+            dist = csgraph.shortest_path(self.A_sparse, unweighted=True,
+                                         indices=np.arange(start, min(start + rows, self.n)))
+            dist[np.isinf(dist)] = 0
+            depths[start:start + rows] = dist.max(axis=1)
+        return depths, int(depths.max()) if self.n else 0
+
     def compute_overlap_matrix(self):
         """Compute pairwise dependency overlap using Jaccard similarity."""
         print("\nComputing pairwise overlap matrix...")
@@ -228,9 +444,9 @@ class DependencyAnalyzer:
 
         while not np.array_equal(R > 0, prev_R > 0) and power < 20:
             prev_R = R.copy()
+            power += 1
             R = R + np.linalg.matrix_power(self.A, power)
             R = (R > 0).astype(float)  # Binary reachability
-            power += 1
 
         print(f"Transitive closure computed (depth: {power})")
 
@@ -250,9 +466,79 @@ class DependencyAnalyzer:
 
         return compatibility, R
 
+    def compatibility_summary(self):
+        """Average and minimum compatibility plus reachable pairs, without n x n matrices when sparse."""
+        if self.plan['compatibility'] == 'dense':
+            compatibility, reachability = self.compute_compatibility_score()
+            return {
+                'avg_compatibility': float(np.mean(compatibility)),
+                'min_compatibility': float(np.min(compatibility)),
+                'reachable_pairs': int(np.sum(reachability > 0))
+            }
+
+        print("\nComputing compatibility scores from the component closure...")
+        num_components, labels, C = condensation(self.A_sparse)
+        R = component_closure(C)
+        comp_size = np.bincount(labels, minlength=num_components).astype(np.float64)
+        # Packages each package reaches, itself included
+        reach = (R @ comp_size)[labels]
+        mutual = float(np.sum(comp_size * (comp_size - 1)))
+        one_way = float(np.sum(reach) - self.n) - mutual
+        in_cycle = (comp_size[labels] > 1) | (self.A_sparse.diagonal() > 0)
+        n2 = float(self.n) ** 2
+        # Scores: 1 on the diagonal, 0.5 within a cycle, 0.8 either way along a one-way path, else 1
+        average = (self.n + 0.5 * mutual + 0.8 * 2 * one_way + (n2 - self.n - mutual - 2 * one_way)) / n2
+        print(f"Transitive closure computed ({R.nnz} component pairs)")
+        return {
+            'avg_compatibility': average,
+            'min_compatibility': 0.5 if mutual > 0 else 0.8 if one_way > 0 else 1.0,
+            'reachable_pairs': int(np.sum(reach) - np.count_nonzero(~in_cycle))
+        }
+
+    def overlap_summary(self):
+        """Average and maximum Jaccard overlap and the pairs above 0.5, blockwise when planned so."""
+        if self.plan['overlap'] == 'dense':
+            overlap = self.compute_overlap_matrix()
+            return {
+                'avg_overlap': float(np.mean(overlap)),
+                'max_overlap': float(np.max(overlap)),
+                'highly_overlapping_pairs': int(np.sum(overlap > 0.5) / 2)  # Divide by 2 for symmetry
+            }
+
+        print("\nComputing pairwise overlap in blocks...")
+        A = self.A_sparse
+        At = A.T.tocsc()
+        degree = np.diff(A.indptr).astype(np.float64)
+        rows = self.planner.block_rows('overlap')
+        total, maximum, high = 0.0, 0.0, 0
+        for start in range(0, self.n, rows):
+            stop = min(start + rows, self.n)
+            shared = (A[start:stop] @ At).toarray()
+            union = degree[start:stop, None] + degree[None, :] - shared
+            jaccard = np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+            jaccard[np.arange(stop - start), np.arange(start, stop)] = 0
+            total += jaccard.sum()
+            maximum = max(maximum, float(jaccard.max()))
+            high += int(np.sum(jaccard > 0.5))
+        return {
+            'avg_overlap': float(total / self.n ** 2),
+            'max_overlap': maximum,
+            'highly_overlapping_pairs': high // 2
+        }
+
     def matrix_decomposition(self):
         """Perform SVD and other decompositions."""
         print("\nPerforming matrix decompositions...")
+        if self.plan['decomposition'] == 'sparse':
+            # Only the leading singular values; rank and conditioning need the full spectrum
+            k = min(10, min(self.A_sparse.shape) - 1)
+            s = np.sort(svds(self.A_sparse, k=k, return_singular_vectors=False))[::-1]
+            return {
+                'singular_values': s,
+                'effective_rank': None,
+                'rank': None,
+                'condition_number': None
+            }
 
         # Singular Value Decomposition
         U, s, Vh = linalg.svd(self.A, full_matrices=False)
@@ -270,8 +556,13 @@ class DependencyAnalyzer:
             'condition_number': s[0] / s[-1] if s[-1] > 0 else np.inf
         }
 
-    def generate_report(self):
-        """Generate comprehensive analysis report."""
+    def generate_report(self, previous_state=None, output_file='/home/zack/analysis_results.json'):
+        """
+        Generate comprehensive analysis report.
+
+        previous_state is a saved pagerank_state.json from an earlier
+        snapshot; when given, PageRank is updated incrementally.
+        """
         print("\n" + "="*60)
         print("COMPREHENSIVE DEPENDENCY ANALYSIS REPORT")
         print("="*60)
@@ -279,89 +570,136 @@ class DependencyAnalyzer:
         results = {}
 
         # Basic statistics
+        out_degree = np.diff(self.A_sparse.indptr)
         results['basic_stats'] = {
             'num_packages': self.n,
-            'total_dependencies': int(np.sum(self.A)),
-            'density': float(np.sum(self.A) / (self.n**2)),
-            'avg_dependencies_per_package': float(np.mean(np.sum(self.A, axis=1))),
-            'max_dependencies': int(np.max(np.sum(self.A, axis=1))),
-            'packages_with_no_dependencies': int(np.sum(np.sum(self.A, axis=1) == 0))
+            'total_dependencies': int(self.A_sparse.nnz),
+            'density': float(self.A_sparse.nnz / (self.n**2)),
+            'avg_dependencies_per_package': float(np.mean(out_degree)),
+            'max_dependencies': int(np.max(out_degree)),
+            'packages_with_no_dependencies': int(np.sum(out_degree == 0))
         }
+        results['memory_plan'] = {'budget': self.planner.budget, 'choices': self.plan}
 
         # Spectral analysis
-        spectral = self.spectral_analysis()
-        results['spectral'] = {
-            'algebraic_connectivity': float(spectral['algebraic_connectivity']),
-            'spectral_gap': float(spectral['spectral_gap']),
-            'top_10_eigenvalues': spectral['eigenvalues'][-10:].tolist()
-        }
-
-        # PageRank
-        pagerank = self.pagerank()
-        top_pr_indices = np.argsort(pagerank)[-20:][::-1]
-        results['pagerank'] = {
-            'top_20_packages': [(self.packages[i], float(pagerank[i])) for i in top_pr_indices]
-        }
+        if 'spectral' in self.stages:
+            spectral = self.spectral_analysis()
+            results['spectral'] = {
+                'algebraic_connectivity': float(spectral['algebraic_connectivity']),
+                'spectral_gap': float(spectral['spectral_gap']),
+                'top_10_eigenvalues': spectral['eigenvalues'][-10:].tolist()
+            }
+
+        # PageRank, updated from the previous run's state when one is available
+        if 'pagerank' not in self.stages:
+            self.pagerank_state = previous_state
+        elif previous_state is not None:
+            pagerank = self.incremental_pagerank(
+                previous_state['packages'],
+                sparse.csr_matrix((np.ones(len(previous_state['edges'][0])),
+                                   (previous_state['edges'][0], previous_state['edges'][1])),
+                                  shape=(len(previous_state['packages']),) * 2),
+                np.array(previous_state['pagerank'])
+            )
+        else:
+            pagerank = self.pagerank()
+        if 'pagerank' in self.stages:
+            rows, cols = self.A_sparse.nonzero()
+            self.pagerank_state = {
+                'packages': self.packages,
+                'edges': [rows.tolist(), cols.tolist()],
+                'pagerank': pagerank.tolist()
+            }
+            top_pr_indices = np.argsort(pagerank)[-20:][::-1]
+            results['pagerank'] = {
+                'top_20_packages': [(self.packages[i], float(pagerank[i])) for i in top_pr_indices]
+            }
 
         # Clustering
-        clustering = self.compute_clustering_coefficient()
-        results['clustering'] = {
-            'avg_clustering_coefficient': float(np.mean(clustering)),
-            'max_clustering': float(np.max(clustering))
-        }
+        if 'clustering' in self.stages:
+            clustering = self.compute_clustering_coefficient()
+            results['clustering'] = {
+                'avg_clustering_coefficient': float(np.mean(clustering)),
+                'max_clustering': float(np.max(clustering))
+            }
 
         # SCCs
-        sccs = self.strongly_connected_components()
-        scc_sizes = sorted([len(scc) for scc in sccs], reverse=True)
-        results['strongly_connected_components'] = {
-            'num_sccs': len(sccs),
-            'largest_scc_size': scc_sizes[0] if scc_sizes else 0,
-            'top_10_scc_sizes': scc_sizes[:10]
-        }
+        if 'scc' in self.stages:
+            sccs = self.strongly_connected_components()
+            scc_sizes = sorted([len(scc) for scc in sccs], reverse=True)
+            results['strongly_connected_components'] = {
+                'num_sccs': len(sccs),
+                'largest_scc_size': scc_sizes[0] if scc_sizes else 0,
+                'top_10_scc_sizes': scc_sizes[:10]
+            }
 
         # Dependency depths
-        depths, max_depth = self.dependency_depth_analysis()
-        results['dependency_depths'] = {
-            'max_dependency_depth': int(max_depth),
-            'avg_dependency_depth': float(np.mean(depths))
-        }
-
-        # Matrix decomposition
-        decomp = self.matrix_decomposition()
-        results['matrix_decomposition'] = {
-            'rank': int(decomp['rank']),
-            'effective_rank': int(decomp['effective_rank']),
-            'condition_number': float(decomp['condition_number']) if not np.isinf(decomp['condition_number']) else 'infinity',
-            'top_10_singular_values': decomp['singular_values'][:10].tolist()
-        }
+        if 'depths' in self.stages:
+            depths, max_depth = self.dependency_depth_analysis()
+            results['dependency_depths'] = {
+                'max_dependency_depth': int(max_depth),
+                'avg_dependency_depth': float(np.mean(depths))
+            }
+
+        # Matrix decomposition (rank and conditioning are None when only leading values were computed)
+        if 'decomposition' in self.stages:
+            decomp = self.matrix_decomposition()
+            condition = decomp['condition_number']
+            results['matrix_decomposition'] = {
+                'rank': None if decomp['rank'] is None else int(decomp['rank']),
+                'effective_rank': None if decomp['effective_rank'] is None else int(decomp['effective_rank']),
+                'condition_number': None if condition is None else float(condition) if not np.isinf(condition) else 'infinity',
+                'top_10_singular_values': decomp['singular_values'][:10].tolist()
+            }
 
         # Compatibility
-        compatibility, reachability = self.compute_compatibility_score()
-        results['compatibility'] = {
-            'avg_compatibility': float(np.mean(compatibility)),
-            'min_compatibility': float(np.min(compatibility)),
-            'reachable_pairs': int(np.sum(reachability > 0))
-        }
+        if 'compatibility' in self.stages:
+            results['compatibility'] = self.compatibility_summary()
 
         # Overlap analysis
-        overlap = self.compute_overlap_matrix()
-        results['overlap'] = {
-            'avg_overlap': float(np.mean(overlap)),
-            'max_overlap': float(np.max(overlap)),
-            'highly_overlapping_pairs': int(np.sum(overlap > 0.5) / 2)  # Divide by 2 for symmetry
-        }
+        if 'overlap' in self.stages:
+            results['overlap'] = self.overlap_summary()
 
         # Save results
-        with open('/home/zack/analysis_results.json', 'w') as f:
+        with open(output_file, 'w') as f:
             json.dump(results, f, indent=2)
 
-        print("\nResults saved to /home/zack/analysis_results.json")
+        print(f"\nResults saved to {output_file}")
         return results
 
 
+def run_analysis(data_file='/home/zack/dependency_data.json',
+                 output_file='/home/zack/analysis_results.json',
+                 state_file='/home/zack/pagerank_state.json',
+                 memory_budget=None, stages=None):
+    """
+    Run the report, warm-starting PageRank from state_file when it exists.
+
+    memory_budget ('8G', bytes, or None for $MEMORY_BUDGET / 80% of
+    available memory) decides dense or sparse per stage.
+    """
+    previous_state = None
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            previous_state = json.load(f)
+
+    analyzer = DependencyAnalyzer(data_file, memory_budget, stages)
+    results = analyzer.generate_report(previous_state, output_file)
+
+    if analyzer.pagerank_state is not None:
+        with open(state_file, 'w') as f:
+            json.dump(analyzer.pagerank_state, f)
+
+    return results
+
+
 if __name__ == "__main__":
-    analyzer = DependencyAnalyzer('/home/zack/dependency_data.json')
-    results = analyzer.generate_report()
+    # Usage: mathematical_analysis.py [memory budget, e.g. 4G]
+    try:
+        results = run_analysis(memory_budget=sys.argv[1] if len(sys.argv) > 1 else None)
+    except MemoryError as e:
+        print(f"\n✗ {e}")
+        sys.exit(1)
 
     print("\n" + "="*60)
     print("ANALYSIS COMPLETE")
@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+"""
+Memory-Budgeted Stage Planner
+Chooses dense, sparse or blocked variants per analysis stage from graph size, density and a memory budget
+"""
+
+import os
+import re
+import sys
+from progress_events import events
+
+FLOAT = 8
+# CSR float64: 8 bytes value + 4 bytes column index per entry
+CSR_ENTRY = 12
+MAX_BLOCK_ROWS = 1024
+# Budget used when none is passed, e.g. MEMORY_BUDGET=8G; unset means 80% of available memory
+BUDGET_ENV = 'MEMORY_BUDGET'
+UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+# Number, then an optional binary unit written K, Ki, KB or KiB (any case)
+BUDGET = re.compile(r'^(\d+(?:\.\d*)?|\.\d+)\s*(?:([KMGT])I?)?B?$')
+
+def parse_budget(value):
+    """'4G', '8GiB', '512MB', '1.5G' or a plain byte count -> bytes; units are powers of 1024."""
+    match = BUDGET.match(str(value).strip().upper())
+    if not match:
+        raise ValueError(f"Invalid memory budget {value!r}: expected a byte count or a number "
+                         f"with K, M, G or T (optionally Ki/KiB/KB), e.g. 8G or 512MiB")
+    number, unit = match.groups()
+    return int(float(number) * UNITS[unit or ''])
+
+def format_bytes(num_bytes):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if num_bytes < 1024 or unit == 'GiB':
+            return f"{num_bytes:.1f} {unit}" if unit != 'B' else f"{int(num_bytes)} B"
+        num_bytes /= 1024
+
+def available_memory():
+    """MemAvailable from /proc/meminfo, falling back to total physical memory."""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+def _csr(nnz, n):
+    return nnz * CSR_ENTRY + (n + 1) * 4
+
+# Variants per stage in order of preference, each with a peak-memory estimate on top of
+# the resident adjacency. Dense variants need the dense adjacency; blocked ones take the
+# number of rows processed at a time. closure is an estimate of dependency-closure entries.
+STAGE_VARIANTS = {
+    'spectral': [
+        ('dense', lambda n, nnz, closure: 3 * n * n * FLOAT),
+        ('sparse', lambda n, nnz, closure: 3 * _csr(nnz, n) + 4 * 25 * n * FLOAT)
+    ],
+    'pagerank': [
+        ('dense', lambda n, nnz, closure: 2 * n * n * FLOAT),
+        ('sparse', lambda n, nnz, closure: 2 * _csr(nnz, n) + 4 * n * FLOAT)
+    ],
+    'clustering': [
+        ('dense', lambda n, nnz, closure: 4 * n * FLOAT),
+        ('blocked', lambda n, nnz, closure, rows=1: 2 * _csr(nnz, n) + 2 * rows * n * FLOAT)
+    ],
+    'scc': [
+        ('dense', lambda n, nnz, closure: 400 * n),
+        ('sparse', lambda n, nnz, closure: _csr(nnz, n) + 4 * n * FLOAT)
+    ],
+    'depths': [
+        ('dense', lambda n, nnz, closure: 200 * n),
+        ('blocked', lambda n, nnz, closure, rows=1: _csr(nnz, n) + 2 * rows * n * FLOAT)
+    ],
+    'decomposition': [
+        ('dense', lambda n, nnz, closure: 5 * n * n * FLOAT),
+        ('sparse', lambda n, nnz, closure: 3 * _csr(nnz, n) + 2 * 21 * n * FLOAT)
+    ],
+    'compatibility': [
+        ('dense', lambda n, nnz, closure: 6 * n * n * FLOAT),
+        ('sparse', lambda n, nnz, closure: 3 * _csr(nnz, n) + closure * CSR_ENTRY + 4 * n * FLOAT)
+    ],
+    'overlap': [
+        ('dense', lambda n, nnz, closure: n * n * FLOAT),
+        ('blocked', lambda n, nnz, closure, rows=1: 2 * _csr(nnz, n) + 3 * rows * n * FLOAT)
+    ]
+}
+
+class MemoryPlanner:
+    """
+    Picks a representation for the adjacency and a variant for every stage.
+
+    The adjacency is dense only if it and every requested stage's dense
+    variant fit together (plan([]) just asks whether the adjacency
+    itself fits); otherwise everything runs on CSR. Blocked
+    variants get the largest row block (up to MAX_BLOCK_ROWS) that fits.
+    If even the leanest variant of a requested stage cannot fit, plan()
+    raises MemoryError with the estimate before any work starts.
+    """
+
+    def __init__(self, n, nnz, budget=None, closure_entries=None):
+        self.n = n
+        self.nnz = nnz
+        budget = budget if budget is not None else os.environ.get(BUDGET_ENV)
+        self.budget = parse_budget(budget) if budget else int(available_memory() * 0.8)
+        self.closure_entries = closure_entries
+        self.choices = {}
+
+    def _estimate(self, stage, variant, rows=1):
+        fn = dict(STAGE_VARIANTS[stage])[variant]
+        closure = self.closure_entries if self.closure_entries is not None else self.n * self.n
+        return fn(self.n, self.nnz, closure, rows) if variant == 'blocked' else fn(self.n, self.nnz, closure)
+
+    def _resident(self, dense):
+        return self.n * self.n * FLOAT + _csr(self.nnz, self.n) if dense else 2 * _csr(self.nnz, self.n)
+
+    def _choose(self, stage, dense):
+        """(variant, estimate, block rows) for one stage, or None if nothing fits."""
+        free = self.budget - self._resident(dense)
+        for variant, _ in STAGE_VARIANTS[stage]:
+            if variant == 'dense' and not dense:
+                continue
+            if variant == 'blocked':
+                rows = min(MAX_BLOCK_ROWS, max(self.n, 1))
+                while rows > 1 and self._estimate(stage, variant, rows) > free:
+                    rows //= 2
+                estimate = self._estimate(stage, variant, rows)
+                if estimate <= free:
+                    return variant, estimate, rows
+                continue
+            estimate = self._estimate(stage, variant)
+            if estimate <= free:
+                return variant, estimate, None
+        return None
+
+    def dense_fits(self, stage):
+        """True if the stage's dense variant fits next to a dense adjacency."""
+        choice = self._choose(stage, True)
+        return choice is not None and choice[0] == 'dense'
+
+    def plan(self, stages):
+        """Choose every stage's variant, or raise MemoryError naming the stages that cannot fit."""
+        dense = self._resident(True) <= self.budget and all(self.dense_fits(stage) for stage in stages)
+        self.choices = {'adjacency': ('dense' if dense else 'sparse', self._resident(dense), None)}
+        too_large = []
+        for stage in stages:
+            choice = self._choose(stage, dense)
+            if choice is None:
+                leanest = min(self._estimate(stage, v) for v, _ in STAGE_VARIANTS[stage] if v != 'dense')
+                too_large.append(f"{stage} needs at least {format_bytes(leanest + self._resident(False))}")
+            else:
+                self.choices[stage] = choice
+        if too_large:
+            raise MemoryError(f"Memory budget {format_bytes(self.budget)} too small for {self.n} packages "
+                              f"({self.nnz} edges): {'; '.join(too_large)}")
+        return {stage: variant for stage, (variant, _, _) in self.choices.items()}
+
+    def block_rows(self, stage):
+        return self.choices[stage][2]
+
+    def log(self):
+        """Print the plan and emit it as a memory_plan event."""
+        print(f"\nMemory plan for {self.n} packages, {self.nnz} edges (budget {format_bytes(self.budget)}):")
+        for stage, (variant, estimate, rows) in self.choices.items():
+            detail = f", {rows} rows per block" if rows else ''
+            print(f"   {stage:<15} {variant:<8} ~{format_bytes(estimate)}{detail}")
+        events.emit('memory_plan', n=self.n, nnz=self.nnz, budget=self.budget,
+                    choices={stage: {'variant': v, 'estimate': e, 'block_rows': r}
+                             for stage, (v, e, r) in self.choices.items()})
+
+if __name__ == "__main__":
+    # Usage: memory_planner.py <packages> <edges> [budget] [closure entries]     (e.g. 60000 400000 4G)
+    # Without a closure estimate the compatibility stage assumes the worst case of n^2 entries
+    planner = MemoryPlanner(int(sys.argv[1]), int(sys.argv[2]), sys.argv[3] if len(sys.argv) > 3 else None,
+                            int(sys.argv[4]) if len(sys.argv) > 4 else None)
+    try:
+        planner.plan(list(STAGE_VARIANTS))
+        planner.log()
+    except MemoryError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
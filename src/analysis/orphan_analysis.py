@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+"""
+Install-Reason Aware Orphan Analysis
+Dependency-installed packages unreachable from every explicit package, including orphaned cycles
+"""
+
+import os
+import sys
+import json
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from graph_utils import load_dependency_data, adjacency_csr, explicit_packages, topological_generations
+from cycle_analysis import cyclic_components
+
+def orphan_graph(data):
+    """
+    Dependency graph with pacman's Required By folded in.
+
+    Required By is pacman's own reverse view of dependencies, so it also
+    covers dependencies our provider resolution left unresolved.
+    """
+    A = adjacency_csr(data)
+    pkg_to_idx = data['pkg_to_idx']
+    rows, cols = [], []
+    for p, dependents in (data.get('required_by') or {}).items():
+        if p not in pkg_to_idx:
+            continue
+        for q in dependents:
+            if q in pkg_to_idx and q != p:
+                rows.append(pkg_to_idx[q])
+                cols.append(pkg_to_idx[p])
+    if rows:
+        extra = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=A.shape)
+        A = ((A + extra) > 0).astype(np.int8).tocsr()
+    return A
+
+def reachable_from(A, roots):
+    """
+    Boolean mask of packages reachable from any root, in one sweep.
+
+    A virtual node with an edge to every root turns the multi-source
+    search into a single breadth-first traversal.
+    """
+    n = A.shape[0]
+    roots = np.asarray(roots, dtype=np.int64)
+    coo = A.tocoo()
+    rows = np.concatenate([coo.row, np.full(len(roots), n)])
+    cols = np.concatenate([coo.col, roots])
+    G = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n + 1, n + 1))
+    order = csgraph.breadth_first_order(G, n, directed=True, return_predecessors=False)
+    mask = np.zeros(n + 1, dtype=bool)
+    mask[order] = True
+    return mask[:n]
+
+def classify_orphans(A, orphans):
+    """
+    Split orphans by what `pacman -Qdt` can see.
+
+    Returns (qdt, peelable, stuck, held, cycles): orphans nothing depends
+    on, orphans freed by repeatedly removing those (`pacman -Rs $(pacman
+    -Qdtq)` loops), orphans that never become removable because a cycle
+    holds them, orphans a non-orphan still needs (directly or through
+    other orphans), e.g. a package whose install reason is unknown, and
+    the orphaned cycles themselves as member lists.
+    """
+    orphans = np.asarray(orphans, dtype=np.int64)
+    if not len(orphans):
+        return [], [], [], [], []
+    sub = A[orphans][:, orphans].tocsr()
+    # Unreachable packages need not be orphans (unknown install reasons), so count every dependent
+    in_degree = np.diff(A[:, orphans].tocsc().indptr)
+    external = in_degree > np.diff(sub.tocsc().indptr)
+    held = reachable_from(sub, np.where(external)[0]) if external.any() else np.zeros(len(orphans), dtype=bool)
+    qdt = orphans[in_degree == 0]
+    # Peel from the top: with edges reversed, "no dependencies" means "no dependents";
+    # a self loop keeps held orphans (and so everything they need) from ever peeling
+    pinned = np.where(held)[0]
+    loops = sparse.csr_matrix((np.ones(len(pinned), dtype=np.int8), (pinned, pinned)), shape=sub.shape)
+    wave = topological_generations((sub.T + loops).tocsr())
+    peelable = orphans[wave > 0]
+    stuck = orphans[(wave < 0) & ~held]
+    cycles = [orphans[members].tolist() for members in cyclic_components(sub)]
+    return qdt.tolist(), peelable.tolist(), stuck.tolist(), orphans[held].tolist(), cycles
+
+def fleet_orphans(snapshots):
+    """
+    Orphans on many hosts with a single reachability sweep.
+
+    Host graphs are stacked block-diagonally, roots are offset into their
+    host's block, and one traversal marks every host's reachable set.
+    snapshots is a list of (host, data); hosts without install reasons are
+    skipped. Returns {host: (orphan indices into the host's packages, graph)}.
+    """
+    usable = [(host, data) for host, data in snapshots if explicit_packages(data) is not None]
+    if not usable:
+        return {}
+    graphs = [orphan_graph(data) for _, data in usable]
+    offsets = np.cumsum([0] + [G.shape[0] for G in graphs])
+    roots = np.concatenate([explicit_packages(data) + offsets[h] for h, (_, data) in enumerate(usable)])
+    reachable = reachable_from(sparse.block_diag(graphs, format='csr'), roots)
+
+    result = {}
+    for h, (host, data) in enumerate(usable):
+        reasons = data['install_reasons']
+        dependency = np.array([reasons.get(p) == 'dependency' for p in data['packages']], dtype=bool)
+        result[host] = (np.where(dependency & ~reachable[offsets[h]:offsets[h + 1]])[0], graphs[h])
+    return result
+
+def orphan_results(data, A, orphans):
+    """Name-based orphan report for one snapshot."""
+    packages = data['packages']
+    qdt, peelable, stuck, held, cycles = classify_orphans(A, orphans)
+    names = lambda idx: [packages[i] for i in idx]
+    return {
+        'orphans': names(orphans),
+        'qdt_orphans': names(qdt),
+        'freed_by_repeated_removal': names(peelable),
+        'held_by_cycles': names(stuck),
+        'held_by_non_orphans': names(held),
+        'orphaned_cycles': [names(c) for c in cycles]
+    }
+
+def analyze_orphans(data_file='/home/zack/dependency_data.json',
+                    output_file='/home/zack/orphan_analysis.json',
+                    snapshot_dir=None):
+    """Find orphans on this host, or on every host snapshot in snapshot_dir."""
+    print("="*70)
+    print("ORPHAN ANALYSIS")
+    print("="*70)
+
+    if snapshot_dir:
+        snapshots = [(os.path.splitext(f)[0], load_dependency_data(os.path.join(snapshot_dir, f)))
+                     for f in sorted(os.listdir(snapshot_dir)) if f.endswith('.json')]
+        print(f"\nLoaded {len(snapshots)} host snapshots from {snapshot_dir}")
+    else:
+        snapshots = [('localhost', load_dependency_data(data_file))]
+
+    print("\n[1/2] Sweeping reachability from explicit packages...")
+    found = fleet_orphans(snapshots)
+    skipped = [host for host, _ in snapshots if host not in found]
+    if skipped:
+        print(f"   ⚠ {len(skipped)} snapshots have no install reasons; re-run dependency_analysis.py")
+
+    print("\n[2/2] Classifying orphans...")
+    data_by_host = dict(snapshots)
+    hosts = {host: orphan_results(data_by_host[host], A, orphans) for host, (orphans, A) in found.items()}
+
+    print("\n" + "="*70)
+    print("ORPHAN RESULTS")
+    print("="*70)
+
+    print(f"\n1. ORPHANS PER HOST:")
+    print(f"   {'Host':<25} {'Orphans':<10} {'-Qdt':<8} {'Freed':<8} {'In cycles':<10} {'Held'}")
+    print(f"   {'-'*70}")
+    for host, r in sorted(hosts.items(), key=lambda x: len(x[1]['orphans']), reverse=True)[:20]:
+        print(f"   {host:<25} {len(r['orphans']):<10} {len(r['qdt_orphans']):<8} "
+              f"{len(r['freed_by_repeated_removal']):<8} {len(r['held_by_cycles']):<10} "
+              f"{len(r['held_by_non_orphans'])}")
+
+    all_cycles = [(host, c) for host, r in hosts.items() for c in r['orphaned_cycles']]
+    print(f"\n2. ORPHANED CYCLES (missed by pacman -Qdt): {len(all_cycles)}")
+    for host, cycle in all_cycles[:10]:
+        print(f"     • {host}: {' ⇄ '.join(cycle[:5])}{' ...' if len(cycle) > 5 else ''}")
+
+    results = {
+        'hosts': hosts,
+        'skipped_hosts': skipped,
+        'statistics': {
+            'hosts': len(hosts),
+            'total_orphans': sum(len(r['orphans']) for r in hosts.values()),
+            'qdt_visible': sum(len(r['qdt_orphans']) for r in hosts.values()),
+            'held_by_cycles': sum(len(r['held_by_cycles']) for r in hosts.values()),
+            'held_by_non_orphans': sum(len(r['held_by_non_orphans']) for r in hosts.values()),
+            'orphaned_cycles': len(all_cycles)
+        }
+    }
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return results
+
+if __name__ == "__main__":
+    # Usage: orphan_analysis.py [fleet snapshot dir]
+    results = analyze_orphans(snapshot_dir=sys.argv[1] if len(sys.argv) > 1 else None)
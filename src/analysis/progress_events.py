@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+"""
+Progress and Throughput Events
+Stage timing, rates, ETAs, retries and failures as console lines plus machine-readable JSONL events
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+from collections import Counter
+
+# Path of the JSONL event file; unset means console output only
+EVENTS_ENV = 'PROGRESS_EVENTS'
+
+class EventLog:
+    """Appends one JSON object per line to an event file (or does nothing without one)."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.counts = Counter()
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get(EVENTS_ENV))
+
+    def emit(self, event, **fields):
+        self.counts[event] += 1
+        if not self.path:
+            return
+        record = {'ts': round(time.time(), 3), 'event': event, 'pid': os.getpid(),
+                  'script': os.path.basename(sys.argv[0])}
+        record.update(fields)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+events = EventLog.from_env()
+
+class Stage:
+    """
+    Progress of one stage over a known or unknown number of items.
+
+    Emits stage_start / progress / retry / failure / stage_end events.
+    Progress is reported every `every` items or `interval` seconds,
+    whichever comes first, with the current rate and ETA, so a consumer
+    can tell a stall (no events) from a slowdown (falling rate).
+    Use as a context manager; failures are emitted one by one and counted
+    by kind in the stage_end event instead of being swallowed.
+    """
+
+    def __init__(self, name, total=None, every=50, interval=10.0, label='item', log=None, quiet=False):
+        self.name = name
+        self.total = total
+        self.every = every
+        self.interval = interval
+        self.label = label
+        self.log = log or events
+        self.quiet = quiet
+        self.done = 0
+        self.retries = 0
+        self.failures = Counter()
+        self.failed_items = []
+
+    def __enter__(self):
+        self.start = self.last_report = time.time()
+        self.log.emit('stage_start', stage=self.name, total=self.total)
+        return self
+
+    def rate(self):
+        elapsed = time.time() - self.start
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        rate = self.rate()
+        if self.total is None or rate == 0:
+            return None
+        return (self.total - self.done) / rate
+
+    def advance(self, item=None, n=1):
+        """Record the start of item number `done`; reports on the first item and then periodically."""
+        now = time.time()
+        if self.done % self.every == 0 or now - self.last_report >= self.interval:
+            self.report(item, now)
+        self.done += n
+
+    def report(self, item=None, now=None):
+        self.last_report = now or time.time()
+        rate, eta = self.rate(), self.eta()
+        self.log.emit('progress', stage=self.name, done=self.done, total=self.total, item=item,
+                      rate=round(rate, 2), eta=None if eta is None else round(eta, 1))
+        if not self.quiet:
+            of = f"/{self.total}" if self.total is not None else ''
+            timing = f" [{rate:.1f}/s, ETA {eta:.0f}s]" if eta is not None and self.done else ''
+            print(f"  Processing {self.label} {self.done}{of}: {item}{timing}")
+
+    def retry(self, item, attempt, error):
+        self.retries += 1
+        self.log.emit('retry', stage=self.name, item=item, attempt=attempt, error=str(error))
+
+    def failure(self, item, error, kind='error'):
+        """Count a failed item; kind groups failures, e.g. 'timeout' or 'exit status'."""
+        self.failures[kind] += 1
+        self.failed_items.append(item)
+        self.log.emit('failure', stage=self.name, item=item, kind=kind, error=str(error))
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.time() - self.start
+        self.log.emit('stage_end', stage=self.name, status='error' if exc_type else 'ok', done=self.done,
+                      total=self.total, elapsed=round(elapsed, 3), rate=round(self.rate(), 2),
+                      retries=self.retries, failures=dict(self.failures),
+                      error=None if exc is None else repr(exc))
+        if not self.quiet:
+            failed = sum(self.failures.values())
+            summary = f"  {self.name}: {self.done} {self.label}s in {elapsed:.1f}s ({self.rate():.1f}/s)"
+            if self.retries:
+                summary += f", {self.retries} retries"
+            if failed:
+                summary += f", {failed} failed ({', '.join(f'{k}: {v}' for k, v in self.failures.items())})"
+            print(summary)
+        return False
+
+def report_retry(stage, item, attempt, error):
+    """Record a retry on a stage, or as a standalone event outside of one."""
+    if stage is not None:
+        stage.retry(item, attempt, error)
+    else:
+        events.emit('retry', stage=None, item=item, attempt=attempt, error=str(error))
+
+def report_failure(stage, item, error, kind='error'):
+    """Record a failure on a stage, or as a standalone event outside of one."""
+    if stage is not None:
+        stage.failure(item, error, kind)
+    else:
+        events.emit('failure', stage=None, item=item, kind=kind, error=str(error))
+
+def run_command(cmd, item=None, stage=None, retries=1, timeout=5):
+    """
+    Run a command and return its stdout, or None if it failed.
+
+    Timeouts are retried; timeouts, launch errors and non-zero exit
+    statuses are reported as failures rather than silently dropped.
+    """
+    for attempt in range(retries + 1):
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            if attempt < retries:
+                report_retry(stage, item, attempt + 1, e)
+                continue
+            report_failure(stage, item, e, 'timeout')
+            return None
+        except OSError as e:
+            report_failure(stage, item, e, 'subprocess')
+            return None
+        if result.returncode != 0:
+            report_failure(stage, item, result.stderr.strip() or f"exit status {result.returncode}", 'exit status')
+            return None
+        return result.stdout
@@ -0,0 +1,309 @@
+#!/usr/bin/python3
+"""
+Delta-Encoded Snapshot History
+Stores dated dependency snapshots as package/edge deltas and computes metric trends
+"""
+
+import sys
+import json
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from graph_utils import load_dependency_data, adjacency_csr
+from mathematical_analysis import pagerank_push_update
+
+# Edge keys pack (source id, target id) into one int64 so deltas are plain set differences
+KEY_SHIFT = np.int64(1 << 32)
+
+def edge_keys(sources, targets):
+    """Pack name-table ids into sortable int64 edge keys."""
+    return np.asarray(sources, dtype=np.int64) * KEY_SHIFT + np.asarray(targets, dtype=np.int64)
+
+class SnapshotHistory:
+    """First snapshot in full, every later snapshot as a delta against its predecessor."""
+
+    def __init__(self, checkpoint_interval=16):
+        self.names = []          # Append-only name table shared by all snapshots
+        self.name_to_id = {}
+        self.base = None         # {'date', 'packages', 'edges'} with ids into names
+        self.deltas = []         # [{'date', 'added_packages', 'removed_packages', 'added_edges', 'removed_edges'}]
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpoints = {}   # In-memory only: snapshot number -> (package ids, edge keys)
+
+    @classmethod
+    def load(cls, history_file, checkpoint_interval=16):
+        """Load a history file written by save()."""
+        history = cls(checkpoint_interval)
+        with open(history_file, 'r') as f:
+            stored = json.load(f)
+        history.names = stored['names']
+        history.name_to_id = {name: i for i, name in enumerate(history.names)}
+        history.base = stored['base']
+        history.deltas = stored['deltas']
+        return history
+
+    def save(self, history_file):
+        """Write the name table, base snapshot and deltas."""
+        with open(history_file, 'w') as f:
+            json.dump({'names': self.names, 'base': self.base, 'deltas': self.deltas}, f)
+
+    def __len__(self):
+        return 0 if self.base is None else len(self.deltas) + 1
+
+    def dates(self):
+        """Dates of all stored snapshots, oldest first."""
+        if self.base is None:
+            return []
+        return [self.base['date']] + [d['date'] for d in self.deltas]
+
+    def _intern(self, name):
+        if name not in self.name_to_id:
+            self.name_to_id[name] = len(self.names)
+            self.names.append(name)
+        return self.name_to_id[name]
+
+    def _snapshot_state(self, data):
+        """Convert a dependency_data.json dict into (sorted package ids, sorted edge keys)."""
+        local_to_id = np.array([self._intern(p) for p in data['packages']], dtype=np.int64)
+        coo = adjacency_csr(data).tocoo()
+        keys = np.unique(edge_keys(local_to_id[coo.row], local_to_id[coo.col]))
+        return np.unique(local_to_id), keys
+
+    def append(self, date, data):
+        """Add a snapshot; only its difference from the latest snapshot is stored."""
+        package_ids, keys = self._snapshot_state(data)
+        if self.base is None:
+            self.base = {
+                'date': date,
+                'packages': package_ids.tolist(),
+                'edges': [(keys // KEY_SHIFT).tolist(), (keys % KEY_SHIFT).tolist()]
+            }
+            self._checkpoints[0] = (package_ids, keys)
+            return
+
+        prev_ids, prev_keys = self.state_at(len(self) - 1)
+        added_edges = np.setdiff1d(keys, prev_keys, assume_unique=True)
+        removed_edges = np.setdiff1d(prev_keys, keys, assume_unique=True)
+        self.deltas.append({
+            'date': date,
+            'added_packages': np.setdiff1d(package_ids, prev_ids, assume_unique=True).tolist(),
+            'removed_packages': np.setdiff1d(prev_ids, package_ids, assume_unique=True).tolist(),
+            'added_edges': [(added_edges // KEY_SHIFT).tolist(), (added_edges % KEY_SHIFT).tolist()],
+            'removed_edges': [(removed_edges // KEY_SHIFT).tolist(), (removed_edges % KEY_SHIFT).tolist()]
+        })
+        self._checkpoints[len(self) - 1] = (package_ids, keys)
+
+    @staticmethod
+    def _apply_delta(state, delta):
+        package_ids, keys = state
+        package_ids = np.union1d(
+            np.setdiff1d(package_ids, np.asarray(delta['removed_packages'], dtype=np.int64), assume_unique=True),
+            np.asarray(delta['added_packages'], dtype=np.int64)
+        )
+        keys = np.union1d(
+            np.setdiff1d(keys, edge_keys(*delta['removed_edges']), assume_unique=True),
+            edge_keys(*delta['added_edges'])
+        )
+        return package_ids, keys
+
+    def state_at(self, k):
+        """Reconstruct snapshot k as (sorted package ids, sorted edge keys)."""
+        if k < 0 or k >= len(self):
+            raise IndexError(f"snapshot {k} out of range (history has {len(self)})")
+        if 0 not in self._checkpoints:
+            self._checkpoints[0] = (np.array(self.base['packages'], dtype=np.int64),
+                                    np.sort(edge_keys(*self.base['edges'])))
+        start = max(c for c in self._checkpoints if c <= k)
+        state = self._checkpoints[start]
+        for s in range(start + 1, k + 1):
+            state = self._apply_delta(state, self.deltas[s - 1])
+            if s % self.checkpoint_interval == 0:
+                self._checkpoints[s] = state
+        return state
+
+    def dependency_data_at(self, k):
+        """Rebuild snapshot k in the dependency_data.json layout."""
+        package_ids, keys = self.state_at(k)
+        packages = sorted(self.names[i] for i in package_ids)
+        pkg_to_idx = {pkg: i for i, pkg in enumerate(packages)}
+        id_to_local = {int(i): pkg_to_idx[self.names[i]] for i in package_ids}
+        n = len(packages)
+        A = np.zeros((n, n), dtype=np.int8)
+        for key in keys:
+            A[id_to_local[int(key // KEY_SHIFT)], id_to_local[int(key % KEY_SHIFT)]] = 1
+        return {'packages': packages, 'adjacency_matrix': A.tolist(), 'pkg_to_idx': pkg_to_idx}
+
+    def storage_statistics(self):
+        """Stored integers for the delta encoding versus keeping every snapshot in full."""
+        if self.base is None:
+            return {'delta_encoded': 0, 'full_copies': 0}
+        delta_encoded = len(self.base['packages']) + 2 * len(self.base['edges'][0])
+        full = delta_encoded
+        num_packages, num_edges = len(self.base['packages']), len(self.base['edges'][0])
+        for d in self.deltas:
+            delta_encoded += len(d['added_packages']) + len(d['removed_packages'])
+            delta_encoded += 2 * (len(d['added_edges'][0]) + len(d['removed_edges'][0]))
+            num_packages += len(d['added_packages']) - len(d['removed_packages'])
+            num_edges += len(d['added_edges'][0]) - len(d['removed_edges'][0])
+            full += num_packages + 2 * num_edges
+        return {'delta_encoded': delta_encoded, 'full_copies': full}
+
+def _graph_from_state(state, id_to_row):
+    """Sparse adjacency over a state's packages, rows in package-id order."""
+    package_ids, keys = state
+    n = len(package_ids)
+    rows = id_to_row[keys // KEY_SHIFT]
+    cols = id_to_row[keys % KEY_SHIFT]
+    return sparse.csr_matrix((np.ones(len(keys)), (rows, cols)), shape=(n, n))
+
+def warm_pagerank(A, pr_init, alpha=0.85, max_iter=100, tol=1e-6):
+    """Sparse power iteration matching DependencyAnalyzer.pagerank, started from pr_init."""
+    n = A.shape[0]
+    out_degree = np.asarray(A.sum(axis=1)).ravel()
+    out_degree[out_degree == 0] = 1
+    PT = (sparse.diags(1.0 / out_degree) @ A).T.tocsr()
+    pr = pr_init
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        pr_new = (1 - alpha) / n + alpha * (PT @ pr)
+        if np.linalg.norm(pr_new - pr, 1) < tol:
+            pr = pr_new
+            break
+        pr = pr_new
+    return pr, iterations
+
+def compute_metric_trends(history, alpha=0.85, tol=1e-6):
+    """
+    Walk the history once, updating metrics from each delta.
+
+    Density comes from running package/edge counts, PageRank is carried over
+    from the previous snapshot and repaired with forward pushes seeded at the
+    changed rows, and SCCs are only recomputed when a
+    delta could have changed them (an edge added, or an intra-SCC edge removed).
+    """
+    trends = []
+    id_to_row = np.full(len(history.names), -1, dtype=np.int64)
+    prev_pr = None            # Indexed by name id
+    prev_scc_label = None     # Indexed by name id
+
+    for k in range(len(history)):
+        state = history.state_at(k)
+        package_ids, keys = state
+        n = len(package_ids)
+        id_to_row[:] = -1
+        id_to_row[package_ids] = np.arange(n)
+        A = _graph_from_state(state, id_to_row)
+
+        # PageRank: full iteration once, then forward pushes around each delta
+        if prev_pr is None:
+            pr, work = warm_pagerank(A, np.ones(n) / n, alpha=alpha, tol=tol)
+        else:
+            delta = history.deltas[k - 1]
+            pr_init = np.full(n, (1 - alpha) / n)
+            kept = prev_pr[package_ids] > 0
+            pr_init[kept] = prev_pr[package_ids][kept] * (prev_n / n)
+            sources = np.concatenate([delta['added_edges'][0], delta['removed_edges'][0]]).astype(np.int64)
+            targets = np.concatenate([delta['added_edges'][1], delta['removed_edges'][1]]).astype(np.int64)
+            changed_rows = id_to_row[sources][id_to_row[sources] >= 0]
+            seeds = set(id_to_row[targets][id_to_row[targets] >= 0].tolist())
+            seeds.update(id_to_row[np.asarray(delta['added_packages'], dtype=np.int64)].tolist())
+            for u in np.unique(changed_rows):
+                seeds.update(A.indices[A.indptr[u]:A.indptr[u + 1]].tolist())
+            pr, stats = pagerank_push_update(A, pr_init, sorted(seeds), alpha=alpha, tol=tol)
+            work = stats['pushes']
+
+        # SCCs, carried forward when the delta cannot have merged or split components
+        delta = history.deltas[k - 1] if k > 0 else None
+        recompute = True
+        if delta is not None and not delta['added_edges'][0]:
+            removed_src = np.array(delta['removed_edges'][0], dtype=np.int64)
+            removed_dst = np.array(delta['removed_edges'][1], dtype=np.int64)
+            intra = (prev_scc_label[removed_src] >= 0) & \
+                    (prev_scc_label[removed_src] == prev_scc_label[removed_dst])
+            recompute = bool(np.any(intra))
+        if recompute:
+            _, labels = csgraph.connected_components(A, directed=True, connection='strong')
+        else:
+            # Surviving packages keep their component, new ones are singletons
+            labels = prev_scc_label[package_ids].copy()
+            new = labels < 0
+            labels[new] = labels.max(initial=-1) + 1 + np.arange(np.count_nonzero(new))
+            _, labels = np.unique(labels, return_inverse=True)
+        scc_sizes = np.bincount(labels) if n else np.array([0])
+
+        pr_by_id = np.zeros(len(history.names))
+        pr_by_id[package_ids] = pr
+        movement = None
+        top_movers = []
+        if prev_pr is not None:
+            diff = pr_by_id - prev_pr
+            movement = float(np.sum(np.abs(diff)))
+            for i in np.argsort(np.abs(diff))[-5:][::-1]:
+                if diff[i] != 0:
+                    top_movers.append((history.names[i], float(diff[i])))
+
+        trends.append({
+            'date': history.dates()[k],
+            'packages': int(n),
+            'edges': int(len(keys)),
+            'density': float(len(keys) / n**2) if n else 0.0,
+            'pagerank_mode': 'power_iteration' if k == 0 else 'forward_push',
+            'pagerank_work': int(work),
+            'pagerank_l1_movement': movement,
+            'pagerank_top_movers': top_movers,
+            'num_sccs': int(len(scc_sizes)),
+            'nontrivial_sccs': int(np.sum(scc_sizes > 1)),
+            'largest_scc_size': int(scc_sizes.max()) if n else 0,
+            'scc_recomputed': recompute
+        })
+
+        prev_pr = pr_by_id
+        prev_n = n
+        prev_scc_label = np.full(len(history.names), -1, dtype=np.int64)
+        prev_scc_label[package_ids] = labels
+
+    return trends
+
+def analyze_history(history_file='/home/zack/dependency_history.json',
+                    output_file='/home/zack/history_trends.json'):
+    """Compute and report metric time series for a stored history."""
+    history = SnapshotHistory.load(history_file)
+
+    print("="*70)
+    print("SNAPSHOT HISTORY TRENDS")
+    print("="*70)
+
+    storage = history.storage_statistics()
+    print(f"\nSnapshots: {len(history)}")
+    print(f"Stored integers: {storage['delta_encoded']} (full copies would need {storage['full_copies']})")
+
+    trends = compute_metric_trends(history)
+
+    print(f"\n{'Date':<22} {'Pkgs':>6} {'Edges':>7} {'Density':>10} {'PR move':>9} {'Max SCC':>8} {'PR work':>9}")
+    print(f"{'-'*75}")
+    for t in trends:
+        movement = f"{t['pagerank_l1_movement']:.5f}" if t['pagerank_l1_movement'] is not None else '-'
+        print(f"{t['date']:<22} {t['packages']:>6} {t['edges']:>7} {t['density']:>10.6f} "
+              f"{movement:>9} {t['largest_scc_size']:>8} {t['pagerank_work']:>9}")
+
+    results = {'storage': storage, 'trends': trends}
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\nResults saved to: {output_file}")
+    return results
+
+if __name__ == "__main__":
+    # Usage: snapshot_history.py add <date> <dependency_data.json>
+    #        snapshot_history.py trends
+    history_file = '/home/zack/dependency_history.json'
+    if len(sys.argv) > 3 and sys.argv[1] == 'add':
+        try:
+            history = SnapshotHistory.load(history_file)
+        except FileNotFoundError:
+            history = SnapshotHistory()
+        history.append(sys.argv[2], load_dependency_data(sys.argv[3]))
+        history.save(history_file)
+        print(f"Stored snapshot {sys.argv[2]} ({len(history)} total)")
+    else:
+        results = analyze_history(history_file)
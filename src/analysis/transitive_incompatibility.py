@@ -0,0 +1,246 @@
+#!/usr/bin/python3
+"""
+Transitive Incompatibility Analysis
+Packages are incompatible when anything in their dependency closures conflicts (R·I·Rᵀ)
+"""
+
+import sys
+import json
+import numpy as np
+from scipy import sparse
+from graph_utils import (load_dependency_data, adjacency_csr, condensation, component_closure,
+                         source_component_members, shortest_dependency_path)
+from conflict_store import ConflictStore, EXPLICIT, VIRTUAL, REPLACES, TRANSITIVE, KIND_NAMES
+from incompatibility_matrix_analysis import build_conflict_store
+
+# Circular dependencies are not real conflicts, so only these kinds propagate through closures
+PROPAGATING_KINDS = EXPLICIT | REPLACES | VIRTUAL
+
+class TransitiveIncompatibility:
+    """
+    Conflicts between dependency closures, computed at the component level.
+
+    With L the package → SCC incidence and Rc the reflexive component
+    closure, pairwise conflicts lift to Ic = Lᵀ I L and the transitive
+    relation is Rc Ic Rcᵀ. Virtual-provider hyperedges contribute
+    (Rc Hcᵀ)(Rc Hcᵀ)ᵀ minus the providers both closures share.
+    """
+
+    def __init__(self, dep_data, store, hyperedges):
+        self.packages = dep_data['packages']
+        self.pkg_to_idx = dep_data['pkg_to_idx']
+        self.n = len(self.packages)
+        self.A = adjacency_csr(dep_data)
+        self.store = store
+        self.hyperedges = hyperedges
+
+        self.num_components, self.labels, C = condensation(self.A)
+        self.R = component_closure(C)
+        self.L = sparse.csr_matrix(
+            (np.ones(self.n, dtype=np.int32), (np.arange(self.n), self.labels)),
+            shape=(self.n, self.num_components)
+        )
+        Lt = self.L.T.tocsr()
+
+        I = store.to_csr(kind=PROPAGATING_KINDS).astype(np.int32)
+        self.Ic = (Lt @ I @ self.L).tocsr()
+        # Providers per (component closure, virtual), and hyperedge memberships per component
+        self.M = (self.R @ (Lt @ hyperedges.Ht)).tocsr()
+        self.Dc = Lt @ hyperedges.memberships
+
+    def _closure_mask(self, i):
+        """Boolean mask over packages in the dependency closure of package i."""
+        c = self.labels[i]
+        comps = np.zeros(self.num_components, dtype=bool)
+        comps[self.R.indices[self.R.indptr[c]:self.R.indptr[c + 1]]] = True
+        return comps[self.labels]
+
+    def self_incompatible(self):
+        """Packages whose own dependency closure already contains a conflict."""
+        RI = self.R @ self.Ic
+        pairwise = np.asarray(RI.multiply(self.R).sum(axis=1)).ravel()
+        # Σ_v m(m-1): two distinct providers of one virtual inside the same closure
+        M = self.M.copy()
+        M.data = M.data * (M.data - 1)
+        virtual = np.asarray(M.sum(axis=1)).ravel()
+        return np.where((pairwise + virtual)[self.labels] > 0)[0]
+
+    def compute(self, packages=None, block_size=256):
+        """
+        Transitive incompatibility among a set of packages, in row blocks.
+
+        Returns a ConflictStore of TRANSITIVE edges (plus VIRTUAL when a
+        provider hyperedge is involved) and the self-incompatible packages,
+        which are left out of the pairs.
+        """
+        if packages is None:
+            packages = source_component_members(self.A)
+        packages = np.asarray(packages, dtype=np.int64)
+        broken = set(self.self_incompatible().tolist())
+        packages = np.array([i for i in packages if i not in broken], dtype=np.int64)
+
+        comps = np.unique(self.labels[packages])
+        comp_members = {}
+        for i in packages:
+            comp_members.setdefault(int(self.labels[i]), []).append(int(i))
+
+        R_S = self.R[comps]
+        RDt = R_S.multiply(self.Dc.reshape(1, -1)).T.tocsr()
+        M_St = self.M[comps].T.tocsr()
+        store = ConflictStore(self.n)
+
+        for start in range(0, len(comps), block_size):
+            block = slice(start, start + block_size)
+            R_B = R_S[block]
+            pairwise = (R_B @ self.Ic) @ R_S.T
+            # Provider pairs p ≠ q of one virtual with p in one closure and q in the other
+            virtual = (self.M[comps[block]] @ M_St) - (R_B @ RDt)
+            for kind, X in ((TRANSITIVE, pairwise), (TRANSITIVE | VIRTUAL, virtual)):
+                X = X.tocoo()
+                keep = X.data > 0
+                for bu, v in zip(X.row[keep] + start, X.col[keep]):
+                    for a in comp_members[int(comps[bu])]:
+                        for b in comp_members[int(comps[v])]:
+                            store.add(a, b, kind)
+
+        return store.coalesce(), sorted(broken)
+
+    def explain(self, a, b, limit=5):
+        """
+        Why packages a and b (names) cannot be installed together.
+
+        Returns up to `limit` conflicting closure member pairs, each with
+        the dependency chains that pull them in.
+        """
+        ia, ib = self.pkg_to_idx[a], self.pkg_to_idx[b]
+        in_a, in_b = self._closure_mask(ia), self._closure_mask(ib)
+        found = []
+
+        rows, cols, kinds, _ = self.store.edges(kind=PROPAGATING_KINDS)
+        forward = in_a[rows] & in_b[cols]
+        backward = in_a[cols] & in_b[rows]
+        for p, q, k in zip(np.concatenate([rows[forward], cols[backward]]),
+                           np.concatenate([cols[forward], rows[backward]]),
+                           np.concatenate([kinds[forward], kinds[backward]])):
+            found.append((int(p), int(q), [KIND_NAMES[bit] for bit in KIND_NAMES if k & bit], None))
+            if len(found) >= limit:
+                break
+
+        H = self.hyperedges.H
+        for v in np.where((H @ in_a > 0) & (H @ in_b > 0))[0]:
+            if len(found) >= limit:
+                break
+            members = H.indices[H.indptr[v]:H.indptr[v + 1]]
+            for p in members[in_a[members]]:
+                others = members[in_b[members] & (members != p)]
+                if len(others):
+                    found.append((int(p), int(others[0]), ['virtual'], self.hyperedges.virtuals[v]))
+                    break
+
+        return [
+            {
+                'conflict': [self.packages[p], self.packages[q]],
+                'kinds': k,
+                'virtual': virtual,
+                'path_from_a': [self.packages[x] for x in shortest_dependency_path(self.A, ia, p)],
+                'path_from_b': [self.packages[x] for x in shortest_dependency_path(self.A, ib, q)]
+            }
+            for p, q, k, virtual in found[:limit]
+        ]
+
+def analyze_transitive_incompatibility(data_file='/home/zack/dependency_data.json',
+                                       conflict_file='/home/zack/conflict_analysis.json',
+                                       output_file='/home/zack/transitive_incompatibility.json',
+                                       packages=None, block_size=256):
+    """Compute transitive incompatibilities among `packages` (default: top-level packages)."""
+    dep_data = load_dependency_data(data_file)
+    with open(conflict_file, 'r') as f:
+        conflict_data = json.load(f)
+
+    print("="*70)
+    print("TRANSITIVE INCOMPATIBILITY ANALYSIS")
+    print("="*70)
+
+    store, hyperedges = build_conflict_store(dep_data, conflict_data)
+
+    print("\nComputing dependency closures...")
+    ti = TransitiveIncompatibility(dep_data, store, hyperedges)
+    print(f"   {ti.num_components} components, {ti.R.nnz} closure entries")
+
+    selected = None
+    if packages:
+        selected = [ti.pkg_to_idx[p] for p in packages if p in ti.pkg_to_idx]
+    transitive, broken = ti.compute(selected, block_size)
+
+    # Pairs that were not already direct conflicts
+    rows, cols = transitive.rows, transitive.cols
+    direct_rows, direct_cols, _, _ = store.edges(kind=PROPAGATING_KINDS)
+    direct = np.isin(rows.astype(np.int64) * ti.n + cols, direct_rows.astype(np.int64) * ti.n + direct_cols)
+    direct |= hyperedges.shared(rows, cols)
+    new_pairs = list(zip(rows[~direct].tolist(), cols[~direct].tolist()))
+    degrees = np.bincount(np.concatenate([transitive.rows, transitive.cols]), minlength=ti.n)
+
+    print("\n" + "="*70)
+    print("TRANSITIVE INCOMPATIBILITY RESULTS")
+    print("="*70)
+
+    print(f"\n1. INCOMPATIBLE PAIRS:")
+    print(f"   Transitively incompatible pairs: {len(transitive)}")
+    print(f"   Not visible as direct conflicts: {len(new_pairs)}")
+    print(f"   Involving a virtual provider: {int(np.sum(transitive.mask(kind=VIRTUAL)))}")
+
+    print(f"\n2. SELF-INCOMPATIBLE PACKAGES (conflict inside their own closure):")
+    print(f"   Found: {len(broken)}")
+    for i in broken[:10]:
+        print(f"     • {ti.packages[i]}")
+
+    print(f"\n3. MOST TRANSITIVELY INCOMPATIBLE PACKAGES:")
+    for i in np.argsort(degrees)[-10:][::-1]:
+        if degrees[i] > 0:
+            print(f"     • {ti.packages[i]:<35} {int(degrees[i])}")
+
+    explanations = []
+    for i, j in new_pairs[:10]:
+        explanations.append({
+            'packages': [ti.packages[i], ti.packages[j]],
+            'reasons': ti.explain(ti.packages[i], ti.packages[j], limit=3)
+        })
+    if explanations:
+        print(f"\n4. EXAMPLE EXPLANATIONS:")
+        for e in explanations[:5]:
+            reason = e['reasons'][0]
+            print(f"     • {e['packages'][0]} ✗ {e['packages'][1]}: "
+                  f"{' → '.join(reason['path_from_a'])} conflicts with {' → '.join(reason['path_from_b'])}")
+
+    results = {
+        'transitive_edges': transitive.to_dict(),
+        'self_incompatible': [ti.packages[i] for i in broken],
+        'explanations': explanations,
+        'statistics': {
+            'transitive_pairs': len(transitive),
+            'new_pairs': len(new_pairs),
+            'self_incompatible': len(broken),
+            'closure_entries': int(ti.R.nnz)
+        }
+    }
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return ti, transitive, results
+
+if __name__ == "__main__":
+    # Usage: transitive_incompatibility.py [pkg ...]              (restrict to these packages)
+    #        transitive_incompatibility.py --explain <pkg> <pkg>
+    if len(sys.argv) == 4 and sys.argv[1] == '--explain':
+        dep_data = load_dependency_data('/home/zack/dependency_data.json')
+        with open('/home/zack/conflict_analysis.json', 'r') as f:
+            store, hyperedges = build_conflict_store(dep_data, json.load(f))
+        ti = TransitiveIncompatibility(dep_data, store, hyperedges)
+        print(json.dumps(ti.explain(sys.argv[2], sys.argv[3]), indent=2))
+    else:
+        ti, transitive, results = analyze_transitive_incompatibility(packages=sys.argv[1:] or None)
@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+"""
+ALPM-Compatible Version Comparison
+Native port of pacman's vercmp with cached sortable version keys, plus dpkg's ordering for Debian snapshots
+"""
+
+import re
+import sys
+from functools import lru_cache
+
+CONSTRAINT_PATTERN = re.compile(r'^([^<>=]+)(<=|>=|<|>|=)?(.*)$')
+SEGMENT_PATTERN = re.compile(r'([^a-zA-Z0-9]*)([0-9]+|[a-zA-Z]+)')
+VERSION_RUN = re.compile(r'(\D*)(\d*)')
+
+def _isdigit(c):
+    return '0' <= c <= '9'
+
+def _isalpha(c):
+    return ('a' <= c <= 'z') or ('A' <= c <= 'Z')
+
+def _isalnum(c):
+    return _isdigit(c) or _isalpha(c)
+
+def rpmvercmp(a, b):
+    """Compare two version segments exactly like libalpm's rpmvercmp (-1, 0 or 1)."""
+    if a == b:
+        return 0
+    one = two = 0
+    la, lb = len(a), len(b)
+
+    while one < la and two < lb:
+        ptr1, ptr2 = one, two
+        while one < la and not _isalnum(a[one]):
+            one += 1
+        while two < lb and not _isalnum(b[two]):
+            two += 1
+        if one >= la or two >= lb:
+            break
+        # Differing separator lengths decide the comparison on their own
+        if (one - ptr1) != (two - ptr2):
+            return -1 if (one - ptr1) < (two - ptr2) else 1
+
+        ptr1, ptr2 = one, two
+        if _isdigit(a[ptr1]):
+            while ptr1 < la and _isdigit(a[ptr1]):
+                ptr1 += 1
+            while ptr2 < lb and _isdigit(b[ptr2]):
+                ptr2 += 1
+            isnum = True
+        else:
+            while ptr1 < la and _isalpha(a[ptr1]):
+                ptr1 += 1
+            while ptr2 < lb and _isalpha(b[ptr2]):
+                ptr2 += 1
+            isnum = False
+
+        # Segments of different type: numeric is always newer than alpha
+        if ptr2 == two:
+            return 1 if isnum else -1
+
+        seg1, seg2 = a[one:ptr1], b[two:ptr2]
+        if isnum:
+            seg1 = seg1.lstrip('0')
+            seg2 = seg2.lstrip('0')
+            if len(seg1) != len(seg2):
+                return 1 if len(seg1) > len(seg2) else -1
+        if seg1 != seg2:
+            return -1 if seg1 < seg2 else 1
+
+        one, two = ptr1, ptr2
+
+    if one >= la and two >= lb:
+        return 0
+    # A remaining alpha segment never beats an empty string ("1.0a" < "1.0" < "1.0.1")
+    if (one >= la and not _isalpha(b[two])) or (one < la and _isalpha(a[one])):
+        return -1
+    return 1
+
+def parse_evr(version):
+    """Split 'epoch:pkgver-pkgrel' into (epoch, pkgver, pkgrel); pkgrel may be None."""
+    s = 0
+    while s < len(version) and _isdigit(version[s]):
+        s += 1
+    if s < len(version) and version[s] == ':':
+        epoch = version[:s] or '0'
+        rest = version[s + 1:]
+    else:
+        epoch = '0'
+        rest = version
+    if '-' in rest:
+        pkgver, pkgrel = rest.rsplit('-', 1)
+    else:
+        pkgver, pkgrel = rest, None
+    return epoch, pkgver, pkgrel
+
+def vercmp(a, b):
+    """Compare two full package versions like `vercmp` / alpm_pkg_vercmp."""
+    if a == b:
+        return 0
+    epoch1, ver1, rel1 = parse_evr(a)
+    epoch2, ver2, rel2 = parse_evr(b)
+    ret = rpmvercmp(epoch1, epoch2)
+    if ret == 0:
+        ret = rpmvercmp(ver1, ver2)
+        if ret == 0 and rel1 is not None and rel2 is not None:
+            ret = rpmvercmp(rel1, rel2)
+    return ret
+
+def _segment_key(s):
+    """
+    Tuple key for one version segment.
+
+    Each alnum run becomes (class, separator length, type, value). An alpha
+    run glued to the previous run (no separator) gets class 0 and every
+    other run class 2, with a closing (1,) in between, which reproduces
+    rpmvercmp's end-of-string rules ('1.0a' < '1.0' < '1.0.a' < '1.0.1').
+    Keys agree with rpmvercmp except for trailing punctuation.
+    """
+    key = []
+    for sep, token in SEGMENT_PATTERN.findall(s):
+        if _isdigit(token[0]):
+            key.append((2, len(sep), 1, int(token)))
+        elif sep:
+            key.append((2, len(sep), 0, token))
+        else:
+            key.append((0, 0, 0, token))
+    key.append((1,))
+    return tuple(key)
+
+@lru_cache(maxsize=None)
+def version_key(version):
+    """Parsed, cached key (epoch, pkgver, pkgrel-or-None) for a full version string."""
+    epoch, pkgver, pkgrel = parse_evr(version)
+    return (_segment_key(epoch), _segment_key(pkgver),
+            _segment_key(pkgrel) if pkgrel is not None else None)
+
+def compare_keys(ka, kb):
+    """vercmp on precomputed keys; pkgrel only counts when both sides have one."""
+    left, right = ka[:2], kb[:2]
+    if ka[2] is not None and kb[2] is not None:
+        left, right = ka, kb
+    return (left > right) - (left < right)
+
+@lru_cache(maxsize=None)
+def parse_constraint(constraint):
+    """Split 'name<=1.2-3' into (name, operator, version); operator/version are None if absent."""
+    name, op, version = CONSTRAINT_PATTERN.match(constraint).groups()
+    return name, op, (version if op else None)
+
+def key_satisfies(installed_key, op, constraint_key):
+    """True if an installed version key satisfies `op constraint_key`."""
+    cmp = compare_keys(installed_key, constraint_key)
+    if op == '<':
+        return cmp < 0
+    if op == '<=':
+        return cmp <= 0
+    if op == '=':
+        return cmp == 0
+    if op == '>=':
+        return cmp >= 0
+    if op == '>':
+        return cmp > 0
+    return True
+
+def _dpkg_order(c):
+    """dpkg's character weight: '~' sorts before everything, letters before other symbols."""
+    if c == '~':
+        return -1
+    if 'a' <= c <= 'z' or 'A' <= c <= 'Z':
+        return ord(c)
+    return ord(c) + 256
+
+def _dpkg_part_key(part):
+    """
+    Tuple key for an upstream version or revision, ordered exactly like dpkg's verrevcmp.
+
+    Each (non-digit run, number) pair becomes (weights + (0,), number): the
+    trailing 0 is the weight of the end of a run. A final ((0,),) stands
+    for the end of the string, so it sorts after a '~' continuation and
+    before any other one.
+    """
+    pairs = [(tuple(_dpkg_order(c) for c in run) + (0,), int(digits or 0))
+             for run, digits in VERSION_RUN.findall(part) if run or digits]
+    return tuple(pairs or [((0,), 0)]) + (((0,),),)
+
+@lru_cache(maxsize=None)
+def dpkg_version_key(version):
+    """Sortable key for a full Debian version [epoch:]upstream[-revision]."""
+    epoch, _, rest = version.partition(':') if ':' in version else ('0', '', version)
+    upstream, _, revision = rest.rpartition('-') if '-' in rest else (rest, '', '')
+    return int(epoch or 0), _dpkg_part_key(upstream), _dpkg_part_key(revision)
+
+def dpkg_compare(a, b):
+    """-1, 0 or 1 like `dpkg --compare-versions`."""
+    ka, kb = dpkg_version_key(a), dpkg_version_key(b)
+    return (ka > kb) - (ka < kb)
+
+def dpkg_satisfies(installed, op, version):
+    """True if a version satisfies a relation in pacman's operator notation (no op: any)."""
+    if op is None:
+        return True
+    cmp = dpkg_compare(installed, version)
+    if op == '<':
+        return cmp < 0
+    if op == '<=':
+        return cmp <= 0
+    if op == '=':
+        return cmp == 0
+    if op == '>=':
+        return cmp >= 0
+    return cmp > 0
+
+def satisfies(installed_version, op, version, scheme='alpm'):
+    """
+    True if installed_version satisfies the relation `op version` (no op means any version).
+
+    scheme is a snapshot's 'version_scheme': 'alpm' (vercmp) or 'dpkg'.
+    """
+    if op is None:
+        return True
+    if scheme == 'dpkg':
+        return dpkg_satisfies(installed_version, op, version)
+    return key_satisfies(version_key(installed_version), op, version_key(version))
+
+def evaluate_constraints(constraints, installed_versions, scheme='alpm'):
+    """
+    Evaluate many 'name[op version]' strings against installed versions at once.
+
+    Every distinct version is parsed once into a key, so each check is a
+    tuple comparison. Returns {constraint: True/False/None}, None meaning
+    the named package is not installed.
+    """
+    results = {}
+    for constraint in constraints:
+        name, op, version = parse_constraint(constraint)
+        installed = installed_versions.get(name)
+        if installed is None:
+            results[constraint] = None
+        elif op is None:
+            results[constraint] = True
+        else:
+            results[constraint] = satisfies(installed, op, version, scheme)
+    return results
+
+if __name__ == "__main__":
+    # Usage: version_compare.py <version1> <version2>   (prints -1, 0 or 1 like vercmp)
+    if len(sys.argv) == 3:
+        print(vercmp(sys.argv[1], sys.argv[2]))
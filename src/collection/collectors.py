@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+"""
+Package Collectors
+Pluggable sources of package records that all produce the dependency snapshot the analyses read
+"""
+
+import sys
+import argparse
+import importlib
+import numpy as np
+from dependency_analysis import (parse_packages, collect_package_info, resolve_dependency_edges,
+                                 required_by_from_edges, save_results)
+
+class Collector:
+    """
+    A source of package records.
+
+    Subclasses implement records(), returning {name: record} with the
+    fields of parse_pacman_info (Version, Depends On, Provides,
+    Conflicts With, Replaces, Installed Size, Install Reason and,
+    optionally, Required By), and may override resolve() when their
+    relations do not follow pacman's rules.
+    """
+
+    title = 'PACKAGE COLLECTION'
+    # Whether the snapshot also carries the dense adjacency matrix (only sensible for one host)
+    dense = False
+    # How versions in the records compare (see version_compare.satisfies)
+    version_scheme = 'alpm'
+
+    def records(self):
+        raise NotImplementedError
+
+    def resolve(self, packages, records):
+        """(pkg_to_idx, edges [i, j, via, dependency], unresolved) for the collected records."""
+        return resolve_dependency_edges(packages, records)
+
+    def collect(self, output_file):
+        """Collect, resolve and save a snapshot. Returns the number of packages."""
+        print("="*70)
+        print(self.title)
+        print("="*70)
+
+        print("\n[1/3] Reading package records...")
+        records = self.records()
+        packages = sorted(records)
+        print(f"   {len(packages)} packages")
+
+        print("\n[2/3] Resolving dependencies...")
+        pkg_to_idx, edges, unresolved = self.resolve(packages, records)
+        required_by = required_by_from_edges(packages, edges)
+        for p in packages:
+            if records[p] is not None:  # pacman failures are kept as empty records
+                records[p].setdefault('Required By', required_by[p])
+
+        print("\n[3/3] Saving snapshot...")
+        adj_matrix = None
+        if self.dense:
+            adj_matrix = np.zeros((len(packages), len(packages)), dtype=np.int8)
+            for i, j, _, _ in edges:
+                adj_matrix[i, j] = 1
+        save_results(packages, adj_matrix, pkg_to_idx, records, edges, unresolved, output_file,
+                     self.version_scheme)
+
+        print(f"\nPackages: {len(packages)}")
+        print(f"Dependency edges: {len(edges)}")
+        print(f"Density: {len(edges) / max(len(packages), 1)**2:.6f}")
+        return len(packages)
+
+class PacmanLocalCollector(Collector):
+    """Installed packages through `pacman -Qi` (what dependency_analysis.py collects)."""
+
+    title = 'PACMAN LOCAL DATABASE COLLECTION'
+    dense = True
+
+    def __init__(self, packages=None):
+        self.packages = packages
+
+    def records(self):
+        return collect_package_info(self.packages or parse_packages())
+
+# Collector name -> (module, class); modules are imported on demand
+COLLECTORS = {
+    'pacman': ('collectors', 'PacmanLocalCollector'),
+    'pacman-sync': ('sync_database', 'SyncDbCollector'),
+    'dpkg': ('debian_packages', 'DpkgStatusCollector'),
+    'apt': ('debian_packages', 'AptPackagesCollector')
+}
+
+def get_collector(kind, *args, **kwargs):
+    """Instantiate a collector by name, e.g. get_collector('dpkg', '/var/lib/dpkg/status')."""
+    module, cls = COLLECTORS[kind]
+    return getattr(importlib.import_module(module), cls)(*args, **kwargs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('kind', choices=sorted(COLLECTORS))
+    parser.add_argument('paths', nargs='*', help='database or index files (default: the system ones)')
+    parser.add_argument('--output', default='/home/zack/dependency_data.json')
+    args = parser.parse_args()
+    collector = get_collector(args.kind, *([args.paths] if args.paths else []))
+    sys.exit(0 if collector.collect(args.output) else 1)
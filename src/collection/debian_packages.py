@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+"""
+Debian Package Collectors
+Streams dpkg status and APT Packages indices into the dependency snapshot format
+"""
+
+import os
+import re
+import bz2
+import sys
+import glob
+import gzip
+import lzma
+from collections import Counter, defaultdict
+from collectors import Collector
+# dependency_analysis (imported by collectors) puts the analysis scripts on the path
+from version_compare import parse_constraint, dpkg_compare, dpkg_satisfies
+
+STANZA_FIELDS = frozenset(('Package', 'Version', 'Architecture', 'Status', 'Depends', 'Pre-Depends',
+                           'Provides', 'Conflicts', 'Breaks', 'Replaces', 'Installed-Size'))
+# dpkg states in which a package satisfies dependencies
+INSTALLED_STATES = ('installed', 'triggers-awaited', 'triggers-pending')
+
+# name[:arch] [(op version)] [arch restrictions] [<build profiles>]
+RELATION = re.compile(r'^\s*([^\s(\[<]+)\s*(?:\(\s*(<<|<=|>=|>>|=|<|>)\s*([^)\s]+)\s*\))?')
+# Debian relation operators in pacman's notation; bare < and > are the obsolete forms of <= and >=
+DEBIAN_OPERATORS = {'<<': '<', '<=': '<=', '=': '=', '>=': '>=', '>>': '>', '<': '<=', '>': '>='}
+OPENERS = {'.gz': gzip.open, '.xz': lzma.open, '.bz2': bz2.open}
+
+def open_index(path):
+    """Open a status file or Packages index as text, decompressing by extension."""
+    opener = OPENERS.get(os.path.splitext(path)[1], open)
+    return opener(path, 'rt', encoding='utf-8', errors='replace')
+
+def iter_stanzas(lines, fields=STANZA_FIELDS):
+    """
+    Yield RFC822 stanzas as {field: value}, keeping only `fields`.
+
+    Continuation lines are folded onto their field with a single space;
+    continuations of dropped fields (e.g. Description) are skipped
+    without being split, which is where most of the text is.
+    """
+    stanza = {}
+    field = None
+    for line in lines:
+        first = line[:1]
+        if first in ('\n', '\r', ''):
+            if stanza:
+                yield stanza
+                stanza = {}
+            field = None
+        elif first == ' ' or first == '\t':
+            if field is not None:
+                stanza[field] += ' ' + line.strip()
+        else:
+            name, _, value = line.partition(':')
+            field = name if name in fields else None
+            if field is not None:
+                stanza[field] = value.strip()
+    if stanza:
+        yield stanza
+
+def parse_relations(value):
+    """
+    Parse a Depends-style field into groups of alternatives, each a
+    list of 'name[:arch][op version]' strings in pacman's notation.
+    """
+    groups = []
+    for group in value.split(','):
+        alternatives = []
+        for alternative in group.split('|'):
+            match = RELATION.match(alternative)
+            if not match:
+                continue
+            name, op, version = match.groups()
+            alternatives.append(f"{name}{DEBIAN_OPERATORS[op]}{version}" if op else name)
+        if alternatives:
+            groups.append(alternatives)
+    return groups
+
+def relation_names(value):
+    """Bare package names of every alternative in a relation field."""
+    return {parse_constraint(alt)[0].split(':')[0] for group in parse_relations(value) for alt in group}
+
+class DebianCollector(Collector):
+    """
+    Shared record building and resolution for dpkg-based sources.
+
+    Records carry Depends On entries of the form 'a>=1 | b', one per
+    dependency (Pre-Depends included), with Debian operators rewritten
+    in pacman's notation so the conflict analyses can read them;
+    Breaks count as conflicts, and Replaces only when the package also
+    conflicts with or breaks the replaced one (a real replacement rather
+    than a file takeover). Foreign-architecture packages are named
+    'name:arch'. Versions keep Debian semantics, so the snapshot is
+    marked with the 'dpkg' version scheme.
+    """
+
+    version_scheme = 'dpkg'
+
+    def stanzas(self):
+        raise NotImplementedError
+
+    def install_reason(self, stanza):
+        return None
+
+    def records(self):
+        candidates = []
+        for stanza in self.stanzas():
+            if 'Package' in stanza and 'Version' in stanza:
+                candidates.append(stanza)
+        arches = Counter(s.get('Architecture', 'all') for s in candidates)
+        arches.pop('all', None)
+        primary = arches.most_common(1)[0][0] if arches else 'all'
+
+        records = {}
+        for stanza in candidates:
+            arch = stanza.get('Architecture', 'all')
+            name = stanza['Package'] if arch in (primary, 'all') else f"{stanza['Package']}:{arch}"
+            if name in records and dpkg_compare(records[name]['Version'], stanza['Version']) >= 0:
+                continue  # Several indices may carry the same package; the newest wins
+            records[name] = self.record(stanza, arch)
+        return records
+
+    def record(self, stanza, arch):
+        conflicts = ', '.join(v for v in (stanza.get('Conflicts'), stanza.get('Breaks')) if v)
+        conflicting = relation_names(conflicts)
+        size = stanza.get('Installed-Size')
+        return {
+            'Name': stanza['Package'],
+            'Version': stanza['Version'],
+            'Architecture': arch,
+            'Depends On': [' | '.join(group) for field in ('Pre-Depends', 'Depends')
+                           for group in parse_relations(stanza.get(field, ''))],
+            'Provides': [alt for group in parse_relations(stanza.get('Provides', '')) for alt in group],
+            'Conflicts With': [alt for group in parse_relations(conflicts) for alt in group],
+            'Replaces': [alt for group in parse_relations(stanza.get('Replaces', '')) for alt in group
+                         if parse_constraint(alt)[0].split(':')[0] in conflicting],
+            'Installed Size': f"{size} KiB" if size and size.isdigit() else None,
+            'Install Reason': self.install_reason(stanza)
+        }
+
+    def resolve(self, packages, records):
+        """
+        Resolve each dependency to the providers of every satisfiable alternative.
+
+        All edges of 'a | b' share the dependency string, so the solver
+        reads them as one clause and either alternative can be chosen;
+        the dependency is unresolved only if no alternative matches.
+        Versioned relations are checked with dpkg's ordering, and only
+        versioned Provides can satisfy them. Providers of the dependent's
+        own architecture (or 'all') are preferred unless the relation is
+        ':any'.
+        """
+        pkg_to_idx = {pkg: i for i, pkg in enumerate(packages)}
+        arch = [records[p]['Architecture'] for p in packages]
+        index = defaultdict(list)
+        for i, pkg in enumerate(packages):
+            record = records[pkg]
+            index[record['Name']].append((i, record['Version'], False))
+            for provided in record['Provides']:
+                name, op, version = parse_constraint(provided)
+                index[name.split(':')[0]].append((i, version if op == '=' else None, True))
+        print(f"Provider index: {len(index)} satisfiable names")
+
+        edges = []
+        unresolved = defaultdict(list)
+        # The same relation (e.g. 'libc6>=2.34') recurs thousands of times; match it once
+        satisfying = {}
+        for i, pkg in enumerate(packages):
+            for dep in records[pkg]['Depends On']:
+                resolved = False
+                for k, alternative in enumerate(dep.split(' | ')):
+                    name, op, version = parse_constraint(alternative)
+                    name, _, qualifier = name.partition(':')
+                    matches = satisfying.get(alternative)
+                    if matches is None:
+                        matches = satisfying[alternative] = [
+                            (j, provided) for j, provided_version, provided in index.get(name, ())
+                            if op is None or (provided_version is not None
+                                              and dpkg_satisfies(provided_version, op, version))]
+                    if qualifier != 'any' and arch[i] != 'all':
+                        native = [(j, provided) for j, provided in matches if arch[j] in (arch[i], 'all')]
+                        matches = native or matches
+                    for j, provided in matches:
+                        if j != i:
+                            via = 'provides' if provided else ('alternative' if k else 'name')
+                            edges.append([i, j, via, dep])
+                    resolved = resolved or bool(matches)
+                if not resolved:
+                    unresolved[pkg].append(dep)
+
+        print(f"Resolved edges by kind: {dict(Counter(edge[2] for edge in edges))}")
+        print(f"Unresolved dependencies: {sum(len(v) for v in unresolved.values())}")
+        return pkg_to_idx, edges, dict(unresolved)
+
+class DpkgStatusCollector(DebianCollector):
+    """Installed packages from dpkg's status file, with APT's auto-installed marks as install reasons."""
+
+    title = 'DPKG STATUS COLLECTION'
+
+    def __init__(self, status_paths=None, extended_states='/var/lib/apt/extended_states'):
+        self.paths = list(status_paths) if status_paths else ['/var/lib/dpkg/status']
+        # Package -> architectures APT marked as automatically installed
+        self.auto = None
+        if extended_states and os.path.exists(extended_states):
+            self.auto = defaultdict(set)
+            with open_index(extended_states) as f:
+                for s in iter_stanzas(f, frozenset(('Package', 'Architecture', 'Auto-Installed'))):
+                    if s.get('Auto-Installed') == '1' and 'Package' in s:
+                        self.auto[s['Package']].add(s.get('Architecture'))
+
+    def stanzas(self):
+        for path in self.paths:
+            with open_index(path) as f:
+                for stanza in iter_stanzas(f):
+                    status = stanza.get('Status', '').split()
+                    if status and status[-1] in INSTALLED_STATES:
+                        yield stanza
+
+    def install_reason(self, stanza):
+        """pacman's Install Reason text, so parse_install_reason reads it like a -Qi record."""
+        if self.auto is None:
+            return None
+        arches = self.auto.get(stanza['Package'], ())
+        # APT files Architecture: all packages under the native architecture
+        if stanza.get('Architecture') in arches or (arches and stanza.get('Architecture') == 'all'):
+            return 'Installed as a dependency for another package'
+        return 'Explicitly installed'
+
+class AptPackagesCollector(DebianCollector):
+    """Every package in APT Packages indices (plain, .gz, .xz or .bz2), e.g. a whole archive."""
+
+    title = 'APT PACKAGES INDEX COLLECTION'
+
+    def __init__(self, index_paths=None, lists_dir='/var/lib/apt/lists'):
+        self.paths = list(index_paths) if index_paths else sorted(glob.glob(os.path.join(lists_dir, '*_Packages')))
+
+    def stanzas(self):
+        for path in self.paths:
+            with open_index(path) as f:
+                yield from iter_stanzas(f)
+
+if __name__ == "__main__":
+    # Usage: debian_packages.py <status|Packages files...>     (a file named status is read as dpkg status)
+    paths = sys.argv[1:] or ['/var/lib/dpkg/status']
+    if all(os.path.basename(p) == 'status' for p in paths):
+        DpkgStatusCollector(paths).collect('/home/zack/dependency_data.json')
+    else:
+        AptPackagesCollector(paths).collect('/home/zack/dependency_data.json')
@@ -4,12 +4,17 @@ Dependency Analysis System
 Analyzes package dependencies using graph theory and linear algebra
 """
 
-import subprocess
+import os
+import sys
 import json
 import numpy as np
 from collections import defaultdict
 import re
 
+# Shared helpers live with the analysis scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analysis'))
+from progress_events import Stage, run_command
+
 # Package list from the system
 PACKAGES = """
 a52dec 0.8.0-2
@@ -1567,6 +1572,9 @@ zvbi 0.2.44-1
 zxing-cpp 2.3.0-5
 """.strip()
 
+# Field names in `pacman -Qi` output that hold whitespace-separated lists
+LIST_FIELDS = ('Depends On', 'Provides', 'Conflicts With', 'Replaces', 'Required By')
+
 def parse_packages():
     """Parse the package list and return package names."""
     packages = []
@@ -1577,81 +1585,256 @@ def parse_packages():
             packages.append(pkg_name)
     return sorted(packages)
 
-def get_dependencies(package):
-    """Get dependencies for a single package using pacman."""
+def parse_pacman_info(output):
+    """
+    Parse `pacman -Qi` output into a field -> value dict.
+
+    Long values wrap onto indented continuation lines, which are joined
+    back onto the field they belong to. List fields become lists.
+    """
+    info = {}
+    field = None
+    for line in output.split('\n'):
+        if not line.strip():
+            continue
+        if line[0].isspace() and field is not None:
+            info[field] += ' ' + line.strip()
+            continue
+        if ':' in line:
+            field, value = line.split(':', 1)
+            field = field.strip()
+            info[field] = value.strip()
+    for field in LIST_FIELDS:
+        value = info.get(field, 'None')
+        info[field] = [] if value == 'None' else value.split()
+    return info
+
+SIZE_UNITS = {'B': 1, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'TiB': 1024 ** 4}
+
+def parse_size(value):
+    """Convert a pacman size like '12.34 MiB' to bytes (None if unparseable)."""
     try:
-        result = subprocess.run(
-            ['pacman', '-Qi', package],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
+        number, unit = value.split()
+        return int(round(float(number) * SIZE_UNITS[unit]))
+    except (AttributeError, ValueError, KeyError):
+        return None
 
-        if result.returncode == 0:
-            deps = []
-            for line in result.stdout.split('\n'):
-                if line.startswith('Depends On'):
-                    # Extract dependencies from "Depends On      : dep1  dep2  dep3"
-                    deps_str = line.split(':', 1)[1].strip()
-                    if deps_str and deps_str != 'None':
-                        # Split by whitespace and remove version constraints
-                        for dep in deps_str.split():
-                            # Remove version constraints like >=, <=, =, etc.
-                            clean_dep = re.split(r'[<>=]', dep)[0]
-                            if clean_dep:
-                                deps.append(clean_dep)
-                    break
-            return deps
-        return []
-    except Exception as e:
+def parse_install_reason(value):
+    """Map pacman's Install Reason text to 'explicit' or 'dependency' (None if missing)."""
+    if not value:
+        return None
+    return 'explicit' if value.startswith('Explicitly') else 'dependency'
+
+def get_package_info(package, stage=None):
+    """Get the parsed `pacman -Qi` record for a single package (None if pacman failed)."""
+    output = run_command(['pacman', '-Qi', package], package, stage)
+    if output is None:
+        return None
+    return parse_pacman_info(output)
+
+def get_dependencies(package):
+    """Get dependencies for a single package using pacman."""
+    info = get_package_info(package)
+    if info is None:
         return []
+    deps = []
+    for dep in info['Depends On']:
+        # Remove version constraints like >=, <=, =, etc.
+        clean_dep = re.split(r'[<>=]', dep)[0]
+        if clean_dep:
+            deps.append(clean_dep)
+    return deps
 
-def build_dependency_matrix(packages):
-    """Build an adjacency matrix representing dependencies."""
-    n = len(packages)
+def parse_dependency(dep):
+    """Split a dependency string like 'libfoo.so=1-64' into (name, operator, version)."""
+    match = re.match(r'^([^<>=]+)(<=|>=|<|>|=)?(.*)$', dep)
+    name, op, version = match.groups()
+    return name, op, (version if op else None)
+
+def build_provider_index(packages, package_info):
+    """
+    Build an inverted index from every satisfiable name to its providers.
+
+    Each package provides its own name (at its installed version) plus
+    every entry of its Provides field, including versioned sonames such as
+    'libfoo.so=1-64'. Returns name -> [(package index, provided version, via)].
+    """
+    index = defaultdict(list)
+    for i, pkg in enumerate(packages):
+        info = package_info.get(pkg) or {}
+        index[pkg].append((i, info.get('Version'), 'name'))
+        for provided in info.get('Provides', []):
+            name, op, version = parse_dependency(provided)
+            via = 'soname' if '.so' in name else 'provides'
+            index[name].append((i, version if op == '=' else None, via))
+    return index
+
+def resolve_dependency(dep, provider_index):
+    """
+    Resolve a dependency string through the provider index.
+
+    Returns [(provider index, via)] for every provider that satisfies it;
+    an '=' constraint on a provided name (e.g. lib32 vs 64-bit sonames)
+    must match the provided version exactly.
+    """
+    name, op, version = parse_dependency(dep)
+    matches = []
+    for j, provided_version, via in provider_index.get(name, ()):
+        if op == '=' and via != 'name' and provided_version is not None and provided_version != version:
+            continue
+        matches.append((j, via))
+    return matches
+
+def collect_package_info(packages):
+    """Run `pacman -Qi` once per package and keep the parsed records."""
+    package_info = {}
+    with Stage('collect package info', total=len(packages), every=50, label='package') as stage:
+        for package in packages:
+            stage.advance(package)
+            package_info[package] = get_package_info(package, stage)
+    return package_info
+
+def resolve_dependency_edges(packages, package_info):
+    """
+    Resolve every package's dependencies to edges without building a matrix.
+
+    Dependencies are resolved through the provider index, so virtual names
+    and sonames become edges to the packages that provide them. Returns the
+    package index, the edge list [i, j, via, dependency] and the
+    dependencies no package in the set satisfies.
+    """
     pkg_to_idx = {pkg: i for i, pkg in enumerate(packages)}
+    provider_index = build_provider_index(packages, package_info)
+    print(f"Provider index: {len(provider_index)} satisfiable names")
+
+    edges = []
+    unresolved = defaultdict(list)
+    for i, package in enumerate(packages):
+        info = package_info.get(package) or {}
+        for dep in info.get('Depends On', []):
+            matches = resolve_dependency(dep, provider_index)
+            if not matches:
+                unresolved[package].append(dep)
+            for j, via in matches:
+                if j != i:
+                    edges.append([i, j, via, dep])
+
+    via_counts = defaultdict(int)
+    for edge in edges:
+        via_counts[edge[2]] += 1
+    print(f"Resolved edges by kind: {dict(via_counts)}")
+    print(f"Unresolved dependencies: {sum(len(v) for v in unresolved.values())}")
+
+    return pkg_to_idx, edges, dict(unresolved)
+
+def required_by_from_edges(packages, edges):
+    """Required By lists derived from resolved edges, for records that do not carry them."""
+    required_by = {p: set() for p in packages}
+    for i, j, _, _ in edges:
+        required_by[packages[j]].add(packages[i])
+    return {p: sorted(r) for p, r in required_by.items()}
+
+def build_dependency_matrix(packages, package_info=None):
+    """
+    Build an adjacency matrix representing dependencies.
+
+    Returns the matrix, the package index, the edge list
+    [i, j, via, dependency] and the dependencies no installed package
+    satisfies (see resolve_dependency_edges).
+    """
+    n = len(packages)
 
     # Initialize adjacency matrix
     adj_matrix = np.zeros((n, n), dtype=np.int8)
 
     print(f"Building dependency matrix for {n} packages...")
+    if package_info is None:
+        package_info = collect_package_info(packages)
 
-    for i, package in enumerate(packages):
-        if i % 50 == 0:
-            print(f"Processing package {i}/{n}: {package}")
+    pkg_to_idx, edges, unresolved = resolve_dependency_edges(packages, package_info)
+    for i, j, _, _ in edges:
+        adj_matrix[i, j] = 1
 
-        deps = get_dependencies(package)
-        for dep in deps:
-            if dep in pkg_to_idx:
-                j = pkg_to_idx[dep]
-                adj_matrix[i, j] = 1
+    return adj_matrix, pkg_to_idx, edges, unresolved
 
-    return adj_matrix, pkg_to_idx
+def save_results(packages, adj_matrix, pkg_to_idx, package_info=None, edges=None, unresolved=None,
+                 output_file='/home/zack/dependency_data.json', version_scheme=None):
+    """
+    Save analysis results; without a matrix the snapshot carries only the edge list.
 
-def save_results(packages, adj_matrix, pkg_to_idx):
-    """Save analysis results."""
-    data = {
-        'packages': packages,
-        'adjacency_matrix': adj_matrix.tolist(),
-        'pkg_to_idx': pkg_to_idx
-    }
+    version_scheme ('dpkg' for Debian sources) tells the analyses how to
+    order versions; snapshots without one use pacman's vercmp.
+    """
+    data = {'packages': packages}
+    if version_scheme is not None:
+        data['version_scheme'] = version_scheme
+    if adj_matrix is not None:
+        data['adjacency_matrix'] = adj_matrix.tolist()
+    data['pkg_to_idx'] = pkg_to_idx
+    if package_info is not None:
+        data['versions'] = {p: (package_info.get(p) or {}).get('Version') for p in packages}
+        data['dependencies'] = {p: (package_info.get(p) or {}).get('Depends On', []) for p in packages}
+        data['provides'] = {p: (package_info.get(p) or {}).get('Provides', []) for p in packages}
+        data['conflicts'] = {p: (package_info.get(p) or {}).get('Conflicts With', []) for p in packages}
+        data['replaces'] = {p: (package_info.get(p) or {}).get('Replaces', []) for p in packages}
+        data['sizes'] = {p: parse_size((package_info.get(p) or {}).get('Installed Size')) for p in packages}
+        data['install_reasons'] = {p: parse_install_reason((package_info.get(p) or {}).get('Install Reason'))
+                                   for p in packages}
+        data['required_by'] = {p: (package_info.get(p) or {}).get('Required By', []) for p in packages}
+    if edges is not None:
+        data['dependency_edges'] = edges
+    if unresolved is not None:
+        data['unresolved_dependencies'] = unresolved
 
-    with open('/home/zack/dependency_data.json', 'w') as f:
-        json.dump(data, f)
+    # json.dumps uses the C encoder; json.dump streams through the much slower Python one
+    with open(output_file, 'w') as f:
+        f.write(json.dumps(data))
 
-    print("Data saved to /home/zack/dependency_data.json")
+    print(f"Data saved to {output_file}")
 
-if __name__ == "__main__":
+def package_info_from_snapshot(data):
+    """
+    Rebuild per-package records from a saved snapshot, so unchanged packages need no pacman call.
+
+    Returns None if the snapshot predates any of the saved fields.
+    """
+    fields = ('versions', 'dependencies', 'provides', 'conflicts', 'replaces',
+              'sizes', 'install_reasons', 'required_by')
+    if any(field not in data for field in fields):
+        return None
+    reasons = {'explicit': 'Explicitly installed', 'dependency': 'Installed as a dependency for another package'}
+    return {
+        p: {
+            'Name': p,
+            'Version': data['versions'][p],
+            'Depends On': data['dependencies'][p],
+            'Provides': data['provides'][p],
+            'Conflicts With': data['conflicts'][p],
+            'Replaces': data['replaces'][p],
+            'Required By': data['required_by'][p],
+            'Installed Size': f"{data['sizes'][p]} B" if data['sizes'][p] is not None else None,
+            'Install Reason': reasons.get(data['install_reasons'][p])
+        }
+        for p in data['packages']
+    }
+
+def collect_dependency_data(output_file='/home/zack/dependency_data.json'):
+    """Collect pacman records, build the dependency matrix and save the snapshot."""
     print("Starting dependency analysis...")
     packages = parse_packages()
     print(f"Found {len(packages)} packages")
 
-    # Build dependency matrix
-    adj_matrix, pkg_to_idx = build_dependency_matrix(packages)
+    # Collect pacman records and build the provider-resolved dependency matrix
+    package_info = collect_package_info(packages)
+    adj_matrix, pkg_to_idx, edges, unresolved = build_dependency_matrix(packages, package_info)
 
     # Save results
-    save_results(packages, adj_matrix, pkg_to_idx)
+    save_results(packages, adj_matrix, pkg_to_idx, package_info, edges, unresolved, output_file)
 
     print(f"\nMatrix dimensions: {adj_matrix.shape}")
     print(f"Total dependencies: {np.sum(adj_matrix)}")
     print(f"Density: {np.sum(adj_matrix) / (adj_matrix.shape[0]**2):.4f}")
+    return adj_matrix
+
+if __name__ == "__main__":
+    collect_dependency_data()
@@ -0,0 +1,275 @@
+#!/usr/bin/python3
+"""
+File Ownership Collision Index
+Streams per-package file lists and reports every path owned by more than one package
+"""
+
+import os
+import sys
+import json
+import hashlib
+import subprocess
+from array import array
+import numpy as np
+
+def _basename_hash(name):
+    """Signed 64-bit hash of a basename."""
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8', 'surrogateescape'), digest_size=8).digest(),
+                          'little', signed=True)
+
+def iter_local_db(db_path='/var/lib/pacman/local'):
+    """Yield (package, path) from the local pacman database `files` entries, one package at a time."""
+    for entry in sorted(os.listdir(db_path)):
+        pkg_dir = os.path.join(db_path, entry)
+        files_path = os.path.join(pkg_dir, 'files')
+        if not os.path.isfile(files_path):
+            continue
+        package = entry.rsplit('-', 2)[0]
+        desc_path = os.path.join(pkg_dir, 'desc')
+        if os.path.isfile(desc_path):
+            with open(desc_path, 'r', errors='surrogateescape') as f:
+                lines = f.read().split('\n')
+            if '%NAME%' in lines:
+                package = lines[lines.index('%NAME%') + 1]
+        with open(files_path, 'r', errors='surrogateescape') as f:
+            in_files = False
+            for line in f:
+                line = line.rstrip('\n')
+                if line.startswith('%'):
+                    in_files = line == '%FILES%'
+                elif in_files and line:
+                    yield package, line
+
+def parse_pacman_ql(lines):
+    """Yield (package, path) from `pacman -Ql` lines ("name /path")."""
+    for line in lines:
+        line = line.rstrip('\n')
+        if ' ' in line:
+            package, path = line.split(' ', 1)
+            yield package, path
+
+def iter_pacman_ql():
+    """Stream `pacman -Ql` output without holding it in memory."""
+    proc = subprocess.Popen(['pacman', '-Ql'], stdout=subprocess.PIPE, text=True, errors='surrogateescape')
+    try:
+        yield from parse_pacman_ql(proc.stdout)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+class FileOwnershipIndex:
+    """
+    Compact ownership index over every file of every package.
+
+    Directories are interned once in a trie (parent id + component), and
+    each file is three integers in typed arrays: owner id, directory id
+    and a 64-bit hash of its basename. Nothing per file is kept as a
+    Python string, so millions of entries cost ~16 bytes each.
+    """
+
+    def __init__(self):
+        self.packages = []
+        self.pkg_to_id = {}
+        self.dir_parent = array('i', [-1])
+        self.dir_name = ['']
+        self.dir_lookup = {}
+        self.file_owner = array('i')
+        self.file_dir = array('i')
+        self.file_hash = array('q')
+        self.num_dir_entries = 0
+
+    def _package_id(self, package):
+        if package not in self.pkg_to_id:
+            self.pkg_to_id[package] = len(self.packages)
+            self.packages.append(package)
+        return self.pkg_to_id[package]
+
+    def _dir_id(self, components):
+        d = 0
+        for name in components:
+            key = (d, name)
+            child = self.dir_lookup.get(key)
+            if child is None:
+                child = len(self.dir_name)
+                self.dir_lookup[key] = child
+                self.dir_parent.append(d)
+                self.dir_name.append(sys.intern(name))
+            d = child
+        return d
+
+    @staticmethod
+    def _split(path):
+        """(directory components, basename) of a path; basename is '' for directory entries."""
+        parts = path.strip('/').split('/')
+        if path.endswith('/'):
+            return parts, ''
+        return parts[:-1], parts[-1]
+
+    def add(self, package, path):
+        """Record one owned path."""
+        owner = self._package_id(package)
+        dirs, base = self._split(path)
+        d = self._dir_id(dirs)
+        if not base:
+            self.num_dir_entries += 1  # Shared directories are not conflicts
+            return
+        self.file_owner.append(owner)
+        self.file_dir.append(d)
+        self.file_hash.append(_basename_hash(base))
+
+    def ingest(self, records, progress_every=500000):
+        """Consume an iterable of (package, path) records."""
+        for k, (package, path) in enumerate(records):
+            self.add(package, path)
+            if progress_every and k and k % progress_every == 0:
+                print(f"   {k} paths indexed ({len(self.dir_name)} directories)")
+
+    def dir_path(self, d):
+        """Full path of a directory id."""
+        parts = []
+        while d > 0:
+            parts.append(self.dir_name[d])
+            d = self.dir_parent[d]
+        return '/' + '/'.join(reversed(parts))
+
+    def candidate_collisions(self):
+        """
+        (dir id, basename hash) keys owned by more than one package.
+
+        Returns [(dir id, hash, [owner ids])]. Hash equality only makes
+        these candidates; `resolve_collisions` confirms the names.
+        """
+        owner = np.frombuffer(self.file_owner, dtype=np.int32)
+        dirs = np.frombuffer(self.file_dir, dtype=np.int32)
+        hashes = np.frombuffer(self.file_hash, dtype=np.int64)
+        if not len(owner):
+            return []
+        order = np.lexsort((owner, hashes, dirs))
+        dirs, hashes, owner = dirs[order], hashes[order], owner[order]
+        new_key = np.ones(len(dirs), dtype=bool)
+        new_key[1:] = (dirs[1:] != dirs[:-1]) | (hashes[1:] != hashes[:-1])
+        starts = np.where(new_key)[0]
+        ends = np.append(starts[1:], len(dirs))
+        # Distinct owners per key: owners are sorted within a key, so count owner changes
+        owner_change = np.ones(len(dirs), dtype=bool)
+        owner_change[1:] = new_key[1:] | (owner[1:] != owner[:-1])
+        distinct = np.add.reduceat(owner_change.astype(np.int64), starts)
+        candidates = []
+        for k in np.where(distinct > 1)[0]:
+            s, e = starts[k], ends[k]
+            candidates.append((int(dirs[s]), int(hashes[s]), sorted(set(owner[s:e].tolist()))))
+        return candidates
+
+    def resolve_collisions(self, records, candidates):
+        """
+        Second streaming pass that names the candidate collisions.
+
+        Only paths whose (directory, basename hash) is a candidate are kept,
+        then grouped by exact path so hash collisions between different
+        names drop out. Returns [(path, [owners])] sorted by path.
+        """
+        wanted = {(d, h) for d, h, _ in candidates}
+        wanted_dirs = {d for d, _ in wanted}
+        owners = {}
+        for package, path in records:
+            dirs, base = self._split(path)
+            if not base:
+                continue
+            d = 0
+            for name in dirs:
+                d = self.dir_lookup.get((d, name), -1)
+                if d < 0:
+                    break
+            if d not in wanted_dirs or (d, _basename_hash(base)) not in wanted:
+                continue
+            full = self.dir_path(d).rstrip('/') + '/' + base
+            owners.setdefault(full, set()).add(package)
+        return sorted((path, sorted(pkgs)) for path, pkgs in owners.items() if len(pkgs) > 1)
+
+    def statistics(self):
+        return {
+            'packages': len(self.packages),
+            'files': len(self.file_owner),
+            'directory_entries': self.num_dir_entries,
+            'interned_directories': len(self.dir_name),
+            'index_bytes': (self.file_owner.itemsize * len(self.file_owner) +
+                            self.file_dir.itemsize * len(self.file_dir) +
+                            self.file_hash.itemsize * len(self.file_hash) +
+                            self.dir_parent.itemsize * len(self.dir_parent))
+        }
+
+def collect_file_ownership(source='db', db_path='/var/lib/pacman/local',
+                           output_file='/home/zack/file_ownership.json'):
+    """
+    Build the ownership index and report paths with more than one owner.
+
+    source is 'db' (local database `files` entries), 'pacman' (`pacman -Ql`)
+    or the path of a saved `pacman -Ql` listing.
+    """
+    if source == 'db':
+        records = lambda: iter_local_db(db_path)
+    elif source == 'pacman':
+        records = iter_pacman_ql
+    else:
+        def records():
+            with open(source, 'r', errors='surrogateescape') as f:
+                yield from parse_pacman_ql(f)
+
+    print("="*70)
+    print("FILE OWNERSHIP COLLISION INDEX")
+    print("="*70)
+
+    print("\n[1/3] Indexing owned files...")
+    index = FileOwnershipIndex()
+    index.ingest(records())
+    stats = index.statistics()
+    print(f"   {stats['files']} files from {stats['packages']} packages, "
+          f"{stats['interned_directories']} directories, {stats['index_bytes'] / 1024 / 1024:.1f} MB index")
+
+    print("\n[2/3] Finding shared (directory, basename) keys...")
+    candidates = index.candidate_collisions()
+    print(f"   {len(candidates)} candidate keys")
+
+    print("\n[3/3] Naming collisions...")
+    collisions = index.resolve_collisions(records(), candidates) if candidates else []
+
+    print("\n" + "="*70)
+    print("FILE OWNERSHIP RESULTS")
+    print("="*70)
+
+    pair_counts = {}
+    for path, owners in collisions:
+        for a in range(len(owners)):
+            for b in range(a + 1, len(owners)):
+                pair_counts[(owners[a], owners[b])] = pair_counts.get((owners[a], owners[b]), 0) + 1
+
+    print(f"\n1. PATHS WITH MORE THAN ONE OWNER: {len(collisions)}")
+    for path, owners in collisions[:20]:
+        print(f"     • {path}: {', '.join(owners)}")
+    if len(collisions) > 20:
+        print(f"     ... and {len(collisions) - 20} more")
+
+    print(f"\n2. PACKAGE PAIRS SHARING FILES: {len(pair_counts)}")
+    for (a, b), count in sorted(pair_counts.items(), key=lambda x: x[1], reverse=True)[:10]:
+        print(f"     • {a} ⇄ {b}: {count} files")
+
+    results = {
+        'collisions': [{'path': path, 'owners': owners} for path, owners in collisions],
+        'package_pairs': [{'packages': [a, b], 'shared_files': count}
+                          for (a, b), count in sorted(pair_counts.items())],
+        'statistics': dict(stats, collisions=len(collisions), candidate_keys=len(candidates))
+    }
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "="*70)
+    print(f"Results saved to: {output_file}")
+    print("="*70)
+
+    return results
+
+if __name__ == "__main__":
+    # Usage: file_ownership.py [db | pacman | <pacman -Ql listing>]
+    source = sys.argv[1] if len(sys.argv) > 1 else 'db'
+    results = collect_file_ownership(source)
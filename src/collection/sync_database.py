@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+"""
+Sync Database Ingestion
+Builds a dependency snapshot of whole repositories by streaming pacman sync databases
+"""
+
+import os
+import sys
+import glob
+import tarfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collectors import Collector
+# dependency_analysis (imported by collectors) puts the analysis scripts on the path
+from progress_events import Stage
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# Repositories in pacman.conf's usual order; the first repository carrying a name wins
+REPO_ORDER = ('core-testing', 'core', 'extra-testing', 'extra', 'multilib-testing', 'multilib')
+
+# desc %FIELD% -> `pacman -Qi` field of the records the snapshot is built from
+DESC_FIELDS = {
+    'NAME': 'Name',
+    'VERSION': 'Version',
+    'DEPENDS': 'Depends On',
+    'PROVIDES': 'Provides',
+    'CONFLICTS': 'Conflicts With',
+    'REPLACES': 'Replaces'
+}
+
+def parse_desc(text, fields=None):
+    """Parse a desc (or legacy depends) file into {FIELD: [values]}."""
+    fields = {} if fields is None else fields
+    key = None
+    for line in text.split('\n'):
+        if line.startswith('%') and line.endswith('%') and len(line) > 2:
+            key = line[1:-1]
+            fields.setdefault(key, [])
+        elif line and key is not None:
+            fields[key].append(line)
+        elif not line:
+            key = None
+    return fields
+
+def desc_to_info(fields, repo):
+    """Turn parsed desc fields into a record shaped like parse_pacman_info's output."""
+    info = {field: [] for field in DESC_FIELDS.values()}
+    for key, field in DESC_FIELDS.items():
+        values = fields.get(key, [])
+        info[field] = values[0] if key in ('NAME', 'VERSION') and values else values
+    size = fields.get('ISIZE')
+    info['Installed Size'] = f"{size[0]} B" if size else None
+    info['Install Reason'] = None
+    info['Repository'] = repo
+    return info
+
+def repo_name(path):
+    """core.db, core.db.tar.gz or core.files -> core"""
+    return os.path.basename(path).split('.')[0]
+
+def open_sync_db(path):
+    """A streaming tarfile over a sync database, whatever it is compressed with."""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed; install python-zstandard to read it")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+        return tarfile.open(fileobj=stream, mode='r|')
+    return tarfile.open(path, mode='r|*')
+
+def read_sync_db(path):
+    """
+    Stream the desc entries of one sync database. Returns (repo, {name: record}).
+
+    Members are read in archive order straight from the decompressor, so
+    nothing is extracted to disk and memory holds one entry at a time
+    plus the records.
+    """
+    repo = repo_name(path)
+    entries = {}
+    with open_sync_db(path) as tar:
+        for member in tar:
+            entry, filename = os.path.split(member.name)
+            if not member.isfile() or filename not in ('desc', 'depends'):
+                continue
+            text = tar.extractfile(member).read().decode('utf-8', errors='replace')
+            parse_desc(text, entries.setdefault(entry, {}))
+    records = {}
+    for fields in entries.values():
+        if fields.get('NAME'):
+            info = desc_to_info(fields, repo)
+            records[info['Name']] = info
+    return repo, records
+
+def rank_repos(paths):
+    """Database paths in precedence order: known repositories first in pacman.conf order, then by name."""
+    rank = {repo: i for i, repo in enumerate(REPO_ORDER)}
+    return sorted(paths, key=lambda p: (rank.get(repo_name(p), len(rank)), repo_name(p)))
+
+def sync_db_paths(sync_dir='/var/lib/pacman/sync'):
+    """Sync databases in a directory, known repositories first in pacman.conf order."""
+    return rank_repos(glob.glob(os.path.join(sync_dir, '*.db')))
+
+class SyncDbCollector(Collector):
+    """
+    Every package in the sync databases, read in parallel, one process per database.
+
+    The snapshot has the same fields as dependency_analysis.py's, minus
+    the dense adjacency matrix (the analyses rebuild it sparsely from the
+    edge list) and install reasons, which only the local database knows.
+    """
+
+    title = 'SYNC DATABASE INGESTION'
+
+    def __init__(self, db_paths=None, sync_dir='/var/lib/pacman/sync', jobs=None):
+        # Explicit databases are ranked too, so e.g. core-testing shadows core whatever the argument order
+        self.paths = rank_repos(db_paths) if db_paths else sync_db_paths(sync_dir)
+        self.jobs = jobs
+
+    def records(self):
+        by_repo = {}
+        with Stage('read sync databases', total=len(self.paths), every=1, label='database') as stage:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                futures = {pool.submit(read_sync_db, path): path for path in self.paths}
+                for future in as_completed(futures):
+                    stage.advance(futures[future])
+                    try:
+                        repo, records = future.result()
+                    except (OSError, tarfile.TarError, RuntimeError) as e:
+                        stage.failure(futures[future], e, type(e).__name__)
+                        continue
+                    by_repo[futures[future]] = records
+                    print(f"   {repo:<20} {len(records)} packages")
+
+        package_info = {}
+        shadowed = 0
+        for path in self.paths:
+            for name, info in by_repo.get(path, {}).items():
+                if name in package_info:
+                    shadowed += 1
+                    continue
+                package_info[name] = info
+        print(f"   {shadowed} packages shadowed by an earlier repository")
+        return package_info
+
+def collect_sync_data(db_paths=None, sync_dir='/var/lib/pacman/sync',
+                      output_file='/home/zack/sync_dependency_data.json', jobs=None):
+    """Read sync databases, resolve dependencies across them and save the snapshot."""
+    collector = SyncDbCollector(db_paths, sync_dir, jobs)
+    if not collector.paths:
+        print(f"No sync databases found in {sync_dir}")
+        return None
+    collector.collect(output_file)
+    return output_file
+
+if __name__ == "__main__":
+    # Usage: sync_database.py [db files...]     (default: every *.db in /var/lib/pacman/sync)
+    collect_sync_data(sys.argv[1:] or None)
@@ -0,0 +1,331 @@
+#!/usr/bin/python3
+"""
+Fingerprinted Analysis Pipeline
+Runs the collection and analysis scripts as stages with declared inputs and outputs, skipping unchanged work
+"""
+
+import os
+import ast
+import sys
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# The scripts import their siblings by bare module name
+for sub in ('collection', 'analysis'):
+    path = os.path.join(SRC_DIR, sub)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+STATE_FILE = '.pipeline_state.json'
+
+# Artifact name -> file name inside the artifact directory
+ARTIFACTS = {
+    'dependency_data': 'dependency_data.json',
+    'conflict_analysis': 'conflict_analysis.json',
+    'incompatibility_matrix': 'incompatibility_matrix_results.json',
+    'analysis_results': 'analysis_results.json',
+    'pagerank_state': 'pagerank_state.json',
+    'transitive_incompatibility': 'transitive_incompatibility.json',
+    'cycle_analysis': 'cycle_analysis.json',
+    'dominator_analysis': 'dominator_analysis.json',
+    'footprint_analysis': 'footprint_analysis.json',
+    'orphan_analysis': 'orphan_analysis.json'
+}
+
+# Each stage calls module.function with artifact paths bound to keyword arguments.
+# 'external' stages read live pacman state, so their inputs alone cannot say whether
+# they are stale; they only re-run when --refresh is given or an output is missing.
+# 'state' artifacts are carried between runs but never fingerprinted (warm starts).
+STAGES = {
+    'collect': {
+        'module': 'dependency_analysis', 'function': 'collect_dependency_data',
+        'inputs': {}, 'outputs': {'output_file': 'dependency_data'}, 'external': True
+    },
+    'conflicts': {
+        'module': 'conflict_analysis', 'function': 'analyze_conflicts',
+        'inputs': {'data_file': 'dependency_data'}, 'outputs': {'output_file': 'conflict_analysis'},
+        'external': True
+    },
+    'incompatibility': {
+        'module': 'incompatibility_matrix_analysis', 'function': 'analyze_incompatibility_matrix',
+        'inputs': {'data_file': 'dependency_data', 'conflict_file': 'conflict_analysis'},
+        'outputs': {'output_file': 'incompatibility_matrix'}
+    },
+    'spectral': {
+        'module': 'mathematical_analysis', 'function': 'run_analysis',
+        'inputs': {'data_file': 'dependency_data'}, 'outputs': {'output_file': 'analysis_results'},
+        'state': {'state_file': 'pagerank_state'}
+    },
+    'transitive': {
+        'module': 'transitive_incompatibility', 'function': 'analyze_transitive_incompatibility',
+        'inputs': {'data_file': 'dependency_data', 'conflict_file': 'conflict_analysis'},
+        'outputs': {'output_file': 'transitive_incompatibility'}
+    },
+    'cycles': {
+        'module': 'cycle_analysis', 'function': 'analyze_cycles',
+        'inputs': {'data_file': 'dependency_data'}, 'outputs': {'output_file': 'cycle_analysis'}
+    },
+    'dominators': {
+        'module': 'dominator_analysis', 'function': 'analyze_dominators',
+        'inputs': {'data_file': 'dependency_data'}, 'outputs': {'output_file': 'dominator_analysis'}
+    },
+    'footprints': {
+        'module': 'footprint_analysis', 'function': 'analyze_footprints',
+        'inputs': {'data_file': 'dependency_data'}, 'outputs': {'output_file': 'footprint_analysis'}
+    },
+    'orphans': {
+        'module': 'orphan_analysis', 'function': 'analyze_orphans',
+        'inputs': {'data_file': 'dependency_data'}, 'outputs': {'output_file': 'orphan_analysis'}
+    }
+}
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Content fingerprint of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def module_path(module):
+    """Source file of a stage module under src/."""
+    path = local_module_path(module)
+    if path is None:
+        raise FileNotFoundError(f"No stage module named {module}")
+    return path
+
+def local_module_path(module):
+    """Source file of a module under src/collection or src/analysis, or None."""
+    for sub in ('collection', 'analysis'):
+        path = os.path.join(SRC_DIR, sub, module + '.py')
+        if os.path.exists(path):
+            return path
+    return None
+
+def local_imports(module):
+    """
+    The module and every local module it imports, transitively -> {module: path}.
+
+    Imports inside functions count too (several scripts import their
+    siblings lazily); third-party and standard-library modules are skipped.
+    """
+    module_path(module)  # Stage modules must exist; their imports may be third-party
+    found = {}
+    pending = [module]
+    while pending:
+        name = pending.pop()
+        path = local_module_path(name)
+        if name in found or path is None:
+            continue
+        found[name] = path
+        with open(path, 'r') as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module.split('.')[0])
+    return found
+
+def artifact_path(artifact_dir, artifact):
+    return os.path.join(artifact_dir, ARTIFACTS[artifact])
+
+def producers():
+    """Artifact -> stage that writes it."""
+    return {artifact: name for name, stage in STAGES.items() for artifact in stage['outputs'].values()}
+
+def upstream(names):
+    """The requested stages plus every stage they transitively need, in declaration order."""
+    made_by = producers()
+    needed = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        pending.extend(made_by[a] for a in STAGES[name]['inputs'].values() if a in made_by)
+    return [name for name in STAGES if name in needed]
+
+def stage_fingerprint(name, artifact_dir):
+    """
+    sha256 over the stage's code, including every local module it
+    imports, and the contents of its inputs.
+
+    Stages that plan with memory_planner also key on the memory budget,
+    since it decides which variants run and so what they write. An
+    unset budget (80% of available memory) is keyed as 'auto', so
+    memory fluctuations alone do not force a re-run.
+
+    Returns None when an input is missing.
+    """
+    stage = STAGES[name]
+    inputs = {}
+    for param, artifact in sorted(stage['inputs'].items()):
+        inputs[param] = file_sha256(artifact_path(artifact_dir, artifact))
+        if inputs[param] is None:
+            return None
+    modules = local_imports(stage['module'])
+    key = {
+        'modules': {module: file_sha256(path) for module, path in modules.items()},
+        'function': stage['function'],
+        'inputs': inputs
+    }
+    if 'memory_planner' in modules:
+        from memory_planner import BUDGET_ENV, parse_budget
+        budget = os.environ.get(BUDGET_ENV)
+        key['memory_budget'] = parse_budget(budget) if budget else 'auto'
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+def is_fresh(name, artifact_dir, state, refresh=False):
+    """True if the recorded run of a stage still matches its inputs and outputs."""
+    stage = STAGES[name]
+    record = state.get(name)
+    outputs_exist = all(os.path.exists(artifact_path(artifact_dir, a)) for a in stage['outputs'].values())
+    if stage.get('external'):
+        # Outputs of external stages may be replaced by hand (e.g. a copied snapshot) and are adopted as-is
+        if refresh or not outputs_exist:
+            return False
+        return record is None or record['fingerprint'] == stage_fingerprint(name, artifact_dir)
+    if record is None or record['fingerprint'] != stage_fingerprint(name, artifact_dir):
+        return False
+    return all(file_sha256(artifact_path(artifact_dir, a)) == record['outputs'].get(a)
+               for a in stage['outputs'].values())
+
+def stage_kwargs(name, artifact_dir):
+    stage = STAGES[name]
+    bound = dict(stage['inputs'], **stage['outputs'], **stage.get('state', {}))
+    return {param: artifact_path(artifact_dir, artifact) for param, artifact in bound.items()}
+
+def run_stage_worker(name, artifact_dir):
+    """Entry point of the child process that runs one stage."""
+    stage = STAGES[name]
+    module = importlib.import_module(stage['module'])
+    getattr(module, stage['function'])(**stage_kwargs(name, artifact_dir))
+
+def launch_stage(name, artifact_dir, log_dir):
+    """Run a stage in its own interpreter with output captured to a log file. Returns (code, seconds)."""
+    start = time.time()
+    # Progress events from every stage go to one JSONL file unless the caller chose another
+    env = dict(os.environ)
+    env.setdefault('PROGRESS_EVENTS', os.path.join(log_dir, 'events.jsonl'))
+    with open(os.path.join(log_dir, f"{name}.log"), 'w') as log:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', name,
+                               '--artifact-dir', artifact_dir],
+                              stdout=log, stderr=subprocess.STDOUT, cwd=artifact_dir, env=env)
+    return proc.returncode, time.time() - start
+
+def run_pipeline(stages=None, artifact_dir='/home/zack', jobs=None, refresh=False, force=False):
+    """
+    Run the requested stages (default: all) and whatever they depend on.
+
+    A stage is skipped when its fingerprint (code + input contents) and
+    its output contents match the last successful run; force re-runs the
+    requested stages only, never their upstream or external stages. Stages
+    whose inputs are ready run concurrently, up to `jobs` at a time.
+    """
+    artifact_dir = os.path.abspath(artifact_dir)
+    log_dir = os.path.join(artifact_dir, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    state_path = os.path.join(artifact_dir, STATE_FILE)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+
+    requested = set(stages or STAGES)
+    order = upstream(requested)
+    made_by = producers()
+    deps = {name: {made_by[a] for a in STAGES[name]['inputs'].values() if made_by.get(a) in order}
+            for name in order}
+
+    print("="*70)
+    print("ANALYSIS PIPELINE")
+    print("="*70)
+    print(f"\nArtifacts: {artifact_dir}")
+    print(f"Stages: {', '.join(order)}")
+
+    status = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while len(status) < len(order):
+            for name in order:
+                if name in status or name in running.values() or any(d not in status for d in deps[name]):
+                    continue
+                if any(status[d] == 'failed' or status[d] == 'blocked' for d in deps[name]):
+                    status[name] = 'blocked'
+                    print(f"   ✗ {name:<18} blocked by a failed upstream stage")
+                    continue
+                forced = force and name in requested and not STAGES[name].get('external')
+                if not forced and is_fresh(name, artifact_dir, state, refresh):
+                    status[name] = 'skipped'
+                    print(f"   · {name:<18} up to date")
+                    continue
+                print(f"   ▶ {name:<18} scheduled")
+                running[pool.submit(launch_stage, name, artifact_dir, log_dir)] = name
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                code, seconds = future.result()
+                if code == 0:
+                    status[name] = 'ran'
+                    state[name] = {
+                        'fingerprint': stage_fingerprint(name, artifact_dir),
+                        'outputs': {a: file_sha256(artifact_path(artifact_dir, a))
+                                    for a in STAGES[name]['outputs'].values()},
+                        'finished': time.strftime('%Y-%m-%dT%H:%M:%S')
+                    }
+                    with open(state_path, 'w') as f:
+                        json.dump(state, f, indent=2)
+                    print(f"   ✓ {name:<18} done in {seconds:.1f}s")
+                else:
+                    status[name] = 'failed'
+                    state.pop(name, None)
+                    print(f"   ✗ {name:<18} failed (exit {code}), see {os.path.join(log_dir, name + '.log')}")
+
+    counts = {s: sum(1 for v in status.values() if v == s) for s in ('ran', 'skipped', 'failed', 'blocked')}
+    print("\n" + "="*70)
+    print(f"Ran {counts['ran']}, skipped {counts['skipped']}, "
+          f"failed {counts['failed']}, blocked {counts['blocked']}")
+    print("="*70)
+
+    return status
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('stages', nargs='*', help=f"stages to run (default: all of {', '.join(STAGES)})")
+    parser.add_argument('--artifact-dir', default='/home/zack', help='directory holding every stage artifact')
+    parser.add_argument('--jobs', type=int, default=None, help='maximum concurrent stages')
+    parser.add_argument('--refresh', action='store_true', help='re-run stages that read live pacman state')
+    parser.add_argument('--force', action='store_true', help='re-run the named stages even if up to date')
+    parser.add_argument('--memory-budget', help='memory budget for analysis stages, e.g. 8G or 8GiB (default: 80%% of available)')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.memory_budget:
+        from memory_planner import BUDGET_ENV, parse_budget
+        try:
+            parse_budget(args.memory_budget)
+        except ValueError as e:
+            parser.error(str(e))
+        # Stage workers inherit the environment, and the memory planner reads its default from it
+        os.environ[BUDGET_ENV] = args.memory_budget
+
+    if args.worker:
+        run_stage_worker(args.worker, args.artifact_dir)
+    else:
+        unknown = [s for s in args.stages if s not in STAGES]
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(unknown)}")
+        status = run_pipeline(args.stages, args.artifact_dir, args.jobs, args.refresh, args.force)
+        sys.exit(1 if any(s in ('failed', 'blocked') for s in status.values()) else 0)
@@ -0,0 +1,434 @@
+#!/usr/bin/python3
+"""
+Package Database Watcher
+Keeps the dependency snapshot, conflicts and incremental metrics current as pacman transactions happen
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from scipy import sparse
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# The scripts import their siblings by bare module name
+for sub in ('collection', 'analysis'):
+    path = os.path.join(SRC_DIR, sub)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from collections import defaultdict
+from dependency_analysis import (get_package_info, collect_package_info, build_provider_index, resolve_dependency,
+                                 parse_dependency, save_results, package_info_from_snapshot, required_by_from_edges)
+from conflict_analysis import conflict_targets, declared_conflicts, chain_conflicts, conflict_results
+from cycle_analysis import analyze_cycle_structure
+from version_compare import parse_constraint
+from dynamic_graph import DynamicDependencyGraph, snapshot_delta
+from mathematical_analysis import incremental_pagerank_update, pagerank_push_update
+from graph_utils import load_dependency_data, adjacency_csr
+from memory_planner import MemoryPlanner
+from progress_events import Stage
+
+# [2025-01-01T12:00:00+0000] [ALPM] upgraded zstd (1.5.6-1 -> 1.5.7-2)
+LOG_EVENT = re.compile(r'^\[[^\]]+\] \[ALPM\] (installed|removed|upgraded|downgraded|reinstalled) (\S+) \(([^)]*)\)')
+LOG_TRANSACTION_DONE = re.compile(r'^\[[^\]]+\] \[ALPM\] transaction completed')
+
+def read_local_db(db_path='/var/lib/pacman/local'):
+    """Installed packages as {name: version}, from the local database entry names (name-pkgver-pkgrel)."""
+    installed = {}
+    for entry in os.listdir(db_path):
+        if os.path.isdir(os.path.join(db_path, entry)) and entry.count('-') >= 2:
+            name, version, release = entry.rsplit('-', 2)
+            installed[name] = f"{version}-{release}"
+    return installed
+
+class LocalDbPoller:
+    """Detects changes by diffing the local database directory whenever its mtime moves."""
+
+    def __init__(self, db_path='/var/lib/pacman/local'):
+        self.db_path = db_path
+        self.lock_path = os.path.join(os.path.dirname(db_path.rstrip('/')), 'db.lck')
+        self.mtime = os.stat(db_path).st_mtime_ns
+        self.installed = read_local_db(db_path)
+
+    def busy(self):
+        """True while pacman holds the database lock (a transaction is in progress)."""
+        return os.path.exists(self.lock_path)
+
+    def poll(self):
+        """[(action, package, version)] since the last poll."""
+        mtime = os.stat(self.db_path).st_mtime_ns
+        if mtime == self.mtime:
+            return []
+        self.mtime = mtime
+        current = read_local_db(self.db_path)
+        events = [('removed', p, v) for p, v in self.installed.items() if p not in current]
+        for p, v in current.items():
+            if p not in self.installed:
+                events.append(('installed', p, v))
+            elif self.installed[p] != v:
+                events.append(('upgraded', p, v))
+        self.installed = current
+        # The directory only changes at the end of each package's commit, so a diff is a finished step
+        return events + [('completed', None, None)] if events else []
+
+class PacmanLogTailer:
+    """Follows pacman.log from the current end, surviving truncation and rotation."""
+
+    def __init__(self, log_path='/var/log/pacman.log', lock_path='/var/lib/pacman/db.lck'):
+        self.log_path = log_path
+        self.lock_path = lock_path
+        self.offset = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        self.partial = ''
+
+    def busy(self):
+        return os.path.exists(self.lock_path)
+
+    def poll(self):
+        if not os.path.exists(self.log_path):
+            return []
+        size = os.path.getsize(self.log_path)
+        if size < self.offset:
+            self.offset, self.partial = 0, ''
+        if size == self.offset:
+            return []
+        with open(self.log_path, 'r', errors='replace') as f:
+            f.seek(self.offset)
+            text = self.partial + f.read()
+            self.offset = f.tell()
+        lines = text.split('\n')
+        self.partial = lines.pop()
+        return parse_log_lines(lines)
+
+def parse_log_lines(lines):
+    """[(action, package, version)] from pacman.log lines; 'completed' closes a transaction."""
+    events = []
+    for line in lines:
+        match = LOG_EVENT.match(line)
+        if match:
+            action, package, version = match.groups()
+            events.append((action, package, version.split(' -> ')[-1]))
+        elif LOG_TRANSACTION_DONE.match(line):
+            events.append(('completed', None, None))
+    return events
+
+class ChangeBatcher:
+    """
+    Coalesces package events into batches.
+
+    A batch is released once the database is unlocked and either a
+    transaction completed or no event arrived for `window` seconds, and
+    never sooner than `min_interval` after the previous batch.
+    """
+
+    def __init__(self, window=2.0, min_interval=10.0):
+        self.window = window
+        self.min_interval = min_interval
+        self.pending = {}
+        self.completed = False
+        self.last_event = 0.0
+        self.last_flush = float('-inf')
+
+    def add(self, events, now):
+        for action, package, version in events:
+            if action == 'completed':
+                self.completed = bool(self.pending)
+                continue
+            # Only the final state of a package matters
+            self.pending[package] = 'removed' if action == 'removed' else 'changed'
+            self.last_event = now
+
+    def ready(self, now, busy=False):
+        if not self.pending or busy:
+            return False
+        quiet = self.completed or now - self.last_event >= self.window
+        return quiet and now - self.last_flush >= self.min_interval
+
+    def take(self, now):
+        batch, self.pending, self.completed = self.pending, {}, False
+        self.last_flush = now
+        return batch
+
+class IncrementalUpdater:
+    """
+    Applies package changes to the saved snapshot and the metrics derived from it.
+
+    Only changed packages are re-queried from pacman; every other record
+    comes from the snapshot. Packages are dropped only when removed: a
+    failed query keeps the previous record and is retried next batch.
+
+    Resolved dependencies and conflict declarations are kept per package
+    and redone only for the changed packages and for packages whose
+    dependencies or conflicts name something a changed package provided
+    before or provides now. Cycles and closure conflicts are global and
+    are recomputed from the patched graph. The dependency engine is
+    patched with the edge delta, and PageRank is pushed forward from the
+    previous vector.
+    """
+
+    def __init__(self, output_dir='/home/zack', alpha=0.85, memory_budget=None):
+        self.data_file = os.path.join(output_dir, 'dependency_data.json')
+        self.conflict_file = os.path.join(output_dir, 'conflict_analysis.json')
+        self.state_file = os.path.join(output_dir, 'pagerank_state.json')
+        self.metrics_file = os.path.join(output_dir, 'watch_metrics.json')
+        self.alpha = alpha
+        self.memory_budget = memory_budget
+        # Changed packages whose pacman query failed, re-queried with the next batch
+        self.stale = set()
+
+        data = load_dependency_data(self.data_file)
+        self.package_info = package_info_from_snapshot(data)
+        if self.package_info is None:
+            print("Snapshot predates the saved package fields, collecting every package once...")
+            self.package_info = collect_package_info(data['packages'])
+            # pacman failures come back as None records; leave them out until a retry succeeds
+            self.stale = {p for p, info in self.package_info.items() if info is None}
+            for package in self.stale:
+                del self.package_info[package]
+
+        # Package -> ([(provider, via, dependency)], [unresolved dependencies]) and
+        # package -> [(target, constraint)] for its conflict declarations
+        self.resolved = {}
+        self.declared = {}
+        # Name -> packages whose dependencies / conflicts mention it
+        self.wanted_by = defaultdict(set)
+        self.conflicting = defaultdict(set)
+        packages = sorted(self.package_info)
+        for package in packages:
+            self._index(package, self.package_info[package], add=True)
+        self._resolve(packages, packages)
+        self._match(packages, packages)
+
+        self.graph = DynamicDependencyGraph.from_dependency_data(self.data_file)
+        self.packages = data['packages']
+        self.A = adjacency_csr(data)
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            prev_A = sparse.csr_matrix((np.ones(len(state['edges'][0])), (state['edges'][0], state['edges'][1])),
+                                       shape=(len(state['packages']),) * 2)
+            self.pagerank, _ = incremental_pagerank_update(state['packages'], prev_A, np.array(state['pagerank']),
+                                                           data['pkg_to_idx'], self.A, alpha)
+        else:
+            n = len(self.packages)
+            self.pagerank, _ = pagerank_push_update(self.A, np.full(n, (1 - alpha) / n), range(n), alpha)
+
+    @staticmethod
+    def _provided_names(info):
+        """Names a record satisfies besides its own."""
+        return {parse_dependency(p)[0] for p in (info or {}).get('Provides', [])}
+
+    def _index(self, package, info, add):
+        """Add or drop a record's dependency and conflict names in the reverse indices."""
+        if not info:
+            return
+        names = [(self.wanted_by, parse_dependency(dep)[0]) for dep in info.get('Depends On', [])]
+        names += [(self.conflicting, parse_constraint(c)[0]) for c in info.get('Conflicts With', [])]
+        for reverse, name in names:
+            if add:
+                reverse[name].add(package)
+            else:
+                reverse[name].discard(package)
+
+    def _resolve(self, packages, dependents):
+        """Re-resolve the dependencies of `dependents` against the current records."""
+        provider_index = build_provider_index(packages, self.package_info)
+        for package in dependents:
+            info = self.package_info.get(package) or {}
+            provided_by, missing = [], []
+            for dep in info.get('Depends On', []):
+                matches = resolve_dependency(dep, provider_index)
+                if not matches:
+                    missing.append(dep)
+                provided_by.extend((packages[j], via, dep) for j, via in matches if packages[j] != package)
+            self.resolved[package] = (provided_by, missing)
+
+    def _match(self, packages, declarers):
+        """Re-match the conflict declarations of `declarers` against the current records."""
+        provides_map = defaultdict(list)
+        for package in packages:
+            for provided in (self.package_info.get(package) or {}).get('Provides', []):
+                provides_map[provided].append(package)
+        versions = {p: (self.package_info.get(p) or {}).get('Version') for p in packages}
+        targets = conflict_targets(packages, provides_map, versions)
+        for package in declarers:
+            constraints = (self.package_info.get(package) or {}).get('Conflicts With', [])
+            self.declared[package] = declared_conflicts(package, constraints, targets) if constraints else []
+
+    def _save_conflicts(self, packages, pkg_to_idx, A):
+        """Write conflict_analysis.json from the patched declarations, like conflict_analysis.py does."""
+        conflicts, provides_map, replaces_map = {}, defaultdict(list), {}
+        for package in packages:
+            info = self.package_info[package] or {}
+            if info.get('Conflicts With'):
+                conflicts[package] = info['Conflicts With']
+            for provided in info.get('Provides', []):
+                provides_map[provided].append(package)
+            if info.get('Replaces'):
+                replaces_map[package] = info['Replaces']
+        conflict_index = defaultdict(list)
+        for package in conflicts:
+            for target, constraint in self.declared.get(package, ()):
+                conflict_index[pkg_to_idx[target]].append((pkg_to_idx[package], constraint))
+        virtual_conflicts = {v: providers for v, providers in provides_map.items() if len(providers) > 1}
+        incompatible_chains, chain_paths = chain_conflicts(A, packages, conflict_index)
+        results = conflict_results(packages, conflicts, analyze_cycle_structure(A), virtual_conflicts,
+                                   replaces_map, incompatible_chains, chain_paths)
+        with open(self.conflict_file, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    def apply(self, batch):
+        """Bring every output up to date with a {package: 'changed' | 'removed'} batch."""
+        start = time.time()
+        # Packages whose query failed last time are retried with this batch
+        batch = dict({p: 'changed' for p in self.stale}, **batch)
+        changed = sorted(p for p, action in batch.items() if action == 'changed')
+        previous = {p: self.package_info[p] for p in batch if p in self.package_info}
+        for package, action in batch.items():
+            if action == 'removed':
+                self.package_info.pop(package, None)
+        with Stage('query changed packages', total=len(changed), label='package', quiet=True) as stage:
+            for package in changed:
+                stage.advance(package)
+                info = get_package_info(package, stage)
+                # A failed query keeps the previous record rather than dropping an installed package
+                if info is not None:
+                    self.package_info[package] = info
+        self.stale = set(stage.failed_items)
+        if self.stale:
+            print(f"   ⚠ {len(self.stale)} pacman queries failed, keeping previous records: "
+                  f"{', '.join(sorted(self.stale)[:8])}{' ...' if len(self.stale) > 8 else ''}")
+
+        for package, info in previous.items():
+            self._index(package, info, add=False)
+        for package in batch:
+            self._index(package, self.package_info.get(package), add=True)
+        # Names whose providers may have changed: every batch package and what it provided or provides
+        touched = set(batch)
+        for package in batch:
+            touched |= self._provided_names(previous.get(package)) | self._provided_names(self.package_info.get(package))
+        for package in batch:
+            if package not in self.package_info:
+                self.resolved.pop(package, None)
+                self.declared.pop(package, None)
+
+        packages = sorted(self.package_info)
+        present = [p for p in batch if p in self.package_info]
+        dependents = set(present).union(*(self.wanted_by.get(name, ()) for name in touched))
+        declarers = set(present).union(*(self.conflicting.get(name, ()) for name in touched))
+        self._resolve(packages, sorted(dependents))
+        self._match(packages, sorted(declarers))
+
+        pkg_to_idx = {pkg: i for i, pkg in enumerate(packages)}
+        edges = []
+        unresolved = {}
+        for i, package in enumerate(packages):
+            provided_by, missing = self.resolved[package]
+            edges.extend([i, pkg_to_idx[q], via, dep] for q, via, dep in provided_by)
+            if missing:
+                unresolved[package] = missing
+        # Like Collector.dense, but only while the planner says the dense matrix fits the budget
+        adj_matrix = None
+        if MemoryPlanner(len(packages), len(edges), self.memory_budget).plan([])['adjacency'] == 'dense':
+            adj_matrix = np.zeros((len(packages), len(packages)), dtype=np.int8)
+            for i, j, _, _ in edges:
+                adj_matrix[i, j] = 1
+        # Required By is derived data, so refresh it for every package from the resolved edges
+        required_by = required_by_from_edges(packages, edges)
+        for p in packages:
+            self.package_info[p]['Required By'] = required_by[p]
+        save_results(packages, adj_matrix, pkg_to_idx, self.package_info, edges, unresolved, self.data_file)
+        collected = time.time()
+
+        A = adjacency_csr({'packages': packages, 'dependency_edges': edges})
+        self._save_conflicts(packages, pkg_to_idx, A)
+        conflicts_done = time.time()
+
+        data = load_dependency_data(self.data_file)
+        delta = snapshot_delta(self.graph, data)
+        self.graph.apply_delta(**delta)
+        self.pagerank, stats = incremental_pagerank_update(self.packages, self.A, self.pagerank,
+                                                           pkg_to_idx, A, self.alpha)
+        self.packages, self.A = packages, A
+        rows, cols = A.nonzero()
+        with open(self.state_file, 'w') as f:
+            json.dump({'packages': packages, 'edges': [rows.tolist(), cols.tolist()],
+                       'pagerank': self.pagerank.tolist()}, f)
+
+        nontrivial = [scc for scc in self.graph.sccs() if len(scc) > 1]
+        top = np.argsort(self.pagerank)[-20:][::-1]
+        metrics = {
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'batch': batch,
+            'delta': {k: len(v) for k, v in delta.items()},
+            'pagerank_top_20': [(packages[i], float(self.pagerank[i])) for i in top],
+            'pagerank_pushes': stats['pushes'],
+            'reresolved_packages': len(dependents),
+            'rematched_conflict_declarers': len(declarers),
+            'query_failures': sorted(self.stale),
+            'cyclic_components': nontrivial,
+            'timings': {
+                'collection': collected - start,
+                'conflicts': conflicts_done - collected,
+                'metrics': time.time() - conflicts_done
+            }
+        }
+        with open(self.metrics_file, 'w') as f:
+            json.dump(metrics, f, indent=2)
+        return metrics
+
+def watch(source='db', db_path='/var/lib/pacman/local', log_path='/var/log/pacman.log',
+          output_dir='/home/zack', interval=1.0, window=2.0, min_interval=10.0, max_batches=None,
+          memory_budget=None):
+    """Poll for pacman changes and apply them in batches until interrupted."""
+    if source == 'log':
+        detector = PacmanLogTailer(log_path, os.path.join(os.path.dirname(db_path.rstrip('/')), 'db.lck'))
+    else:
+        detector = LocalDbPoller(db_path)
+    batcher = ChangeBatcher(window, min_interval)
+
+    print("="*70)
+    print("PACKAGE DATABASE WATCHER")
+    print("="*70)
+    updater = IncrementalUpdater(output_dir, memory_budget=memory_budget)
+    print(f"\nWatching {log_path if source == 'log' else db_path} every {interval}s "
+          f"(window {window}s, at most one update per {min_interval}s)")
+
+    batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            now = time.time()
+            batcher.add(detector.poll(), now)
+            if batcher.ready(now, detector.busy()):
+                batch = batcher.take(now)
+                print(f"\n[{time.strftime('%H:%M:%S')}] {len(batch)} packages changed: "
+                      f"{', '.join(sorted(batch)[:8])}{' ...' if len(batch) > 8 else ''}")
+                metrics = updater.apply(batch)
+                timings = metrics['timings']
+                print(f"   Updated in {sum(timings.values()):.2f}s (collection {timings['collection']:.2f}s, "
+                      f"conflicts {timings['conflicts']:.2f}s, metrics {timings['metrics']:.2f}s)")
+                batches += 1
+            else:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nStopped")
+    return batches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--source', choices=('db', 'log'), default='db',
+                        help='poll the local database directory or tail pacman.log')
+    parser.add_argument('--db-path', default='/var/lib/pacman/local')
+    parser.add_argument('--log-path', default='/var/log/pacman.log')
+    parser.add_argument('--output-dir', default='/home/zack', help='directory holding the snapshot and results')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between polls')
+    parser.add_argument('--window', type=float, default=2.0, help='quiet seconds that close a batch')
+    parser.add_argument('--min-interval', type=float, default=10.0, help='minimum seconds between updates')
+    parser.add_argument('--memory-budget', help='budget deciding whether the snapshot keeps a dense matrix, e.g. 8G '
+                                                '(default: $MEMORY_BUDGET or 80%% of available)')
+    args = parser.parse_args()
+    watch(args.source, args.db_path, args.log_path, args.output_dir, args.interval, args.window, args.min_interval,
+          memory_budget=args.memory_budget)
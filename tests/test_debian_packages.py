@@ -0,0 +1,106 @@
+"""Tests for the Debian collectors' dependency resolution."""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+for path in (os.path.join(SRC, 'collection'), os.path.join(SRC, 'analysis')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from debian_packages import AptPackagesCollector
+from conflict_analysis import analyze_conflicts
+from coinstallability_solver import load_solver
+from incompatibility_matrix_analysis import build_conflict_store
+from conflict_store import EXPLICIT
+
+PACKAGES = """\
+Package: app
+Version: 1.0
+Architecture: amd64
+Depends: x | y
+
+Package: x
+Version: 1.0
+Architecture: amd64
+Conflicts: app
+
+Package: y
+Version: 1.0
+Architecture: amd64
+"""
+
+# 1.0~rc1 sorts before 1.0a for dpkg but after it for pacman's vercmp
+TILDE_PACKAGES = """\
+Package: x
+Version: 1.0~rc1-1
+Architecture: amd64
+
+Package: y
+Version: 1.0
+Architecture: amd64
+Depends: x
+Conflicts: x (<< 1.0a)
+"""
+
+class PackagesIndexTest(unittest.TestCase):
+
+    index_text = PACKAGES
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = os.path.join(self.tmp.name, 'Packages')
+        self.data_file = os.path.join(self.tmp.name, 'dependency_data.json')
+        self.conflict_file = os.path.join(self.tmp.name, 'conflict_analysis.json')
+        with open(self.index, 'w') as f:
+            f.write(self.index_text)
+        AptPackagesCollector([self.index]).collect(self.data_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self, path):
+        with open(path) as f:
+            return json.load(f)
+
+class AlternativeDependencyTest(PackagesIndexTest):
+
+    def test_every_satisfiable_alternative_is_an_edge(self):
+        data = self.load(self.data_file)
+        idx = data['pkg_to_idx']
+        edges = {(i, j, dep) for i, j, _, dep in data['dependency_edges']}
+        self.assertEqual(edges, {(idx['app'], idx['x'], 'x | y'), (idx['app'], idx['y'], 'x | y')})
+        self.assertEqual(data['unresolved_dependencies'], {})
+
+    def test_conflicting_first_alternative_falls_back_to_second(self):
+        analyze_conflicts(self.data_file, self.conflict_file)
+        solver = load_solver(self.data_file, self.conflict_file)
+        ok, install_set = solver.can_install(['app'])
+        self.assertTrue(ok)
+        self.assertIn('y', install_set)
+        self.assertNotIn('x', install_set)
+
+class DpkgVersionSchemeTest(PackagesIndexTest):
+
+    index_text = TILDE_PACKAGES
+
+    def test_snapshot_records_dpkg_scheme(self):
+        self.assertEqual(self.load(self.data_file)['version_scheme'], 'dpkg')
+
+    def test_versioned_conflict_uses_dpkg_ordering(self):
+        analyze_conflicts(self.data_file, self.conflict_file)
+        chains = self.load(self.conflict_file)['incompatible_chains']
+        self.assertEqual([chain[:2] for chain in chains], [['y', 'x']])
+
+        data = self.load(self.data_file)
+        store, _ = build_conflict_store(data, self.load(self.conflict_file))
+        rows, cols, _, _ = store.edges(kind=EXPLICIT)
+        idx = data['pkg_to_idx']
+        pairs = {frozenset(pair) for pair in zip(rows.tolist(), cols.tolist())}
+        self.assertIn(frozenset((idx['x'], idx['y'])), pairs)
+
+if __name__ == '__main__':
+    unittest.main()